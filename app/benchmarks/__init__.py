@@ -0,0 +1,29 @@
+"""
+Benchmarks for the finance app.
+
+Run a benchmark from the ``app`` directory, for example::
+
+    python -m benchmarks.metrics
+"""
+import os
+import time
+
+
+def setup_django():
+    """Configure Django for a standalone benchmark script."""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+def measure(func, number):
+    """Call ``func`` ``number`` times and return seconds per call."""
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+def report(name, seconds):
+    print("%-40s %10.2f us" % (name, seconds * 1e6))
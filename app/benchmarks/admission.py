@@ -0,0 +1,173 @@
+"""
+Load test of admission control under overload.
+
+Start uwsgi, measure its capacity on an expensive route, then offer an
+open-loop load above that capacity with and without admission control. The
+client stamps ``X-Request-Start`` like nginx does and gives up after
+``--client-timeout`` seconds. Without shedding the queue grows until every
+answer arrives after the client left; with shedding the server keeps
+answering in time and rejects the excess with fast 503s.
+
+    python -m benchmarks.admission [--overload 2] [--duration 30]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+ROUTE = "/api/budget/transactions/"
+UWSGI = (
+    "exec uwsgi --http-socket 127.0.0.1:{port} --workers {workers} --master "
+    "--enable-threads --module config.wsgi --disable-logging --listen 1024"
+)
+UNLIMITED = "user=1000000/s,user.transactions=1000000/s,ip=1000000/s"
+
+
+def request(port, method, path, timeout, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    headers = {"X-Request-Start": "t=%.3f" % time.time()}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+        body = json.dumps(body)
+    if token:
+        headers["Authorization"] = "Bearer %s" % token
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def start_server(port, workers, shedding):
+    env = dict(
+        os.environ,
+        ADMISSION_CONTROL="1" if shedding else "0",
+        THROTTLE_RATES=UNLIMITED,
+    )
+    process = subprocess.Popen(
+        UWSGI.format(port=port, workers=workers),
+        shell=True,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    for _ in range(500):
+        try:
+            request(port, "GET", "/api/schema/", 1)
+            return process
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError("Server didn't start.")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGINT)
+    process.wait()
+
+
+def measure_capacity(port, token, workers, seconds=5):
+    done = Counter()
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        while time.perf_counter() < deadline:
+            request(port, "GET", ROUTE, 30, token=token)
+            done["ok"] += 1
+
+    threads = [threading.Thread(target=loop) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return done["ok"] / seconds
+
+
+def offer_load(port, token, rate, duration, client_timeout):
+    outcomes = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def call(scheduled):
+        try:
+            status, _ = request(port, "GET", ROUTE, client_timeout, token=token)
+        except OSError:
+            outcome = "timeout or error"
+        else:
+            outcome = {200: "ok", 503: "shed"}.get(status, str(status))
+        latency = time.perf_counter() - scheduled
+        if outcome == "ok" and latency > client_timeout:
+            outcome = "timeout or error"
+        with lock:
+            outcomes[outcome] += 1
+            if outcome == "ok":
+                latencies.append(latency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1024) as executor:
+        for i in range(int(rate * duration)):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(call, scheduled)
+    return outcomes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8125)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--overload", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--client-timeout", type=float, default=10)
+    parser.add_argument("--email", default="load0@example.com")
+    parser.add_argument("--password", default="loadtest123")
+    args = parser.parse_args()
+
+    credentials = {"email": args.email, "password": args.password}
+    rate = None
+    for shedding in (False, True):
+        process = start_server(args.port, args.workers, shedding)
+        try:
+            status, data = request(
+                args.port, "POST", "/api/token/", 30, body=credentials
+            )
+            token = json.loads(data)["access"]
+            if rate is None:
+                capacity = measure_capacity(args.port, token, args.workers)
+                rate = capacity * args.overload
+                print("capacity %.1f req/s, offering %.1f req/s" % (capacity, rate))
+            outcomes, latencies = offer_load(
+                args.port, token, rate, args.duration, args.client_timeout
+            )
+        finally:
+            stop_server(process)
+
+        p50, p99 = (
+            [quantiles(latencies, n=100)[i] for i in (49, 98)]
+            if len(latencies) > 1
+            else (float("nan"), float("nan"))
+        )
+        print(
+            "%-12s goodput %6.1f req/s  p50 %6.2f s  p99 %6.2f s  %s"
+            % (
+                "shedding" if shedding else "no shedding",
+                outcomes["ok"] / args.duration,
+                p50,
+                p99,
+                dict(outcomes),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
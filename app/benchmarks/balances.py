@@ -0,0 +1,87 @@
+"""
+Benchmark balances of a budget at points in time.
+
+Create a budget with ``--transactions`` transactions spread over
+``--months`` months, then read its balance at the start of its history by
+summing the transactions after it, and through the monthly checkpoints,
+first creating them, then with them in place. Then read a series of 500
+balances over the whole history.
+
+    python -m benchmarks.balances [--transactions N] [--months N]
+"""
+import argparse
+import time
+
+from . import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--months", type=int, default=36)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from datetime import timedelta
+    from decimal import Decimal
+
+    from django.contrib.auth import get_user_model
+    from django.db.models import Sum
+    from django.utils import timezone
+
+    from core.checkpoints import get_balance_at
+    from core.models import Budget, Category, Transaction
+    from core.series import get_balance_series
+
+    User = get_user_model()
+    user = User.objects.filter(email="balances@example.com").first()
+    if user is None:
+        user = User.objects.create_user(email="balances@example.com", password="x")
+    category, _ = Category.objects.for_user(user).get_or_create(
+        user=user, name="Food", category_type="Expense"
+    )
+    budget = Budget.objects.create(user=user, currency="USD")
+    now = timezone.now()
+    step = timedelta(days=30 * args.months) / args.transactions
+    Transaction.objects.using(budget._state.db).bulk_create(
+        [
+            Transaction(
+                budget=budget,
+                category=category,
+                amount=Decimal("1"),
+                signed_amount=Decimal("-1"),
+                created=now - step * i,
+            )
+            for i in range(args.transactions)
+        ],
+        batch_size=5000,
+    )
+    at = now - timedelta(days=30 * args.months - 15)
+
+    def summed():
+        after = Transaction.objects.filter(budget=budget, created__gt=at)
+        return budget.balance - after.aggregate(total=Sum("signed_amount"))["total"]
+
+    def elapsed(func):
+        start = time.perf_counter()
+        result = func()
+        return (time.perf_counter() - start) * 1e3, result
+
+    print("%d transactions over %d months" % (args.transactions, args.months))
+    for name, func in [
+        ("Summing the transactions after", summed),
+        ("Creating the checkpoints", lambda: get_balance_at(budget, at)),
+        ("Through the checkpoints", lambda: get_balance_at(budget, at)),
+        (
+            "Series of 500 points, last balance",
+            lambda: get_balance_series(budget, at, now, 500)[1][-1],
+        ),
+    ]:
+        ms, balance = elapsed(func)
+        print("%-40s %10.2f ms %12s" % (name, ms, balance))
+    budget.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark syncing a client with the changes feed.
+
+Compare downloading the budget, category and transaction lists with a full
+sync through the feed and with a sync of an account without changes, in
+time and bytes, through the test client.
+
+    python -m benchmarks.changes [--email EMAIL] [--number N]
+"""
+import argparse
+
+from . import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--email", default="load0@example.com")
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    user = get_user_model().objects.get(email=args.email)
+    client = APIClient()
+    client.force_authenticate(user)
+    lists = [
+        reverse("budget:budget-list"),
+        reverse("budget:category-list"),
+        reverse("budget:transaction-list"),
+    ]
+    changes_url = reverse("budget:changes")
+
+    def download():
+        return sum(len(client.get(url).content) for url in lists)
+
+    def sync(cursor=None):
+        size = 0
+        while True:
+            params = {"limit": 1000}
+            if cursor:
+                params["cursor"] = cursor
+            res = client.get(changes_url, params)
+            size += len(res.content)
+            data = res.json()
+            cursor = data["cursor"]
+            if not data["has_more"]:
+                return cursor, size
+
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        print("Full lists: %d bytes" % download())
+        cursor, size = sync()
+        print("Full sync: %d bytes" % size)
+        print("Quiet sync: %d bytes" % sync(cursor)[1])
+
+        report("Full lists", measure(download, args.number))
+        report("Full sync", measure(sync, args.number))
+        report("Quiet sync", measure(lambda: sync(cursor), args.number * 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark the columnar representation of the list endpoints.
+
+Compare the budget, category and transaction lists of an account as JSON
+and as columns, in bytes and in time, through the test client.
+
+    python -m benchmarks.columnar [--email EMAIL] [--number N]
+"""
+import argparse
+
+from . import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--email", default="load0@example.com")
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    user = get_user_model().objects.get(email=args.email)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        for name in ["budget", "category", "transaction"]:
+            url = reverse("budget:%s-list" % name)
+            for format in ["json", "columnar"]:
+                res = client.get(url, {"format": format})
+                print("%s list as %s: %d bytes" % (name, format, len(res.content)))
+            for format in ["json", "columnar"]:
+                report(
+                    "%s list as %s" % (name, format),
+                    measure(lambda: client.get(url, {"format": format}), args.number),
+                )
+
+
+if __name__ == "__main__":
+    main()
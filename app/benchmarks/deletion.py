@@ -0,0 +1,81 @@
+"""
+Benchmark deleting a large budget.
+
+Create a budget with ``--transactions`` transactions, delete it with
+Django's cascade, then create it again and delete it the way the API does:
+soft delete it in the request, then purge it with the background job. The
+cascade holds its locks for the whole delete, the purge for one batch at a
+time.
+
+    python -m benchmarks.deletion [--transactions N]
+"""
+import argparse
+import time
+
+from . import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=100000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from decimal import Decimal
+
+    from django.contrib.auth import get_user_model
+
+    from core import deletion, jobs
+    from core.models import Budget, Category, Transaction
+
+    User = get_user_model()
+    user = User.objects.filter(email="delete@example.com").first()
+    if user is None:
+        user = User.objects.create_user(email="delete@example.com", password="x")
+    category, _ = Category.objects.for_user(user).get_or_create(
+        user=user, name="Food", category_type="Expense"
+    )
+
+    def create_budget():
+        budget = Budget.objects.create(user=user, currency="USD")
+        Transaction.objects.using(budget._state.db).bulk_create(
+            [
+                Transaction(
+                    budget=budget,
+                    category=category,
+                    amount=Decimal("1"),
+                    signed_amount=Decimal("-1"),
+                )
+                for _ in range(args.transactions)
+            ],
+            batch_size=5000,
+        )
+        return budget
+
+    def elapsed(func):
+        start = time.perf_counter()
+        result = func()
+        return time.perf_counter() - start, result
+
+    print("%d transactions" % args.transactions)
+    budget = create_budget()
+    seconds, _ = elapsed(budget.delete)
+    print("%-40s %10.2f s" % ("Cascade, in the request", seconds))
+
+    budget = create_budget()
+    seconds, job = elapsed(lambda: deletion.delete_budget(budget))
+    print("%-40s %10.2f ms" % ("Soft delete, in the request", seconds * 1e3))
+    job = jobs.claim("benchmark", kinds=[job.kind])
+    seconds, job = elapsed(lambda: jobs.run(job))
+    batch_size = deletion.PURGE_BATCH_SIZE
+    batches = -(-args.transactions // batch_size)
+    print("%-40s %10.2f s" % ("Purge, in the background", seconds))
+    print(
+        "%-40s %10.2f ms"
+        % ("Purge, per batch of %d" % batch_size, seconds / batches * 1e3)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark forecasting budget balances.
+
+Forecast the budgets of the seeded users for ``--days`` days in batches of
+several sizes and report budgets forecast per second, against a loop over
+the transactions in Python computing the daily totals alone.
+
+    python -m benchmarks.forecast [--budgets N] [--days N]
+"""
+import argparse
+import time
+
+from . import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budgets", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from collections import defaultdict
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from core.forecast import HISTORY_DAYS, forecast
+    from core.models import Budget, Transaction
+
+    budgets = list(
+        Budget.objects.filter(user__email__startswith="load").order_by("pk")[
+            : args.budgets
+        ]
+    )
+    if not budgets:
+        raise SystemExit("No seeded budgets, run seed_load first.")
+    today = timezone.localdate()
+
+    def run(batch_size):
+        start = time.perf_counter()
+        for i in range(0, len(budgets), batch_size):
+            forecast(budgets[i : i + batch_size], args.days, today)
+        return len(budgets) / (time.perf_counter() - start)
+
+    def python_totals(count):
+        start = time.perf_counter()
+        since = timezone.now() - timedelta(days=HISTORY_DAYS)
+        for budget in budgets[:count]:
+            totals = defaultdict(int)
+            rows = Transaction.objects.filter(budget=budget, created__gte=since)
+            for item in rows.values_list("category_id", "created", "signed_amount"):
+                totals[item[0], timezone.localtime(item[1]).date()] += item[2]
+        return count / (time.perf_counter() - start)
+
+    transactions = Transaction.objects.filter(budget__in=budgets).count()
+    print(
+        "%d budgets, %d transactions, %d days"
+        % (len(budgets), transactions, args.days)
+    )
+    print("%-40s %10.0f budgets/s" % ("Python loop, totals only", python_totals(200)))
+    for batch_size in [1, 100, 1000]:
+        print(
+            "%-40s %10.0f budgets/s"
+            % ("Forecast, batches of %d" % batch_size, run(batch_size))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark per-process caches kept correct by invalidation messages.
+
+Compare authenticating a token with and without the user cache, and
+measure how long a change takes to evict an entry in a listening process,
+from the NOTIFY to the eviction.
+
+    python -m benchmarks.invalidation [--number N] [--email EMAIL]
+"""
+import argparse
+import statistics
+import time
+
+from . import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--email", default="load0@example.com")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core import invalidation
+    from core.authentication import CachedJWTAuthentication
+
+    user = get_user_model().objects.get(email=args.email)
+    token = AccessToken.for_user(user)
+
+    invalidation.start_listener()
+    if not invalidation.wait_listening(10):
+        raise RuntimeError("Listener didn't connect.")
+
+    report(
+        "JWTAuthentication.get_user",
+        measure(lambda: JWTAuthentication().get_user(token), args.number),
+    )
+    cached = CachedJWTAuthentication()
+    report(
+        "CachedJWTAuthentication.get_user",
+        measure(lambda: cached.get_user(token), args.number),
+    )
+
+    cache = invalidation.LocalCache(ttl=3600)
+    tag = invalidation.get_tag(type(user), user.pk)
+    latencies = []
+    for _ in range(200):
+        cache.get_or_set("user", lambda: user, [tag])
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [invalidation.CHANNEL, tag])
+        while len(cache):
+            time.sleep(0)
+        latencies.append(time.perf_counter() - start)
+    report("NOTIFY to eviction, median", statistics.median(latencies))
+    report("NOTIFY to eviction, max", max(latencies))
+
+    invalidation.stop_listener()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Replay a weighted mix of API routes against a running server.
+
+Log in as users created by ``manage.py seed_load`` and report latency
+percentiles and throughput per endpoint as JSON::
+
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 \\
+        --users 1000 --concurrency 16 --duration 60 --output baseline.json
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+# (name, weight, method, path template, query, body)
+ROUTES = [
+    ("budget-list", 25, "GET", "/api/budget/budgets/", None, None),
+    ("budget-detail", 20, "GET", "/api/budget/budgets/{budget}/", None, None),
+    ("budget-list-filtered", 5, "GET", "/api/budget/budgets/",
+     {"balance_range": "0,100000", "currencies": "usd,eur"}, None),
+    ("category-list", 15, "GET", "/api/budget/categories/", None, None),
+    ("transaction-list", 10, "GET", "/api/budget/transactions/", None, None),
+    ("user-me", 10, "GET", "/api/user/me/", None, None),
+    ("budget-update", 5, "PATCH", "/api/budget/budgets/{budget}/", None,
+     {"currency": "USD"}),
+    ("category-update", 5, "PATCH", "/api/budget/categories/{category}/", None,
+     {"name": "Groceries"}),
+    ("token-refresh", 5, "POST", "/api/token/refresh/", None, "refresh"),
+]
+TOKEN_TTL = 240
+
+
+class Session:
+    """Authenticated API client for a single seeded user."""
+
+    def __init__(self, base_url, email, password):
+        parts = urlsplit(base_url)
+        self.host = parts.netloc
+        self.https = parts.scheme == "https"
+        self.email = email
+        self.password = password
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.access = self.refresh = None
+        self.issued = 0
+        self.budgets = []
+        self.categories = []
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            if self.https:
+                conn = http.client.HTTPSConnection(self.host, timeout=60)
+            else:
+                conn = http.client.HTTPConnection(self.host, timeout=60)
+            self.local.conn = conn
+        return conn
+
+    def request(self, method, path, body=None, auth=True):
+        headers = {"Content-Type": "application/json"}
+        if auth:
+            headers["Authorization"] = "Bearer %s" % self.token()
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):
+            conn = self.connection()
+            try:
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+
+    def login(self):
+        status, data = self.request(
+            "POST",
+            "/api/token/",
+            {"email": self.email, "password": self.password},
+            auth=False,
+        )
+        if status != 200:
+            raise RuntimeError("Login failed for %s: %s" % (self.email, status))
+        tokens = json.loads(data)
+        self.access, self.refresh = tokens["access"], tokens["refresh"]
+        self.issued = time.monotonic()
+
+    def token(self):
+        with self.lock:
+            if self.access is None or time.monotonic() - self.issued > TOKEN_TTL:
+                self.login()
+            return self.access
+
+    def discover(self):
+        _, data = self.request("GET", "/api/budget/budgets/")
+        self.budgets = [budget["id"] for budget in json.loads(data)]
+        _, data = self.request("GET", "/api/budget/categories/")
+        self.categories = [category["id"] for category in json.loads(data)]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1)
+    return sorted_values[max(index, 0)]
+
+
+def run(sessions, routes, concurrency, duration):
+    weights = [route[1] for route in routes]
+    results = {route[0]: {"latencies": [], "errors": 0} for route in routes}
+    results_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = {route[0]: {"latencies": [], "errors": 0} for route in routes}
+        while time.monotonic() < deadline:
+            session = rng.choice(sessions)
+            name, _, method, template, query, body = rng.choices(routes, weights)[0]
+            if ("{budget}" in template and not session.budgets) or (
+                "{category}" in template and not session.categories
+            ):
+                continue
+            path = template.format(
+                budget=rng.choice(session.budgets) if session.budgets else "",
+                category=rng.choice(session.categories) if session.categories else "",
+            )
+            if query:
+                path += "?" + urlencode(query)
+            if body == "refresh":
+                body = {"refresh": session.refresh}
+            start = time.perf_counter()
+            try:
+                status, _ = session.request(method, path, body)
+            except (http.client.HTTPException, OSError):
+                status = 0
+            elapsed = time.perf_counter() - start
+            local[name]["latencies"].append(elapsed)
+            if not 200 <= status < 300:
+                local[name]["errors"] += 1
+        with results_lock:
+            for name, data in local.items():
+                results[name]["latencies"].extend(data["latencies"])
+                results[name]["errors"] += data["errors"]
+
+    threads = [
+        threading.Thread(target=worker, args=(i,)) for i in range(concurrency)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - start
+
+
+def summarize(results, elapsed):
+    endpoints = {}
+    total = 0
+    for name, data in results.items():
+        latencies = sorted(data["latencies"])
+        total += len(latencies)
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": data["errors"],
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": _ms(percentile(latencies, 0.50)),
+            "p95_ms": _ms(percentile(latencies, 0.95)),
+            "p99_ms": _ms(percentile(latencies, 0.99)),
+        }
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--email-prefix", default="load")
+    parser.add_argument("--password", default="loadtest123")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument(
+        "--routes",
+        help="Comma separated route names to replay, all routes by default.",
+    )
+    parser.add_argument("--output", default="loadgen.json")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    routes = ROUTES
+    if args.routes:
+        selected = set(args.routes.split(","))
+        routes = [route for route in ROUTES if route[0] in selected]
+
+    rng = random.Random(args.seed)
+    numbers = rng.sample(range(args.users), min(args.users, args.concurrency * 4))
+    sessions = [
+        Session(
+            args.base_url,
+            "%s%d@example.com" % (args.email_prefix, n),
+            args.password,
+        )
+        for n in numbers
+    ]
+    for session in sessions:
+        session.login()
+        session.discover()
+
+    results, elapsed = run(sessions, routes, args.concurrency, args.duration)
+    summary = summarize(results, elapsed)
+    summary["config"] = {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "sessions": len(sessions),
+        "routes": [route[0] for route in routes],
+    }
+
+    with open(args.output, "w") as output:
+        json.dump(summary, output, indent=2)
+
+    print(
+        "%-24s %8s %8s %9s %9s %9s"
+        % ("endpoint", "reqs", "rps", "p50 ms", "p95 ms", "p99 ms")
+    )
+    for name, data in summary["endpoints"].items():
+        print(
+            "%-24s %8d %8.1f %9s %9s %9s"
+            % (
+                name,
+                data["requests"],
+                data["throughput_rps"],
+                data["p50_ms"],
+                data["p95_ms"],
+                data["p99_ms"],
+            )
+        )
+    print(
+        "Total %.1f req/s, results written to %s"
+        % (summary["throughput_rps"], args.output)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark the cost of recording metrics and of a scrape.
+
+    python -m benchmarks.metrics [--number N]
+"""
+import argparse
+import shutil
+import tempfile
+
+from . import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    setup_django()
+
+    from django.conf import settings
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from core import metrics
+    from core.middleware import MetricsMiddleware
+
+    settings.METRICS_DIR = directory
+    try:
+        registry = metrics.Registry(directory=directory, ident="bench")
+        counter = metrics.Counter("bench_total", "Bench.", ["route"], registry=registry)
+        histogram = metrics.Histogram(
+            "bench_seconds", "Bench.", ["method", "route", "status"], registry=registry
+        )
+
+        report(
+            "Counter.inc",
+            measure(lambda: counter.inc("budget:budget-list"), args.number),
+        )
+        report(
+            "Histogram.observe",
+            measure(
+                lambda: histogram.observe(0.012, "GET", "budget:budget-list", "200"),
+                args.number,
+            ),
+        )
+
+        request = RequestFactory().get("/api/budget/budgets/")
+        request.resolver_match = resolve("/api/budget/budgets/")
+        response = HttpResponse()
+        middleware = MetricsMiddleware(lambda request: response)
+        baseline = measure(lambda: response, args.number)
+        report(
+            "MetricsMiddleware overhead",
+            measure(lambda: middleware(request), args.number) - baseline,
+        )
+
+        for worker in range(args.workers):
+            worker_registry = metrics.Registry(directory=directory, ident=worker)
+            worker_histogram = metrics.Histogram(
+                "bench_seconds",
+                "Bench.",
+                ["method", "route", "status"],
+                registry=worker_registry,
+            )
+            for route in range(50):
+                for status in ("200", "201", "400", "404"):
+                    worker_histogram.observe(0.01, "GET", "route-%d" % route, status)
+        report(
+            "Scrape of %d workers" % args.workers,
+            measure(registry.render, 100),
+        )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark single-flight coalescing of a slow computation.
+
+Every thread of every process asks for the same key at once, the benchmark
+reports how many computations ran and the wall time, with and without
+coalescing. It needs the configured PostgreSQL database.
+
+    python -m benchmarks.singleflight [--processes P] [--threads T]
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+
+from . import setup_django
+
+
+def _run_process(mode, threads, delay, barrier, computations):
+    from django.db import connections
+
+    from core import singleflight
+
+    connections.close_all()
+
+    def compute():
+        with computations.get_lock():
+            computations.value += 1
+        time.sleep(delay)
+        return {"delay": delay}
+
+    def call():
+        try:
+            if mode == "direct":
+                compute()
+            elif mode == "process":
+                singleflight._group.do("bench", compute, 30)
+            else:
+                singleflight.coalesce("bench", compute)
+        finally:
+            connections.close_all()
+
+    barrier.wait()
+    workers = [threading.Thread(target=call) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def run(mode, processes, threads, delay):
+    barrier = multiprocessing.Barrier(processes + 1)
+    computations = multiprocessing.Value("i", 0)
+    children = [
+        multiprocessing.Process(
+            target=_run_process,
+            args=(mode, threads, delay, barrier, computations),
+        )
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for child in children:
+        child.join()
+    return computations.value, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connections
+
+    connections.close_all()
+    for mode in ("direct", "process", "workers"):
+        computations, seconds = run(mode, args.processes, args.threads, args.delay)
+        print(
+            "%-10s %4d requests %4d computations %8.3f s"
+            % (mode, args.processes * args.threads, computations, seconds)
+        )
+
+
+if __name__ == "__main__":
+    main()
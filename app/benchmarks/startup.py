@@ -0,0 +1,110 @@
+"""
+Benchmark the time from container start to the first successful response.
+
+Run the startup sequence of ``scripts/run.sh`` with uwsgi serving HTTP, log
+in as a user created by ``manage.py seed_load`` and report when the first
+API response succeeded and the latency of the first requests of every
+worker. The legacy variant runs ``wait_for_db`` and a full ``migrate`` as
+separate commands and disables the warmup.
+
+    python -m benchmarks.startup [--runs N] [--email lg0@example.com]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import time
+from statistics import median
+
+UWSGI = (
+    "uwsgi --http-socket 127.0.0.1:{port} --workers 4 --master "
+    "--enable-threads --module config.wsgi --disable-logging"
+)
+VARIANTS = {
+    "legacy": (
+        "python manage.py wait_for_db && python manage.py migrate && exec "
+        + UWSGI,
+        {"WARMUP": "0", "DB_CONN_MAX_AGE": "0"},
+    ),
+    "fast": ("python manage.py migrate_if_needed --wait && exec " + UWSGI, {}),
+}
+
+
+def request(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = "Bearer %s" % token
+    start = time.perf_counter()
+    try:
+        conn.request(method, path, body=body and json.dumps(body), headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, data, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def run(command, env, port, credentials, probes):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command.format(port=port),
+        shell=True,
+        env=dict(os.environ, **env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        while True:
+            try:
+                status, data, _ = request(port, "POST", "/api/token/", credentials)
+            except OSError:
+                status = None
+            if status == 200:
+                break
+            if process.poll() is not None:
+                raise RuntimeError("Server exited with %s." % process.returncode)
+            time.sleep(0.01)
+        ready = time.perf_counter() - start
+        token = json.loads(data)["access"]
+        # Fresh connections spread over the workers, each still cold.
+        latencies = [
+            request(port, "GET", "/api/budget/budgets/", token=token)[2]
+            for _ in range(probes)
+        ]
+        return ready, latencies
+    finally:
+        os.killpg(process.pid, signal.SIGINT)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--probes", type=int, default=8)
+    parser.add_argument("--email", default="load0@example.com")
+    parser.add_argument("--password", default="loadtest123")
+    args = parser.parse_args()
+
+    credentials = {"email": args.email, "password": args.password}
+    for name, (command, env) in VARIANTS.items():
+        ready = []
+        first = []
+        for _ in range(args.runs):
+            seconds, latencies = run(
+                command, env, args.port, credentials, args.probes
+            )
+            ready.append(seconds)
+            first.append(max(latencies))
+        print(
+            "%-8s first response %7.3f s   slowest cold request %7.1f ms"
+            % (name, median(ready), median(first) * 1e3)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark holding idle event streams in one async process.
+
+Start uvicorn, open ``--connections`` streams for as many users and report
+the memory of the server per stream and the CPU it uses while they idle.
+Then post transactions for random users and measure the time until their
+stream delivers the change.
+
+    python -m benchmarks.streams [--connections N] [--rounds N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import subprocess
+import time
+from statistics import quantiles
+
+from . import setup_django
+
+UVICORN = (
+    "exec uvicorn config.asgi:application --host 127.0.0.1 --port {port} "
+    "--no-access-log --backlog 4096"
+)
+
+
+def read_rss(pid):
+    with open("/proc/%d/status" % pid) as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+
+def read_cpu(pid):
+    with open("/proc/%d/stat" % pid) as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def start_server(port):
+    process = subprocess.Popen(
+        UVICORN.format(port=port),
+        shell=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server didn't start.")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGINT)
+    process.wait()
+
+
+async def open_stream(port, token):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"GET /api/budget/stream/ HTTP/1.1\r\nHost: localhost\r\n"
+        b"Authorization: Bearer %s\r\n\r\n" % token.encode()
+    )
+    await writer.drain()
+    headers = await reader.readuntil(b"\r\n\r\n")
+    if not headers.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(headers.decode())
+    return reader, writer
+
+
+async def wait_event(reader):
+    while b"event: changes" not in await reader.readline():
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--idle", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from decimal import Decimal
+
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.models import Budget, Category, Transaction
+
+    budgets = list(
+        Budget.objects.filter(user__email__startswith="load")
+        .select_related("user")
+        .order_by("user_id", "pk")
+        .distinct("user_id")[: args.connections]
+    )
+    if len(budgets) < args.connections:
+        raise SystemExit("Only %d users with budgets." % len(budgets))
+    categories = dict(
+        Category.objects.filter(user__in=[b.user_id for b in budgets])
+        .order_by("user_id", "pk")
+        .distinct("user_id")
+        .values_list("user_id", "pk")
+    )
+    budgets = [b for b in budgets if b.user_id in categories]
+    tokens = [str(AccessToken.for_user(b.user)) for b in budgets]
+
+    def post(budget):
+        return Transaction.objects.create(
+            budget=budget,
+            category_id=categories[budget.user_id],
+            amount=Decimal("-1"),
+        )
+
+    async def run(pid):
+        base = read_rss(pid)
+        semaphore = asyncio.Semaphore(100)
+
+        async def connect(token):
+            async with semaphore:
+                return await open_stream(args.port, token)
+
+        start = time.perf_counter()
+        streams = await asyncio.gather(*(connect(token) for token in tokens))
+        print(
+            "Opened %d streams in %.1f s"
+            % (len(streams), time.perf_counter() - start)
+        )
+        # Let the catch-up reads settle.
+        await asyncio.sleep(5)
+        rss = read_rss(pid)
+        print(
+            "Server RSS: %.1f MB idle, %.1f MB with streams, %.1f kB per stream"
+            % (base / 2**20, rss / 2**20, (rss - base) / len(streams) / 1024)
+        )
+
+        # Drain heartbeats, so only events are waited for later.
+        drains = [asyncio.ensure_future(r.read(2**16)) for r, _ in streams]
+        cpu = read_cpu(pid)
+        await asyncio.sleep(args.idle)
+        print(
+            "Server CPU while idle: %.2f%%" % ((read_cpu(pid) - cpu) / args.idle * 100)
+        )
+        for drain in drains:
+            drain.cancel()
+
+        latencies = []
+        created = []
+        for _ in range(args.rounds):
+            index = random.randrange(len(budgets))
+            reader = streams[index][0]
+            start = time.perf_counter()
+            created.append(await asyncio.to_thread(post, budgets[index]))
+            await asyncio.wait_for(wait_event(reader), 10)
+            latencies.append(time.perf_counter() - start)
+        percentiles = quantiles(latencies, n=100)
+        print(
+            "Write to event: p50 %.1f ms, p99 %.1f ms"
+            % (percentiles[49] * 1e3, percentiles[98] * 1e3)
+        )
+
+        for _, writer in streams:
+            writer.close()
+        for item in created:
+            await asyncio.to_thread(item.delete)
+
+    process = start_server(args.port)
+    try:
+        asyncio.run(run(process.pid))
+    finally:
+        stop_server(process)
+
+
+if __name__ == "__main__":
+    main()
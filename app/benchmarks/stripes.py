@@ -0,0 +1,85 @@
+"""
+Benchmark concurrent writes to one budget, with and without balance stripes.
+
+Each thread posts ``--writes`` transactions to the same budget, one per
+database transaction, in a category of its own so only the balance is
+shared. The benchmark reports the writes per second for each number of
+threads, with the balance updated in place and with ``--stripes`` stripes.
+It needs the configured PostgreSQL database.
+
+    python -m benchmarks.stripes [--threads 1,4,16] [--writes N] [--stripes K]
+"""
+import argparse
+import threading
+import time
+
+from . import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--stripes", type=int, default=16)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from decimal import Decimal
+
+    from django.contrib.auth import get_user_model
+    from django.db import connections
+
+    from core.ledger import fold_balance_stripes, post_transactions
+    from core.models import Budget, Category, Transaction
+
+    User = get_user_model()
+    user = User.objects.filter(email="stripes@example.com").first()
+    if user is None:
+        user = User.objects.create_user(email="stripes@example.com", password="x")
+    threads = [int(value) for value in args.threads.split(",")]
+    categories = [
+        Category.objects.for_user(user).get_or_create(
+            user=user, name="Import %d" % i, category_type="Income"
+        )[0]
+        for i in range(max(threads))
+    ]
+
+    def write(budget, category):
+        try:
+            for _ in range(args.writes):
+                post_transactions(
+                    [
+                        Transaction(
+                            budget=budget, category=category, amount=Decimal("1")
+                        )
+                    ]
+                )
+        finally:
+            connections.close_all()
+
+    print("%8s %8s %14s" % ("threads", "stripes", "writes/s"))
+    for count in threads:
+        for stripes in [0, args.stripes]:
+            budget = Budget.objects.create(
+                user=user, currency="USD", balance_stripes=stripes
+            )
+            workers = [
+                threading.Thread(target=write, args=(budget, categories[i]))
+                for i in range(count)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - start
+            fold_balance_stripes([budget.pk])
+            budget.refresh_from_db()
+            assert budget.balance == count * args.writes
+            print("%8d %8d %14.0f" % (count, stripes, count * args.writes / seconds))
+            budget.delete()
+
+
+if __name__ == "__main__":
+    main()
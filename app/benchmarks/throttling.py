@@ -0,0 +1,91 @@
+"""
+Benchmark the cost of a throttle check.
+
+Measure a bare bucket update, both default DRF throttles on a request and
+the throughput of several processes charging buckets of the same file.
+
+    python -m benchmarks.throttling [--number N] [--processes P]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from . import measure, report, setup_django
+
+
+def _hammer(path, number, seconds):
+    from core.throttling import BucketStore
+
+    store = BucketStore(path)
+    start = time.perf_counter()
+    for i in range(number):
+        store.consume("user:%d" % (i % 1000), 1000, 1000)
+    seconds.value = time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "throttle.db")
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.models import AnonymousUser
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from core.throttling import (
+        BucketStore,
+        IPTokenBucketThrottle,
+        UserTokenBucketThrottle,
+    )
+
+    settings.THROTTLE_FILE = path
+    store = BucketStore(path)
+    report(
+        "BucketStore.consume",
+        measure(lambda: store.consume("user:1", 1e6, 1e6), args.number),
+    )
+
+    class User:
+        pk = 1
+        is_authenticated = True
+
+    class View:
+        throttle_scope = "transactions"
+
+    request = Request(APIRequestFactory().get("/api/budget/transactions/"))
+    request.user = User()
+    throttles = [UserTokenBucketThrottle(), IPTokenBucketThrottle()]
+
+    def check():
+        for throttle in throttles:
+            throttle.allow_request(request, View)
+
+    report("User and IP throttle check", measure(check, args.number))
+    request.user = AnonymousUser()
+    report("Anonymous throttle check", measure(check, args.number))
+
+    results = [multiprocessing.Value("d") for _ in range(args.processes)]
+    processes = [
+        multiprocessing.Process(target=_hammer, args=(path, args.number, result))
+        for result in results
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    report(
+        "consume with %d processes" % args.processes,
+        max(result.value for result in results) / args.number,
+    )
+
+
+if __name__ == "__main__":
+    main()
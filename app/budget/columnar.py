@@ -0,0 +1,71 @@
+"""
+Columnar representation of the list endpoints.
+
+A list requested with ``?format=columnar`` or
+``Accept: application/vnd.columnar+json`` returns one array per field
+instead of one object per row, which repeats every key:
+
+    {"count": 2, "columns": {"id": [7, 6], "amount": ["12.00", "3.50"],
+     "category": {"dictionary": [4], "codes": [0, 0]}}}
+
+Fields listed in ``columnar_dictionary`` are dictionary encoded: the
+distinct values once, and per row the index of its value. The columns are
+transposed straight from ``values_list()`` rows, without model instances,
+serializers or a dict per row.
+"""
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+class ColumnarRenderer(JSONRenderer):
+    media_type = "application/vnd.columnar+json"
+    format = "columnar"
+
+
+def get_columns(queryset, fields, dictionary=()):
+    """Return the rows of ``queryset`` as columns.
+
+    ``fields`` maps the names of the columns to lookups or expressions of
+    ``values_list()``, ``dictionary`` names the columns to encode.
+    """
+    rows = list(queryset.values_list(*fields.values()))
+    columns = {}
+    for name, values in zip(fields, zip(*rows) if rows else [()] * len(fields)):
+        values = list(values)
+        # Decimals as strings, as the JSON representation has them.
+        if values and isinstance(values[0], Decimal):
+            values = [str(value) for value in values]
+        if name in dictionary:
+            codes = {}
+            values = [codes.setdefault(value, len(codes)) for value in values]
+            columns[name] = {"dictionary": list(codes), "codes": values}
+        else:
+            columns[name] = values
+    return {"count": len(rows), "columns": columns}
+
+
+class ColumnarListMixin:
+    """Offer the columnar representation of ``list()``.
+
+    ``columnar_fields`` maps the columns to lookups, ``columnar_dictionary``
+    names the columns to dictionary encode.
+    """
+
+    columnar_fields = {}
+    columnar_dictionary = ()
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action == "list":
+            renderers.append(ColumnarRenderer())
+        return renderers
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != ColumnarRenderer.format:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(
+            get_columns(queryset, self.columnar_fields, self.columnar_dictionary)
+        )
@@ -0,0 +1,52 @@
+"""
+Pages of the changes feed, read by the changes view and the event stream.
+"""
+from collections import defaultdict
+
+from core.changes import START, SYNCED_MODELS, format_cursor, read_changes
+from core.ledger import annotate_unfolded
+from core.models import Budget
+from core.sharding import get_shard
+
+FEED_KEYS = {
+    "budget": "budgets",
+    "category": "categories",
+    "transaction": "transactions",
+}
+
+
+def get_page(user, cursor, limit):
+    """Return a page of changes of ``user`` for ``ChangesSerializer``.
+
+    ``user`` is a user or the id of one. ``cursor`` is a cursor and its
+    shard, as returned by ``parse_cursor()``.
+    """
+    cursor, shard = cursor
+    using = get_shard(user)
+    user_id = getattr(user, "pk", user)
+    if shard != using:
+        # The user moved since, the client syncs again from the start.
+        cursor = START
+    changes, cursor, has_more = read_changes(user_id, cursor, limit, using=using)
+
+    updated = defaultdict(list)
+    deleted = defaultdict(list)
+    for change in changes:
+        ids = deleted if change.deleted else updated
+        ids[change.model].append(change.object_id)
+
+    data = {
+        "cursor": format_cursor(cursor, using),
+        "has_more": has_more,
+        "deleted": {},
+    }
+    for name, model in SYNCED_MODELS.items():
+        key = FEED_KEYS[name]
+        ids = updated[name]
+        # A row deleted since its change was read has a tombstone ahead.
+        rows = model.objects.using(using).filter(pk__in=ids).order_by("pk")
+        if model is Budget:
+            rows = annotate_unfolded(rows)
+        data[key] = rows if ids else []
+        data["deleted"][key] = deleted[name]
+    return data
@@ -0,0 +1,110 @@
+"""
+Background jobs for the budget APIs.
+"""
+import csv
+import io
+import tempfile
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from core import jobs
+from core.ledger import post_transactions
+from core.models import Transaction
+from core.sharding import get_shard
+
+from . import serializers
+
+EXPORT_COLUMNS = ["id", "budget", "category", "amount", "notes", "created"]
+EXPORT_NAME = "exports/transactions-%d.csv"
+PROGRESS_EVERY = 5000
+IMPORT_CHUNK_SIZE = 1000
+
+
+@jobs.register(
+    "export_transactions",
+    public=True,
+    serializer=serializers.ExportTransactionsSerializer,
+)
+def export_transactions(job):
+    """Export the transactions of the job user to a CSV file.
+
+    Rows are written to a temporary file as they are read and the file is
+    then copied to the default storage in chunks. The result only refers to
+    it, the job download API serves it.
+    """
+    queryset = Transaction.objects.for_user(job.user_id)
+    if job.payload.get("budget"):
+        queryset = queryset.filter(budget_id=job.payload["budget"])
+
+    total = queryset.count()
+    job.set_progress(0, total)
+
+    rows = queryset.order_by("created", "id").values_list(
+        "id", "budget_id", "category_id", "amount", "notes", "created"
+    )
+    count = 0
+    with tempfile.TemporaryFile() as file:
+        output = io.TextIOWrapper(file, encoding="utf-8", newline="")
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_COLUMNS)
+        for count, row in enumerate(rows.iterator(chunk_size=2000), 1):
+            writer.writerow(row)
+            if count % PROGRESS_EVERY == 0:
+                job.set_progress(count)
+        output.detach()
+        file.seek(0)
+        # A retried job replaces the file of its previous attempt.
+        name = EXPORT_NAME % job.pk
+        default_storage.delete(name)
+        name = default_storage.save(name, File(file))
+    job.set_progress(count)
+
+    return {
+        "count": count,
+        "content_type": "text/csv",
+        "file": name,
+        "size": default_storage.size(name),
+    }
+
+
+@jobs.register(
+    "import_transactions",
+    public=True,
+    serializer=serializers.ImportTransactionsSerializer,
+)
+def import_transactions(job):
+    """Create transactions from the payload in chunks.
+
+    Every chunk commits together with the job progress, so a retried job
+    resumes after the last imported chunk instead of importing twice.
+    """
+    budget = job.payload["budget"]
+    rows = job.payload["transactions"]
+    using = get_shard(job.user_id)
+    job.set_progress(job.progress_current, len(rows))
+
+    for start in range(job.progress_current, len(rows), IMPORT_CHUNK_SIZE):
+        chunk = rows[start:start + IMPORT_CHUNK_SIZE]
+        transactions = []
+        for row in chunk:
+            item = Transaction(
+                budget_id=budget,
+                category_id=row["category"],
+                amount=Decimal(row["amount"]),
+                notes=row.get("notes", ""),
+            )
+            if row.get("created"):
+                item.created = parse_datetime(row["created"])
+            transactions.append(item)
+        # On another shard than the job, a chunk commits before the
+        # progress and may be imported again after a crash in between.
+        with transaction.atomic(using=using), transaction.atomic():
+            post_transactions(transactions, using=using)
+            job.set_progress(start + len(chunk))
+
+    return {"count": len(rows)}
+
@@ -1,15 +1,46 @@
 """
 Serializers for the Budget APIs.
 """
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
 from rest_framework import serializers
 
+from core.changes import START, parse_cursor
+from core.transfers import convert
+from core.sharding import get_shard
 from core.models import (
     Budget,
     Category,
+    LimitAlert,
+    RecurringRule,
+    SpendingLimit,
     Transaction,
+    Transfer,
 )
 
 
+class OwnedRelatedFieldsMixin:
+    """Limit writable related fields to objects of the requesting user."""
+
+    owned_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        # Schema generation builds serializers for an anonymous request.
+        if request is not None and request.user.is_authenticated:
+            for name, lookup in self.owned_fields.items():
+                field = fields.get(name)
+                if field is not None and not field.read_only:
+                    field.queryset = field.queryset.using(
+                        get_shard(request.user)
+                    ).filter(**{lookup: request.user})
+        return fields
+
+
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for categories."""
 
@@ -19,24 +50,384 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user"]
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(OwnedRelatedFieldsMixin, serializers.ModelSerializer):
     """Serializer for the transactions."""
 
+    owned_fields = {"category": "user"}
+
     class Meta:
         model = Transaction
         fields = ["id", "budget", "category", "amount", "notes"]
         read_only_fields = ["id", "budget"]
 
 
+class TransactionCreateSerializer(TransactionSerializer):
+    """Serializer for new transactions, with the anomaly score of the amount."""
+
+    owned_fields = {"budget": "user", "category": "user"}
+
+    anomaly_score = serializers.FloatField(
+        read_only=True,
+        allow_null=True,
+        help_text="Amount in multiples of the median amount of the budget in "
+        "the category, null while it has few transactions.",
+    )
+
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ["anomaly_score"]
+        read_only_fields = ["id"]
+
+
+class TransferSerializer(OwnedRelatedFieldsMixin, serializers.ModelSerializer):
+    """Serializer for transfers between budgets of the user."""
+
+    owned_fields = {"source": "user", "target": "user"}
+
+    source = serializers.PrimaryKeyRelatedField(
+        queryset=Budget.objects.all(), write_only=True
+    )
+    target = serializers.PrimaryKeyRelatedField(
+        queryset=Budget.objects.all(), write_only=True
+    )
+    amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal("0.01"), write_only=True
+    )
+    rate = serializers.DecimalField(
+        max_digits=18,
+        decimal_places=8,
+        min_value=Decimal("0.00000001"),
+        required=False,
+        help_text="Units of the target currency per unit of the source "
+        "currency, required if they differ.",
+    )
+    notes = serializers.CharField(
+        required=False, allow_blank=True, default="", write_only=True
+    )
+    debit = TransactionSerializer(read_only=True)
+    credit = TransactionSerializer(read_only=True)
+
+    class Meta:
+        model = Transfer
+        fields = [
+            "id",
+            "source",
+            "target",
+            "amount",
+            "rate",
+            "notes",
+            "debit",
+            "credit",
+            "created",
+        ]
+        read_only_fields = ["id", "created"]
+
+    def validate(self, attrs):
+        source, target = attrs["source"], attrs["target"]
+        if source == target:
+            raise serializers.ValidationError("Transfer to another budget.")
+        if source.currency == target.currency:
+            if attrs.get("rate", 1) != 1:
+                raise serializers.ValidationError(
+                    {"rate": "The budgets have the same currency."}
+                )
+            attrs["rate"] = Decimal("1")
+        elif "rate" not in attrs:
+            raise serializers.ValidationError(
+                {"rate": "Required for budgets in different currencies."}
+            )
+        converted = convert(attrs["amount"], attrs["rate"])
+        if not converted:
+            raise serializers.ValidationError({"amount": "Converts to nothing."})
+        field = Transaction._meta.get_field("amount")
+        if abs(converted) >= 10 ** (field.max_digits - field.decimal_places):
+            raise serializers.ValidationError(
+                {"amount": "Converts to more than a transaction can hold."}
+            )
+        return attrs
+
+
+class CategoryStatsSerializer(serializers.Serializer):
+    """Statistics of the amounts of a budget in a category."""
+
+    budget = serializers.IntegerField()
+    count = serializers.IntegerField()
+    mean = serializers.FloatField()
+    variance = serializers.FloatField()
+    median = serializers.FloatField(allow_null=True)
+    p90 = serializers.FloatField(allow_null=True)
+    p99 = serializers.FloatField(allow_null=True)
+
+
 class BudgetSerializer(serializers.ModelSerializer):
     """Serializer for Budgets."""
 
     class Meta:
         model = Budget
-        fields = ["id", "user", "currency", "balance"]
+        fields = ["id", "user", "currency", "balance", "balance_stripes"]
         read_only_fields = ["id", "user"]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["balance"] = self.fields["balance"].to_representation(
+            instance.current_balance
+        )
+        return data
+
+
+class BudgetSummarySerializer(BudgetSerializer):
+    """Balance and month-to-date totals of a budget."""
+
+    month_income = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+    month_expense = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+    transaction_count = serializers.IntegerField(read_only=True)
+
+    class Meta(BudgetSerializer.Meta):
+        fields = BudgetSerializer.Meta.fields + [
+            "month_income",
+            "month_expense",
+            "transaction_count",
+        ]
+
 
 class BudgetDetailSerializer(BudgetSerializer):
     class Meta(BudgetSerializer.Meta):
         fields = BudgetSerializer.Meta.fields
+
+
+class BalanceAtQuerySerializer(serializers.Serializer):
+    """Parameters of a budget detail."""
+
+    balance_at = serializers.DateTimeField(
+        required=False, help_text="Return the balance at this time instead."
+    )
+
+
+class ForecastQuerySerializer(serializers.Serializer):
+    """Parameters of a balance forecast."""
+
+    months = serializers.ChoiceField(choices=[3, 6, 12], default=3)
+
+
+class ForecastSerializer(serializers.Serializer):
+    """Daily balances of a budget forecast from its history."""
+
+    start = serializers.DateField(help_text="Day of the first balance.")
+    balances = serializers.ListField(child=serializers.FloatField())
+
+
+class BalanceSeriesQuerySerializer(serializers.Serializer):
+    """Parameters of a balance time series."""
+
+    start = serializers.DateTimeField(
+        required=False, help_text="Defaults to a year before the end."
+    )
+    end = serializers.DateTimeField(required=False, help_text="Defaults to now.")
+    points = serializers.IntegerField(min_value=4, max_value=5000, default=500)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.now())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=365))
+        if attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError("The start must be before the end.")
+        return attrs
+
+
+class BalanceSeriesSerializer(serializers.Serializer):
+    """Balances of a budget over time, downsampled to about ``points``."""
+
+    times = serializers.ListField(child=serializers.DateTimeField())
+    balances = serializers.ListField(
+        child=serializers.DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """Parameters of the changes feed."""
+
+    cursor = serializers.CharField(
+        required=False,
+        help_text="Cursor returned by the previous sync, omitted for a full sync.",
+    )
+    limit = serializers.IntegerField(
+        required=False, default=500, min_value=1, max_value=1000
+    )
+
+    def validate_cursor(self, value):
+        try:
+            return parse_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid cursor.")
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        # Matches no shard, so the sync starts from the beginning.
+        attrs.setdefault("cursor", (START, None))
+        return attrs
+
+
+class DeletedSerializer(serializers.Serializer):
+    """Ids of deleted rows."""
+
+    budgets = serializers.ListField(child=serializers.IntegerField())
+    categories = serializers.ListField(child=serializers.IntegerField())
+    transactions = serializers.ListField(child=serializers.IntegerField())
+
+
+class ChangesSerializer(serializers.Serializer):
+    """Rows created, updated or deleted since a cursor."""
+
+    cursor = serializers.CharField()
+    has_more = serializers.BooleanField()
+    budgets = BudgetSerializer(many=True)
+    categories = CategorySerializer(many=True)
+    transactions = TransactionSerializer(many=True)
+    deleted = DeletedSerializer()
+
+
+class RecurringRuleSerializer(OwnedRelatedFieldsMixin, serializers.ModelSerializer):
+    """Serializer for recurring rules."""
+
+    owned_fields = {"budget": "user", "category": "user"}
+    schedule_fields = ["frequency", "interval", "start"]
+
+    class Meta:
+        model = RecurringRule
+        fields = [
+            "id",
+            "budget",
+            "category",
+            "amount",
+            "notes",
+            "frequency",
+            "interval",
+            "start",
+            "end",
+            "is_active",
+            "next_occurrence",
+        ]
+        read_only_fields = ["id", "next_occurrence"]
+        extra_kwargs = {"interval": {"min_value": 1}}
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            for name in self.schedule_fields:
+                if name in attrs and attrs[name] != getattr(self.instance, name):
+                    raise serializers.ValidationError(
+                        {name: "Schedule of an existing rule can't be changed."}
+                    )
+
+        start = attrs.get("start", getattr(self.instance, "start", None))
+        end = attrs.get("end", getattr(self.instance, "end", None))
+        if start and end and end < start:
+            raise serializers.ValidationError({"end": "End must be after start."})
+
+        return attrs
+
+
+class SpendingLimitSerializer(OwnedRelatedFieldsMixin, serializers.ModelSerializer):
+    """Serializer for monthly spending limits."""
+
+    owned_fields = {"budget": "user", "category": "user"}
+
+    spent = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        source="current_spent",
+        read_only=True,
+        help_text="Spending of the current month.",
+    )
+
+    class Meta:
+        model = SpendingLimit
+        fields = ["id", "budget", "category", "amount", "spent"]
+        read_only_fields = ["id"]
+        extra_kwargs = {"amount": {"min_value": Decimal("0.01")}}
+
+    def validate(self, attrs):
+        budget = attrs.get("budget", getattr(self.instance, "budget", None))
+        category = attrs.get("category", getattr(self.instance, "category", None))
+        if category.category_type != "Expense":
+            raise serializers.ValidationError(
+                {"category": "Limits apply to expense categories."}
+            )
+        limits = SpendingLimit.objects.using(budget._state.db).filter(
+            budget=budget, category=category
+        )
+        if self.instance is not None:
+            limits = limits.exclude(pk=self.instance.pk)
+        if limits.exists():
+            raise serializers.ValidationError(
+                "The budget has a limit in this category."
+            )
+        return attrs
+
+
+class LimitAlertSerializer(serializers.ModelSerializer):
+    """Crossing of a threshold of a spending limit."""
+
+    budget = serializers.IntegerField(source="limit.budget_id")
+    category = serializers.IntegerField(source="limit.category_id")
+    amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, source="limit.amount"
+    )
+
+    class Meta:
+        model = LimitAlert
+        fields = [
+            "id",
+            "limit",
+            "budget",
+            "category",
+            "amount",
+            "period",
+            "threshold",
+            "spent",
+            "created",
+        ]
+        read_only_fields = fields
+
+
+class ExportTransactionsSerializer(OwnedRelatedFieldsMixin, serializers.Serializer):
+    """Payload of the transaction export job."""
+
+    owned_fields = {"budget": "user"}
+
+    budget = serializers.PrimaryKeyRelatedField(
+        queryset=Budget.objects.all(), required=False
+    )
+
+
+class ImportTransactionRowSerializer(serializers.Serializer):
+    """Single transaction of an import."""
+
+    category = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    notes = serializers.CharField(required=False, allow_blank=True, default="")
+    created = serializers.DateTimeField(required=False)
+
+
+class ImportTransactionsSerializer(OwnedRelatedFieldsMixin, serializers.Serializer):
+    """Payload of the transaction import job."""
+
+    owned_fields = {"budget": "user"}
+
+    budget = serializers.PrimaryKeyRelatedField(queryset=Budget.objects.all())
+    transactions = ImportTransactionRowSerializer(many=True, allow_empty=False)
+
+    def validate_transactions(self, rows):
+        ids = {row["category"] for row in rows}
+        owned = set(
+            Category.objects.for_user(self.context["request"].user)
+            .filter(id__in=ids)
+            .values_list("id", flat=True)
+        )
+        missing = ids - owned
+        if missing:
+            raise serializers.ValidationError(
+                "Unknown categories: %s" % ", ".join(map(str, sorted(missing)))
+            )
+        return rows
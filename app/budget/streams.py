@@ -0,0 +1,308 @@
+"""
+Server-sent events of the changes of a user's budgets, categories and
+transactions.
+
+``EventStream`` is an ASGI application mounted at ``PATH`` by
+``config.asgi``, outside Django's request handling, so an idle stream costs
+a coroutine and a few objects instead of a worker. It sends pages of the
+changes feed as ``changes`` events whose id is the cursor after them, so a
+client reconnecting with ``Last-Event-ID`` resumes where it left off. A
+client that synced with the changes feed passes its cursor in ``?cursor=``;
+without one, the stream starts with the changes committed from now on.
+
+One :class:`Hub` per process listens on ``core.changes.CHANNEL`` of every
+shard and wakes the streams of the notified users, which then read the
+feed. Changes are
+only readable once the transactions older than theirs have finished, so a
+stream reads again with backoff until its cursor passes the notified one.
+"""
+import asyncio
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from psycopg2 import Error as Psycopg2Error
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.authentication import CachedJWTAuthentication
+from core.changes import CHANNEL, current_cursor, parse_cursor
+from core.invalidation import INITIAL_DELAY, KEEPALIVES, MAX_DELAY
+from core.sharding import get_shard
+
+from .feed import FEED_KEYS, get_page
+from .serializers import ChangesSerializer
+
+PATH = "/api/budget/stream/"
+PAGE_SIZE = 500
+# Seconds between comments sent on an idle stream, which keep proxies from
+# closing it and reveal dead clients.
+HEARTBEAT = 15
+# Milliseconds a client waits before reconnecting.
+RETRY = 5000
+MAX_READ_DELAY = 2
+
+_hub = None
+
+
+class Subscriber:
+    """Wake-up of one stream, with the newest transaction notified to it."""
+
+    __slots__ = ("event", "txid")
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.txid = 0
+
+    def wake(self, txid):
+        self.txid = max(self.txid, txid)
+        self.event.set()
+
+
+class Hub:
+    """Listener waking the event streams of notified users in one process."""
+
+    def __init__(self, databases=None):
+        self.databases = databases or settings.SHARDS
+        self.subscribers = defaultdict(set)
+        # Set while listening on all databases.
+        self.listening = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self._connected = set()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [
+            self.loop.create_task(self.run(using)) for using in self.databases
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def subscribe(self, user_id):
+        subscriber = Subscriber()
+        self.subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        subscribers = self.subscribers[user_id]
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.subscribers[user_id]
+
+    def notify(self, payload):
+        """Wake the streams of the users in a ``CHANNEL`` message."""
+        txid, user_ids = payload.split(" ")
+        txid = int(txid)
+        for user_id in user_ids.split(","):
+            for subscriber in self.subscribers.get(int(user_id), ()):
+                subscriber.wake(txid)
+
+    def wake_all(self):
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                subscriber.wake(0)
+
+    def connect(self, using):
+        """Open a connection of the hub's own and subscribe to ``CHANNEL``."""
+        wrapper = connections[using]
+        params = {**wrapper.get_connection_params(), **KEEPALIVES}
+        connection = wrapper.get_new_connection(params)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("LISTEN %s" % CHANNEL)
+        return connection
+
+    def _read(self, connection, lost):
+        try:
+            connection.poll()
+        except Psycopg2Error:
+            if not lost.done():
+                lost.set_result(None)
+            return
+        while connection.notifies:
+            self.notify(connection.notifies.pop(0).payload)
+
+    async def run(self, using):
+        delay = INITIAL_DELAY
+        while True:
+            try:
+                connection = await self.loop.run_in_executor(None, self.connect, using)
+            except Psycopg2Error:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_DELAY)
+                continue
+
+            delay = INITIAL_DELAY
+            fd = connection.fileno()
+            lost = self.loop.create_future()
+            self.loop.add_reader(fd, self._read, connection, lost)
+            self._connected.add(using)
+            if len(self._connected) == len(self.databases):
+                self.listening.set()
+            # Messages sent while disconnected are lost.
+            self.wake_all()
+            try:
+                await lost
+            finally:
+                self._connected.discard(using)
+                self.listening.clear()
+                self.loop.remove_reader(fd)
+                connection.close()
+
+
+def get_hub():
+    """Return the hub of the running event loop, starting it if needed."""
+    global _hub
+    if _hub is None or _hub.loop is not asyncio.get_running_loop():
+        _hub = Hub()
+        _hub.start()
+    return _hub
+
+
+def open_stream(headers, query_string):
+    """Return the user and the start cursor and shard of a stream request.
+
+    Raise ``APIException`` if the request is refused.
+    """
+    close_old_connections()
+    authentication = CachedJWTAuthentication()
+    raw_token = authentication.get_raw_token(headers.get(b"authorization", b""))
+    if raw_token is None:
+        raise NotAuthenticated()
+    user = authentication.get_user(authentication.get_validated_token(raw_token))
+
+    # A reconnecting client resends its original URL with the last event id.
+    value = headers.get(b"last-event-id", b"").decode("latin-1")
+    if not value:
+        value = parse_qs(query_string.decode("latin-1")).get("cursor", [""])[0]
+    if not value:
+        shard = get_shard(user)
+        return user, (current_cursor(using=shard), shard)
+    try:
+        return user, parse_cursor(value)
+    except ValueError:
+        raise ParseError("Invalid cursor.")
+
+
+def read_events(user_id, cursor):
+    """Return the events of the changes of a user after ``cursor``.
+
+    Return the encoded events and the cursor after them. Cursors come with
+    their shard, as returned by ``parse_cursor()``.
+    """
+    close_old_connections()
+    events = []
+    while True:
+        data = get_page(user_id, cursor, PAGE_SIZE)
+        cursor = parse_cursor(data["cursor"])
+        if any(data[key] or data["deleted"][key] for key in FEED_KEYS.values()):
+            events.append(
+                b"id: %s\nevent: changes\ndata: %s\n\n"
+                % (
+                    data["cursor"].encode(),
+                    JSONRenderer().render(ChangesSerializer(data).data),
+                )
+            )
+        if not data["has_more"]:
+            return b"".join(events), cursor
+
+
+class EventStream:
+    """ASGI application streaming the changes of the authenticated user."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] != "GET":
+            await self.send_error(
+                send,
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+                {"detail": 'Method "%s" not allowed.' % scope["method"]},
+            )
+            return
+        try:
+            user, cursor = await sync_to_async(open_stream, thread_sensitive=False)(
+                dict(scope["headers"]), scope["query_string"]
+            )
+        except APIException as exc:
+            await self.send_error(send, exc.status_code, {"detail": exc.detail})
+            return
+
+        hub = get_hub()
+        subscriber = hub.subscribe(user.pk)
+        # Catch up from the cursor first.
+        subscriber.wake(0)
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status.HTTP_200_OK,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        # Tells nginx to pass events on right away.
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            await self.send_body(send, b"retry: %d\n\n" % RETRY)
+            stream = asyncio.ensure_future(
+                self.stream(send, user.pk, subscriber, cursor)
+            )
+            disconnect = asyncio.ensure_future(self.wait_disconnect(receive))
+            try:
+                done, _ = await asyncio.wait(
+                    [stream, disconnect], return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                stream.cancel()
+                disconnect.cancel()
+            if stream in done:
+                stream.result()
+        finally:
+            hub.unsubscribe(user.pk, subscriber)
+
+    async def stream(self, send, user_id, subscriber, cursor):
+        read = sync_to_async(read_events, thread_sensitive=False)
+        while True:
+            try:
+                await asyncio.wait_for(subscriber.event.wait(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                await self.send_body(send, b": heartbeat\n\n")
+                continue
+
+            subscriber.event.clear()
+            txid = subscriber.txid
+            delay = INITIAL_DELAY
+            while True:
+                events, cursor = await read(user_id, cursor)
+                if events:
+                    await self.send_body(send, events)
+                # Notified transaction ids are of the shard of the cursor.
+                if cursor[0][0] > txid:
+                    break
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_READ_DELAY)
+
+    async def wait_disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def send_body(self, send, body):
+        await send({"type": "http.response.body", "body": body, "more_body": True})
+
+    async def send_error(self, send, status_code, data):
+        headers = [(b"content-type", b"application/json")]
+        if status_code == status.HTTP_401_UNAUTHORIZED:
+            header = CachedJWTAuthentication().authenticate_header(None)
+            headers.append((b"www-authenticate", header.encode()))
+        await send(
+            {"type": "http.response.start", "status": status_code, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": JSONRenderer().render(data)})
@@ -1,16 +1,25 @@
 """
 Tests for the budget APIs.
 """
+from datetime import timedelta
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.ledger import post_transactions
 from core.models import (
+    BalanceStripe,
     Budget,
+    Category,
+    Job,
+    Transaction,
 )
 
 from budget.serializers import (
@@ -18,12 +27,21 @@ from budget.serializers import (
 )
 
 BUDGETS_URL = reverse("budget:budget-list")
+SUMMARY_URL = reverse("budget:budget-summary")
 
 
 def get_detail_url(budget_id):
     return reverse("budget:budget-detail", args=[budget_id])
 
 
+def get_forecast_url(budget_id):
+    return reverse("budget:budget-forecast", args=[budget_id])
+
+
+def get_balances_url(budget_id):
+    return reverse("budget:budget-balances", args=[budget_id])
+
+
 def create_budget(user, **params):
     defaults = {
         "currency": "UAH",
@@ -42,6 +60,8 @@ def create_user(**params):
 class PublicBudgetAPITest(TestCase):
     """Test unauthorized API requests."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.client = APIClient()
 
@@ -54,6 +74,8 @@ class PublicBudgetAPITest(TestCase):
 class PrivateBudgetAPITest(TestCase):
     """Test authorized API requests."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.client = APIClient()
         self.user = create_user(email="user@example.com", password="testpass123")
@@ -65,7 +87,7 @@ class PrivateBudgetAPITest(TestCase):
 
         res = self.client.get(BUDGETS_URL)
 
-        budgets = Budget.objects.all().order_by("-id")
+        budgets = Budget.objects.for_user(self.user).order_by("-id")
         serializer = BudgetSerializer(budgets, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -78,7 +100,7 @@ class PrivateBudgetAPITest(TestCase):
 
         res = self.client.get(BUDGETS_URL)
 
-        budgets = Budget.objects.filter(user=self.user)
+        budgets = Budget.objects.for_user(self.user)
         serializer = BudgetSerializer(budgets, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -94,7 +116,7 @@ class PrivateBudgetAPITest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
 
-        budget = Budget.objects.get(id=res.data["id"])
+        budget = Budget.objects.for_user(self.user).get(id=res.data["id"])
         for k, v in payload.items():
             self.assertEqual(getattr(budget, k), v)
 
@@ -156,7 +178,25 @@ class PrivateBudgetAPITest(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(Budget.objects.filter(id=budget.id).exists())
+        self.assertFalse(Budget.objects.for_user(self.user).filter(id=budget.id).exists())
+
+    def test_delete_budget_purged_in_background(self):
+        budget = create_budget(user=self.user)
+        Transaction.objects.create(
+            budget=budget,
+            category=Category.objects.create(
+                user=self.user, name="Food", category_type="Expense"
+            ),
+            amount=Decimal("5"),
+        )
+
+        res = self.client.delete(get_detail_url(budget.id))
+
+        job = Job.objects.get(kind="purge_budget")
+        self.assertEqual(res["Location"], reverse("job:job-detail", args=[job.id]))
+        self.assertFalse(Transaction.objects.for_user(self.user).exists())
+        res = self.client.get(get_detail_url(budget.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_delete_other_user_budget_error(self):
         new_user = create_user(email="user2@example.com", password="testpass123")
@@ -166,7 +206,62 @@ class PrivateBudgetAPITest(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertTrue(Budget.objects.filter(id=budget.id).exists())
+        self.assertTrue(Budget.objects.for_user(new_user).filter(id=budget.id).exists())
+
+    def test_striped_balance(self):
+        budget = create_budget(self.user, balance_stripes=4)
+        salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        post_transactions(
+            [Transaction(budget=budget, category=salary, amount=Decimal("25"))]
+        )
+
+        res = self.client.get(BUDGETS_URL)
+        self.assertEqual(Decimal(res.data[0]["balance"]), Decimal("5025"))
+
+        res = self.client.patch(get_detail_url(budget.id), {"currency": "USD"})
+        self.assertEqual(Decimal(res.data["balance"]), Decimal("5025"))
+        budget.refresh_from_db()
+        self.assertEqual(budget.balance, Decimal("5025"))
+        self.assertFalse(BalanceStripe.objects.for_user(self.user).exists())
+
+    def test_too_many_stripes(self):
+        budget = create_budget(self.user)
+
+        res = self.client.patch(get_detail_url(budget.id), {"balance_stripes": 65})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_balance_at(self):
+        budget = create_budget(self.user)
+        salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        now = timezone.now()
+        for days, amount in [(70, "300"), (40, "100"), (10, "200")]:
+            Transaction.objects.create(
+                budget=budget,
+                category=salary,
+                amount=Decimal(amount),
+                created=now - timedelta(days=days),
+            )
+
+        res = self.client.get(
+            get_detail_url(budget.id), {"balance_at": now - timedelta(days=20)}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(res.data["balance"]), Decimal("4800"))
+        res = self.client.get(get_detail_url(budget.id))
+        self.assertEqual(Decimal(res.data["balance"]), Decimal("5000"))
+
+    def test_retrieve_balance_at_invalid(self):
+        budget = create_budget(self.user)
+
+        res = self.client.get(get_detail_url(budget.id), {"balance_at": "March"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_retrieve_budgets_with_range_filter_successful(self):
         Budget.objects.create(user=self.user, currency="UAH", balance=Decimal("50000"))
@@ -194,6 +289,24 @@ class PrivateBudgetAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
 
+    def test_balance_filters_include_stripes(self):
+        budget = create_budget(self.user, balance_stripes=4)
+        create_budget(self.user, balance=Decimal("5025"))
+        salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        post_transactions(
+            [Transaction(budget=budget, category=salary, amount=Decimal("25"))]
+        )
+
+        res1 = self.client.get(BUDGETS_URL, {"balance": "5025"})
+        res2 = self.client.get(BUDGETS_URL, {"balance_range": "5010,5030"})
+        res3 = self.client.get(BUDGETS_URL, {"balance": "5000"})
+
+        self.assertEqual(len(res1.data), 2)
+        self.assertEqual(len(res2.data), 2)
+        self.assertEqual(len(res3.data), 0)
+
     def test_retrieve_budgets_with_currency_filter_successful(self):
         Budget.objects.create(user=self.user, currency="USD", balance=Decimal("25000"))
         Budget.objects.create(user=self.user, currency="UAH", balance=Decimal("30000"))
@@ -202,3 +315,207 @@ class PrivateBudgetAPITest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
+
+
+class BudgetSummaryAPITest(TestCase):
+    """Test the budget summary endpoint."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="testpass123")
+        self.client.force_authenticate(self.user)
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def _create_transaction(self, budget, category, amount, **params):
+        return Transaction.objects.create(
+            budget=budget, category=category, amount=Decimal(amount), **params
+        )
+
+    def test_summary_totals(self):
+        budget = create_budget(self.user)
+        empty = create_budget(self.user)
+        self._create_transaction(budget, self.salary, "1000")
+        self._create_transaction(budget, self.food, "-120.50")
+        self._create_transaction(budget, self.food, "-30")
+        self._create_transaction(
+            budget,
+            self.food,
+            "-999",
+            created=timezone.now() - timedelta(days=40),
+        )
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        summaries = {item["id"]: item for item in res.data}
+        self.assertEqual(summaries[budget.id]["balance"], "5000.00")
+        self.assertEqual(summaries[budget.id]["month_income"], "1000.00")
+        self.assertEqual(summaries[budget.id]["month_expense"], "150.50")
+        self.assertEqual(summaries[budget.id]["transaction_count"], 4)
+        self.assertEqual(summaries[empty.id]["month_income"], "0.00")
+        self.assertEqual(summaries[empty.id]["month_expense"], "0.00")
+        self.assertEqual(summaries[empty.id]["transaction_count"], 0)
+
+    def test_summary_limited_to_user(self):
+        other_user = create_user(email="other@example.com", password="testpass123")
+        create_budget(other_user)
+        budget = create_budget(self.user)
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual([item["id"] for item in res.data], [budget.id])
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(SUMMARY_URL)
+        return len(queries)
+
+    def test_summary_query_count_constant(self):
+        budget = create_budget(self.user)
+        self._create_transaction(budget, self.food, "-10")
+        baseline = self._count_queries()
+
+        for _ in range(5):
+            budget = create_budget(self.user)
+            self._create_transaction(budget, self.salary, "10")
+            self._create_transaction(budget, self.food, "-10")
+
+        self.assertEqual(self._count_queries(), baseline)
+
+
+class BudgetForecastAPITest(TestCase):
+    """Test the budget forecast endpoint."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="testpass123")
+        self.client.force_authenticate(self.user)
+        self.budget = create_budget(self.user)
+        food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+        Transaction.objects.create(
+            budget=self.budget,
+            category=food,
+            amount=Decimal("300"),
+            created=timezone.now() - timedelta(days=10),
+        )
+
+    def test_forecast_daily_balances(self):
+        res = self.client.get(get_forecast_url(self.budget.id), {"months": 6})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        today = timezone.localdate()
+        self.assertEqual(res.data["start"], str(today + timedelta(days=1)))
+        self.assertIn(len(res.data["balances"]), range(181, 185))
+        self.assertEqual(res.data["balances"][0], 4990)
+        self.assertLess(res.data["balances"][-1], res.data["balances"][0])
+
+    def test_forecast_invalid_months(self):
+        res = self.client.get(get_forecast_url(self.budget.id), {"months": 5})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forecast_other_user_budget_not_found(self):
+        other_user = create_user(email="other@example.com", password="testpass123")
+
+        res = self.client.get(get_forecast_url(create_budget(other_user).id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BudgetBalancesAPITest(TestCase):
+    """Test the balance time series endpoint."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="testpass123")
+        self.client.force_authenticate(self.user)
+        self.budget = create_budget(self.user, balance=Decimal("0"))
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        self.now = timezone.now()
+
+    def _create_transactions(self, amounts, days):
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    budget=self.budget,
+                    category=self.salary,
+                    amount=abs(amount),
+                    signed_amount=amount,
+                    created=self.now - timedelta(days=days * (1 - i / len(amounts))),
+                )
+                for i, amount in enumerate(amounts)
+            ]
+        )
+        Budget.objects.for_user(self.user).filter(pk=self.budget.pk).update(
+            balance=sum(amounts)
+        )
+
+    def test_running_balances(self):
+        self._create_transactions([Decimal("100"), Decimal("-30")], days=10)
+
+        res = self.client.get(
+            get_balances_url(self.budget.id),
+            {"start": self.now - timedelta(days=20), "end": self.now},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [Decimal(value) for value in res.data["balances"]], [0, 100, 70, 70]
+        )
+        self.assertEqual(len(res.data["times"]), 4)
+
+    def test_downsampled_keeps_extremes(self):
+        amounts = [Decimal(1)] * 1000
+        amounts[500] = Decimal(-5000)
+        amounts[700] = Decimal(8000)
+        self._create_transactions(amounts, days=5 * 365)
+
+        res = self.client.get(
+            get_balances_url(self.budget.id),
+            {"start": self.now - timedelta(days=5 * 365 + 1), "points": 100},
+        )
+
+        balances = [Decimal(value) for value in res.data["balances"]]
+        self.assertLessEqual(len(balances), 100)
+        self.assertGreater(len(balances), 50)
+        running = [sum(amounts[: i + 1]) for i in range(len(amounts))]
+        self.assertEqual(min(balances), min(running))
+        self.assertEqual(max(balances), max(running))
+        self.assertEqual(balances[-1], sum(amounts))
+        self.assertEqual(res.data["times"], sorted(res.data["times"]))
+
+    def test_downsampled_ends_at_balance(self):
+        amounts = [Decimal(1)] * 997 + [Decimal(100), Decimal(-200), Decimal(50)]
+        self._create_transactions(amounts, days=5 * 365)
+
+        res = self.client.get(
+            get_balances_url(self.budget.id),
+            {"start": self.now - timedelta(days=5 * 365 + 1), "points": 100},
+        )
+
+        balances = [Decimal(value) for value in res.data["balances"]]
+        self.assertEqual(balances[-1], sum(amounts))
+        self.assertNotIn(sum(amounts), balances[:-1])
+
+    def test_invalid_range(self):
+        res = self.client.get(
+            get_balances_url(self.budget.id),
+            {"start": self.now, "end": self.now - timedelta(days=1)},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,8 @@
 """
 Tests for the categories API.
 """
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -8,7 +10,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Category
+from core.ledger import post_transactions
+from core.models import Budget, Category, Transaction
 
 from budget.serializers import CategorySerializer
 
@@ -39,6 +42,8 @@ def create_category(user, **params):
 class PublicCategoriesAPITest(TestCase):
     """Test unauthenticated API requests."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.client = APIClient()
 
@@ -51,6 +56,8 @@ class PublicCategoriesAPITest(TestCase):
 class PrivateCategoryAPITest(TestCase):
     """Test authenticated API requests."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.user = create_user(email="user@example.com", password="testpass123")
         self.client = APIClient()
@@ -62,7 +69,7 @@ class PrivateCategoryAPITest(TestCase):
 
         res = self.client.get(CATEGORIES_URL)
 
-        categories = Category.objects.all().order_by("-name")
+        categories = Category.objects.for_user(self.user).order_by("-name")
         serializer = CategorySerializer(categories, many="True")
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -95,6 +102,23 @@ class PrivateCategoryAPITest(TestCase):
         category.refresh_from_db()
         self.assertEqual(category.name, payload["name"])
 
+    def test_update_category_type_adjusts_balances(self):
+        category = create_category(
+            user=self.user, name="Refunds", category_type="Expense"
+        )
+        budget = Budget.objects.create(user=self.user, currency="USD")
+        post_transactions(
+            [
+                Transaction(budget=budget, category=category, amount=Decimal(amount))
+                for amount in ["10", "5"]
+            ]
+        )
+
+        self.client.patch(get_detail_url(category.id), {"category_type": "Income"})
+
+        budget.refresh_from_db()
+        self.assertEqual(budget.balance, Decimal("15"))
+
     def test_delete_category_successful(self):
         category = create_category(
             user=self.user, name="Spotify Premium", category_type="Expense"
@@ -103,7 +127,7 @@ class PrivateCategoryAPITest(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
-        categories = Category.objects.filter(user=self.user)
+        categories = Category.objects.for_user(self.user)
         self.assertFalse(categories.exists())
 
     def test_delete_other_user_category_error(self):
@@ -116,4 +140,6 @@ class PrivateCategoryAPITest(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertTrue(Category.objects.filter(id=category.id).exists())
+        self.assertTrue(
+            Category.objects.for_user(new_user).filter(id=category.id).exists()
+        )
@@ -0,0 +1,164 @@
+"""
+Tests for the changes feed API.
+
+Changes become visible once the writing transaction is older than every
+running one, so these tests commit their writes.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.ledger import post_transactions
+from core.models import Budget, Category, Transaction
+
+CHANGES_URL = reverse("budget:changes")
+
+
+def create_user(email, password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PublicChangesAPITest(TransactionTestCase):
+    """Tests for unauthenticated requests."""
+
+    databases = "__all__"
+
+    def test_auth_required(self):
+        res = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateChangesAPITest(TransactionTestCase):
+    """Tests for syncing the rows of the authenticated user."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user("user@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def _sync(self, cursor=None, **params):
+        if cursor is not None:
+            params["cursor"] = cursor
+        res = self.client.get(CHANGES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def _create_transaction(self, amount="-10"):
+        return Transaction.objects.create(
+            budget=self.budget, category=self.food, amount=Decimal(amount)
+        )
+
+    def test_full_sync(self):
+        item = self._create_transaction()
+
+        data = self._sync()
+
+        self.assertFalse(data["has_more"])
+        self.assertEqual([b["id"] for b in data["budgets"]], [self.budget.id])
+        self.assertEqual([c["id"] for c in data["categories"]], [self.food.id])
+        self.assertEqual([t["id"] for t in data["transactions"]], [item.id])
+
+    def test_quiet_sync_empty(self):
+        cursor = self._sync()["cursor"]
+
+        data = self._sync(cursor)
+
+        self.assertEqual(data["budgets"], [])
+        self.assertEqual(data["transactions"], [])
+        self.assertEqual(data["deleted"]["transactions"], [])
+
+    def test_only_changes_after_cursor(self):
+        cursor = self._sync()["cursor"]
+        self.food.name = "Groceries"
+        self.food.save()
+
+        data = self._sync(cursor)
+
+        self.assertEqual(data["budgets"], [])
+        self.assertEqual(data["categories"][0]["name"], "Groceries")
+
+    def test_delete_returns_tombstone(self):
+        item = self._create_transaction()
+        item_id = item.id
+        cursor = self._sync()["cursor"]
+
+        item.delete()
+        data = self._sync(cursor)
+
+        self.assertEqual(data["transactions"], [])
+        self.assertEqual(data["deleted"]["transactions"], [item_id])
+
+    def test_cascaded_deletes_return_tombstones(self):
+        item = self._create_transaction()
+        cursor = self._sync()["cursor"]
+
+        budget_id = self.budget.id
+        self.budget.delete()
+        data = self._sync(cursor)
+
+        self.assertEqual(data["deleted"]["budgets"], [budget_id])
+        self.assertEqual(data["deleted"]["transactions"], [item.id])
+
+    def test_posted_transactions_and_balances_synced(self):
+        cursor = self._sync()["cursor"]
+
+        created = post_transactions(
+            [Transaction(budget=self.budget, category=self.food, amount=Decimal("5"))]
+        )
+        data = self._sync(cursor)
+
+        self.assertEqual([t["id"] for t in data["transactions"]], [created[0].id])
+        self.assertEqual(data["budgets"][0]["balance"], "-5.00")
+
+    def test_striped_budgets_without_query_each(self):
+        self.budget.balance_stripes = 4
+        self.budget.save()
+        with CaptureQueriesContext(connection) as queries:
+            self._sync()
+        for _ in range(5):
+            Budget.objects.create(user=self.user, currency="USD", balance_stripes=4)
+
+        with self.assertNumQueries(len(queries)):
+            data = self._sync()
+
+        self.assertEqual(len(data["budgets"]), 6)
+
+    def test_paginated_by_limit(self):
+        items = [self._create_transaction() for _ in range(3)]
+
+        first = self._sync(limit=3)
+        second = self._sync(first["cursor"], limit=3)
+
+        self.assertTrue(first["has_more"])
+        self.assertFalse(second["has_more"])
+        synced = first["transactions"] + second["transactions"]
+        self.assertEqual(
+            sorted(t["id"] for t in synced), sorted(item.id for item in items)
+        )
+
+    def test_other_users_rows_excluded(self):
+        other = create_user("other@example.com")
+        Budget.objects.create(user=other, currency="USD")
+
+        data = self._sync()
+
+        self.assertEqual([b["id"] for b in data["budgets"]], [self.budget.id])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(CHANGES_URL, {"cursor": "soon"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
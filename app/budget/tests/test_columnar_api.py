@@ -0,0 +1,110 @@
+"""
+Tests for the columnar representation of the list APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.ledger import post_transactions
+from core.models import Budget, Category, Transaction
+
+BUDGETS_URL = reverse("budget:budget-list")
+CATEGORIES_URL = reverse("budget:category-list")
+TRANSACTIONS_URL = reverse("budget:transaction-list")
+
+
+def create_user(email, password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class ColumnarAPITest(TestCase):
+    """Test lists requested in the columnar format."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user("user@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+        self.rent = Category.objects.create(
+            user=self.user, name="Rent", category_type="Expense"
+        )
+        for category, amount in [
+            (self.food, "12.50"),
+            (self.rent, "800"),
+            (self.food, "3"),
+        ]:
+            Transaction.objects.create(
+                budget=self.budget, category=category, amount=Decimal(amount)
+            )
+
+    def test_transactions_columnar(self):
+        res = self.client.get(TRANSACTIONS_URL, {"format": "columnar"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/vnd.columnar+json")
+        columns = res.json()["columns"]
+        rows = self.client.get(TRANSACTIONS_URL).json()
+        self.assertEqual(res.json()["count"], 3)
+        self.assertEqual(columns["id"], [row["id"] for row in rows])
+        self.assertEqual(columns["amount"], [row["amount"] for row in rows])
+        self.assertEqual(columns["notes"], ["", "", ""])
+        category = columns["category"]
+        self.assertEqual(len(category["dictionary"]), 2)
+        self.assertEqual(
+            [category["dictionary"][code] for code in category["codes"]],
+            [row["category"] for row in rows],
+        )
+
+    def test_selected_by_accept(self):
+        res = self.client.get(
+            CATEGORIES_URL, HTTP_ACCEPT="application/vnd.columnar+json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        columns = res.json()["columns"]
+        self.assertEqual(sorted(columns["name"]), ["Food", "Rent"])
+        self.assertEqual(columns["category_type"]["dictionary"], ["Expense"])
+
+    def test_limited_to_user(self):
+        other = create_user("other@example.com")
+        Budget.objects.create(user=other, currency="EUR")
+
+        res = self.client.get(BUDGETS_URL, {"format": "columnar"})
+
+        self.assertEqual(res.json()["columns"]["id"], [self.budget.id])
+
+    def test_budget_balance_with_stripes(self):
+        self.budget.balance_stripes = 4
+        self.budget.save()
+        post_transactions(
+            [Transaction(budget=self.budget, category=self.food, amount=Decimal("5"))]
+        )
+
+        res = self.client.get(BUDGETS_URL, {"format": "columnar"})
+
+        self.assertEqual(res.json()["columns"]["balance"], ["-5.00"])
+
+    def test_empty_list(self):
+        Transaction.objects.for_user(self.user).delete()
+
+        res = self.client.get(TRANSACTIONS_URL, {"format": "columnar"})
+
+        self.assertEqual(res.json()["count"], 0)
+        self.assertEqual(res.json()["columns"]["category"]["codes"], [])
+
+    def test_detail_not_columnar(self):
+        url = reverse("budget:budget-detail", args=[self.budget.id])
+
+        res = self.client.get(url, {"format": "columnar"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
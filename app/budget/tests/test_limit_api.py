@@ -0,0 +1,132 @@
+"""
+Tests for the spending limit APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Budget,
+    Category,
+    SpendingLimit,
+    Transaction,
+)
+
+LIMITS_URL = reverse("budget:spendinglimit-list")
+ALERTS_URL = reverse("budget:spendinglimit-alerts")
+TRANSACTIONS_URL = reverse("budget:transaction-list")
+
+
+def get_detail_url(limit_id):
+    return reverse("budget:spendinglimit-detail", args=[limit_id])
+
+
+def create_user(email, password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PublicSpendingLimitAPITest(TestCase):
+    """Test unauthorized API requests."""
+
+    databases = "__all__"
+
+    def test_auth_required(self):
+        res = APIClient().get(LIMITS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSpendingLimitAPITest(TestCase):
+    """Test authorized API requests."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user("user@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="UAH")
+        self.category = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def _payload(self, **params):
+        payload = {
+            "budget": self.budget.id,
+            "category": self.category.id,
+            "amount": "100.00",
+        }
+        payload.update(params)
+        return payload
+
+    def test_create_limit_counts_month(self):
+        Transaction.objects.create(
+            budget=self.budget, category=self.category, amount=Decimal("85")
+        )
+
+        res = self.client.post(LIMITS_URL, self._payload())
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(res.data["spent"]), Decimal("85"))
+        res = self.client.get(ALERTS_URL)
+        self.assertEqual([alert["threshold"] for alert in res.data], [80])
+
+    def test_create_limit_income_category(self):
+        income = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+
+        res = self.client.post(LIMITS_URL, self._payload(category=income.id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_limit_twice(self):
+        self.client.post(LIMITS_URL, self._payload())
+
+        res = self.client.post(LIMITS_URL, self._payload())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SpendingLimit.objects.for_user(self.user).count(), 1)
+
+    def test_create_limit_other_users_budget(self):
+        other = Budget.objects.create(
+            user=create_user("other@example.com"), currency="UAH"
+        )
+
+        res = self.client.post(LIMITS_URL, self._payload(budget=other.id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transaction_writes_alert(self):
+        res = self.client.post(LIMITS_URL, self._payload())
+        url = get_detail_url(res.data["id"])
+        payload = {"budget": self.budget.id, "category": self.category.id}
+
+        self.client.post(TRANSACTIONS_URL, {**payload, "amount": "70"})
+        res = self.client.post(TRANSACTIONS_URL, {**payload, "amount": "40"})
+        self.client.patch(
+            reverse("budget:transaction-detail", args=[res.data["id"]]),
+            {"amount": "5"},
+        )
+
+        res = self.client.get(url)
+        self.assertEqual(Decimal(res.data["spent"]), Decimal("75"))
+        res = self.client.get(ALERTS_URL)
+        self.assertEqual([alert["threshold"] for alert in res.data], [100, 80])
+
+    def test_lower_limit_alerts(self):
+        Transaction.objects.create(
+            budget=self.budget, category=self.category, amount=Decimal("50")
+        )
+        res = self.client.post(LIMITS_URL, self._payload())
+
+        self.client.patch(get_detail_url(res.data["id"]), {"amount": "60"})
+
+        res = self.client.get(ALERTS_URL)
+        self.assertEqual(res.data[0]["threshold"], 80)
+        self.assertEqual(Decimal(res.data[0]["amount"]), Decimal("60"))
@@ -0,0 +1,117 @@
+"""
+Tests for the recurring rule APIs.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Budget,
+    Category,
+    RecurringRule,
+)
+
+RULES_URL = reverse("budget:recurringrule-list")
+
+
+def get_detail_url(rule_id):
+    return reverse("budget:recurringrule-detail", args=[rule_id])
+
+
+def create_user(email, password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PublicRecurringRuleAPITest(TestCase):
+    """Test unauthorized API requests."""
+
+    databases = "__all__"
+
+    def test_auth_required(self):
+        res = APIClient().get(RULES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecurringRuleAPITest(TestCase):
+    """Test authorized API requests."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user("user@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="UAH")
+        self.category = Category.objects.create(
+            user=self.user, name="Rent", category_type="Expense"
+        )
+
+    def _payload(self, **params):
+        payload = {
+            "budget": self.budget.id,
+            "category": self.category.id,
+            "amount": "900.00",
+            "frequency": "monthly",
+            "start": "2030-01-01T09:00:00Z",
+        }
+        payload.update(params)
+        return payload
+
+    def test_create_rule_successful(self):
+        res = self.client.post(RULES_URL, self._payload())
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        rule = RecurringRule.objects.for_user(self.user).get(id=res.data["id"])
+        self.assertEqual(rule.amount, Decimal("900"))
+        self.assertEqual(rule.next_occurrence, rule.start)
+
+    def test_create_rule_for_other_user_budget_error(self):
+        other = create_user("other@example.com")
+        budget = Budget.objects.create(user=other, currency="UAH")
+
+        res = self.client.post(RULES_URL, self._payload(budget=budget.id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecurringRule.objects.for_user(self.user).exists())
+
+    def test_end_before_start_error(self):
+        res = self.client.post(
+            RULES_URL, self._payload(end="2029-01-01T09:00:00Z")
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_schedule_error(self):
+        res = self.client.post(RULES_URL, self._payload())
+        url = get_detail_url(res.data["id"])
+
+        res = self.client.patch(url, {"frequency": "weekly"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(url, {"amount": "950.00"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_rules_limited_to_user(self):
+        other = create_user("other@example.com")
+        RecurringRule.objects.create(
+            budget=Budget.objects.create(user=other, currency="UAH"),
+            category=Category.objects.create(
+                user=other, name="Rent", category_type="Expense"
+            ),
+            amount=Decimal("10"),
+            frequency="daily",
+            start=datetime(2030, 1, 1, 9, tzinfo=timezone.utc),
+        )
+        self.client.post(RULES_URL, self._payload())
+
+        res = self.client.get(RULES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
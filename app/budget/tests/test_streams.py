@@ -0,0 +1,158 @@
+"""
+Tests for the event stream of changes.
+"""
+import asyncio
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from budget import streams
+from core.changes import current_cursor, format_cursor
+from core.models import Budget, Category, Transaction
+
+TIMEOUT = 5
+
+
+def parse_events(body):
+    """Return the data of the ``changes`` events of a stream body."""
+    events = []
+    for block in body.decode().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.split("\n") if ": " in line
+        )
+        if fields.get("event") == "changes":
+            events.append(json.loads(fields["data"]))
+    return events
+
+
+class EventStreamTests(TransactionTestCase):
+    """Test streaming the changes of the authenticated user."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.token = str(AccessToken.for_user(self.user))
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def _connect(self, token=None, query_string=b"", headers=()):
+        token = self.token if token is None else token
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": streams.PATH,
+            "query_string": query_string,
+            "headers": [(b"authorization", b"Bearer " + token.encode()), *headers],
+        }
+        communicator = ApplicationCommunicator(streams.EventStream(), scope)
+        return communicator
+
+    async def _open(self, **kwargs):
+        communicator = self._connect(**kwargs)
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output(TIMEOUT)
+        self.assertEqual(start["status"], 200)
+        await asyncio.wait_for(streams.get_hub().listening.wait(), TIMEOUT)
+        return communicator
+
+    async def _receive_events(self, communicator):
+        body = b""
+        while True:
+            body += (await communicator.receive_output(TIMEOUT))["body"]
+            events = parse_events(body)
+            if events:
+                return events
+
+    async def _close(self, communicator):
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(TIMEOUT)
+        await streams.get_hub().stop()
+
+    def _create_transaction(self):
+        return Transaction.objects.create(
+            budget=self.budget, category=self.food, amount=Decimal("-10")
+        )
+
+    async def test_auth_required(self):
+        communicator = self._connect(token="invalid")
+        await communicator.send_input({"type": "http.request", "body": b""})
+
+        start = await communicator.receive_output(TIMEOUT)
+
+        self.assertEqual(start["status"], 401)
+
+    async def test_invalid_cursor(self):
+        communicator = self._connect(query_string=b"cursor=soon")
+        await communicator.send_input({"type": "http.request", "body": b""})
+
+        start = await communicator.receive_output(TIMEOUT)
+
+        self.assertEqual(start["status"], 400)
+
+    async def test_streams_new_transaction(self):
+        communicator = await self._open()
+
+        item = await sync_to_async(self._create_transaction)()
+        events = await self._receive_events(communicator)
+        await self._close(communicator)
+
+        self.assertEqual([t["id"] for t in events[0]["transactions"]], [item.id])
+
+    async def test_streams_deleted_transaction(self):
+        item = await sync_to_async(self._create_transaction)()
+        item_id = item.id
+        communicator = await self._open()
+
+        await sync_to_async(item.delete)()
+        events = await self._receive_events(communicator)
+        await self._close(communicator)
+
+        self.assertEqual(events[0]["deleted"]["transactions"], [item_id])
+
+    async def test_resumes_from_last_event_id(self):
+        cursor = await sync_to_async(current_cursor)()
+        item = await sync_to_async(self._create_transaction)()
+
+        communicator = await self._open(
+            headers=[(b"last-event-id", format_cursor(cursor).encode())]
+        )
+        events = await self._receive_events(communicator)
+        await self._close(communicator)
+
+        self.assertEqual([t["id"] for t in events[0]["transactions"]], [item.id])
+
+    async def test_disconnect_unsubscribes(self):
+        communicator = await self._open()
+        hub = streams.get_hub()
+        self.assertIn(self.user.id, hub.subscribers)
+
+        await self._close(communicator)
+
+        self.assertNotIn(self.user.id, hub.subscribers)
+
+
+class HubTests(SimpleTestCase):
+    """Test waking the streams of notified users."""
+
+    async def test_notify_wakes_notified_users(self):
+        hub = streams.Hub()
+        notified = hub.subscribe(1)
+        other = hub.subscribe(2)
+
+        hub.notify("42 1,3")
+
+        self.assertTrue(notified.event.is_set())
+        self.assertEqual(notified.txid, 42)
+        self.assertFalse(other.event.is_set())
@@ -2,6 +2,9 @@
 Tests for the transactions APIs.
 """
 from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -12,6 +15,7 @@ from rest_framework import status
 from core.models import (
     Budget,
     Category,
+    CategoryStats,
     Transaction,
 )
 
@@ -39,6 +43,8 @@ def create_category(user, name: str, c_type: str):
 class PublicTransactionAPITest(TestCase):
     """Tests for unauthenticated user requests."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.client = APIClient()
 
@@ -51,6 +57,8 @@ class PublicTransactionAPITest(TestCase):
 class PrivateTransactionAPITest(TestCase):
     """Tests for authenticated user requests."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.user = create_user(email="user@example.com", password="testpass123")
         self.client = APIClient()
@@ -77,7 +85,7 @@ class PrivateTransactionAPITest(TestCase):
 
         res = self.client.get(TRANSACTIONS_URL)
 
-        transactions = Transaction.objects.all().order_by("-created")
+        transactions = Transaction.objects.for_user(self.user).order_by("-created")
         serializer = TransactionSerializer(transactions, many="True")
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -109,6 +117,113 @@ class PrivateTransactionAPITest(TestCase):
         self.assertEqual(Decimal(res.data[0]["amount"]), transaction.amount)
         self.assertEqual(res.data[0]["notes"], transaction.notes)
 
+    def test_create_transaction_scored(self):
+        category = create_category(self.user, "Food", "Expense")
+        for _ in range(5):
+            Transaction.objects.create(
+                budget=self.budget, category=category, amount=Decimal("20")
+            )
+        call_command("rebuild_category_stats", stdout=StringIO())
+        payload = {"budget": self.budget.id, "category": category.id, "amount": "100"}
+
+        res = self.client.post(TRANSACTIONS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertAlmostEqual(res.data["anomaly_score"], 5, delta=0.2)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("49900"))
+        stats = CategoryStats.objects.for_user(self.user).get(category=category)
+        self.assertEqual(stats.count, 6)
+
+    def test_create_transaction_other_users_budget(self):
+        other_budget = Budget.objects.create(
+            user=create_user(email="other@example.com", password="testpass123"),
+            currency="UAH",
+        )
+        category = create_category(self.user, "Food", "Expense")
+        payload = {"budget": other_budget.id, "category": category.id, "amount": "5"}
+
+        res = self.client.post(TRANSACTIONS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transaction.objects.for_user(self.user).exists())
+
+    def test_update_and_delete_adjust_stats(self):
+        category = create_category(self.user, "Food", "Expense")
+        payload = {"budget": self.budget.id, "category": category.id, "amount": "10"}
+        self.client.post(TRANSACTIONS_URL, payload)
+        res = self.client.post(TRANSACTIONS_URL, payload)
+        url = get_detail_url(res.data["id"])
+
+        self.client.patch(url, {"amount": "30"})
+
+        stats = CategoryStats.objects.for_user(self.user).get(category=category)
+        self.assertEqual(stats.count, 2)
+        self.assertAlmostEqual(stats.mean, 20)
+
+        self.client.delete(url)
+
+        stats.refresh_from_db()
+        self.assertEqual(stats.count, 1)
+        self.assertAlmostEqual(stats.mean, 10)
+
+    def _post_expense(self, amount, category=None):
+        category = category or create_category(self.user, "Food", "Expense")
+        payload = {"budget": self.budget.id, "category": category.id, "amount": amount}
+        res = self.client.post(TRANSACTIONS_URL, payload)
+        return get_detail_url(res.data["id"])
+
+    def test_update_amount_adjusts_balance(self):
+        url = self._post_expense("30")
+
+        self.client.patch(url, {"amount": "50"})
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("49950"))
+
+    def test_update_category_adjusts_balance(self):
+        url = self._post_expense("30")
+        deposit = create_category(self.user, "Deposit", "Income")
+
+        self.client.patch(url, {"category": deposit.id})
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("50030"))
+
+    def test_update_other_users_category(self):
+        url = self._post_expense("30")
+        other = create_user(email="other@example.com", password="testpass123")
+        category = create_category(other, "Food", "Expense")
+
+        res = self.client.patch(url, {"category": category.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            CategoryStats.objects.for_user(other).filter(category=category).exists()
+        )
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("49970"))
+
+    def test_update_budget_ignored(self):
+        url = self._post_expense("30")
+        other = Budget.objects.create(user=self.user, currency="UAH")
+
+        res = self.client.patch(url, {"budget": other.id})
+
+        self.assertEqual(res.data["budget"], self.budget.id)
+        self.budget.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("49970"))
+        self.assertEqual(other.balance, 0)
+
+    def test_delete_adjusts_balance(self):
+        url = self._post_expense("30")
+
+        self.client.delete(url)
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("50000"))
+
     def test_update_transaction_successful(self):
         transaction = Transaction.objects.create(
             budget=self.budget,
@@ -137,5 +252,7 @@ class PrivateTransactionAPITest(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
-        transactions = Transaction.objects.filter(budget=self.budget)
+        transactions = Transaction.objects.for_user(self.user).filter(
+            budget=self.budget
+        )
         self.assertFalse(transactions.exists())
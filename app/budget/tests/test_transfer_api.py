@@ -0,0 +1,133 @@
+"""
+Tests for the transfer APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Budget, Transfer
+
+TRANSFERS_URL = reverse("budget:transfer-list")
+
+
+def create_user(email, password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PublicTransferAPITest(TestCase):
+    """Test unauthorized API requests."""
+
+    databases = "__all__"
+
+    def test_auth_required(self):
+        res = APIClient().get(TRANSFERS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateTransferAPITest(TestCase):
+    """Test authorized API requests."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user("user@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.source = Budget.objects.create(
+            user=self.user, currency="USD", balance=Decimal("100")
+        )
+        self.target = Budget.objects.create(user=self.user, currency="USD")
+
+    def _payload(self, **params):
+        payload = {
+            "source": self.source.id,
+            "target": self.target.id,
+            "amount": "40.00",
+        }
+        payload.update(params)
+        return payload
+
+    def test_create_transfer(self):
+        res = self.client.post(TRANSFERS_URL, self._payload(notes="Savings"))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["debit"]["budget"], self.source.id)
+        self.assertEqual(res.data["credit"]["notes"], "Savings")
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("60"))
+        self.assertEqual(self.target.balance, Decimal("40"))
+        res = self.client.get(TRANSFERS_URL)
+        self.assertEqual(len(res.data), 1)
+
+    def test_create_transfer_converted(self):
+        self.target.currency = "EUR"
+        self.target.save()
+
+        res = self.client.post(TRANSFERS_URL, self._payload(rate="0.9"))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(res.data["credit"]["amount"]), Decimal("36"))
+
+    def test_different_currencies_need_rate(self):
+        self.target.currency = "EUR"
+        self.target.save()
+
+        res = self.client.post(TRANSFERS_URL, self._payload())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Transfer.objects.for_user(self.user).exists())
+
+    def test_converted_amount_too_large(self):
+        self.target.currency = "EUR"
+        self.target.save()
+
+        res = self.client.post(
+            TRANSFERS_URL, self._payload(amount="99999999.99", rate="1000")
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("amount", res.data)
+        self.assertFalse(Transfer.objects.for_user(self.user).exists())
+
+    def test_same_currency_rejects_rate(self):
+        res = self.client.post(TRANSFERS_URL, self._payload(rate="2"))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transfer_to_same_budget(self):
+        res = self.client.post(TRANSFERS_URL, self._payload(target=self.source.id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transfer_to_other_users_budget(self):
+        other = Budget.objects.create(
+            user=create_user("other@example.com"), currency="USD"
+        )
+
+        res = self.client.post(TRANSFERS_URL, self._payload(target=other.id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        other.refresh_from_db()
+        self.assertEqual(other.balance, 0)
+
+    def test_transfer_transactions_read_only(self):
+        res = self.client.post(TRANSFERS_URL, self._payload())
+        for leg in ["debit", "credit"]:
+            url = reverse("budget:transaction-detail", args=[res.data[leg]["id"]])
+
+            res_patch = self.client.patch(url, {"amount": "1.00"})
+            res_delete = self.client.delete(url)
+
+            self.assertEqual(res_patch.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res_delete.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Transfer.objects.for_user(self.user).exists())
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.source.balance + self.target.balance, Decimal("100"))
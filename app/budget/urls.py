@@ -11,8 +11,12 @@ router = DefaultRouter()
 router.register("budgets", views.BudgetViewSet)
 router.register("categories", views.CategoryViewSet)
 router.register("transactions", views.TransactionViewSet)
+router.register("recurring-rules", views.RecurringRuleViewSet)
+router.register("spending-limits", views.SpendingLimitViewSet)
+router.register("transfers", views.TransferViewSet)
 
 app_name = "budget"
 urlpatterns = [
+    path("changes/", views.ChangesView.as_view(), name="changes"),
     path("", include(router.urls)),
 ]
@@ -1,7 +1,14 @@
 """
 Views for the budgets API.
 """
+from datetime import timedelta
 from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+from django.urls import reverse
+from django.utils import timezone
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -9,22 +16,51 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import (
+    generics,
     viewsets,
     mixins,
+    status,
 )
-
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core.authentication import CachedJWTAuthentication
+from core.checkpoints import get_balance_at
+from core.deletion import delete_budget
+from core.forecast import get_forecast
+from core.limits import recount
+from core.series import get_balance_series
+from core.ledger import (
+    annotate_unfolded,
+    apply_balance_deltas,
+    fold_balance_stripes,
+    lock_budgets,
+    post_transactions,
+    track_transactions,
+)
+from core.sharding import get_shard
+from core.stats import Stats
+from core.transfers import transfer
+from core.singleflight import coalesced
 from core.models import (
+    add_months,
     Budget,
     Category,
+    CategoryStats,
+    LimitAlert,
+    RecurringRule,
+    SpendingLimit,
     Transaction,
+    Transfer,
 )
 
 
 from . import serializers
+from .columnar import ColumnarListMixin
+from .feed import get_page
 
 
 @extend_schema_view(
@@ -49,13 +85,22 @@ from . import serializers
         ]
     )
 )
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ColumnarListMixin, viewsets.ModelViewSet):
     """View for manage budget APIs."""
 
     serializer_class = serializers.BudgetDetailSerializer
     queryset = Budget.objects.all()
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_scope = None
+    columnar_fields = {
+        "id": "id",
+        "user": "user_id",
+        "currency": "currency",
+        "balance": F("balance") + Coalesce("unfolded_balance", Decimal("0")),
+        "balance_stripes": "balance_stripes",
+    }
+    columnar_dictionary = ["currency"]
 
     def _params_to_decimal(self, qs):
         return Decimal(str(qs))
@@ -68,13 +113,13 @@ class BudgetViewSet(viewsets.ModelViewSet):
 
         if len(_balance_range) == 2 and "" not in _balance_range:
             _lrc = [Decimal(value) for value in _balance_range]
-            return queryset.filter(balance__range=_lrc)
+            return queryset.filter(total_balance__range=_lrc)
 
         if _balance_range[0] != "":
-            return queryset.filter(balance__gte=Decimal(_balance_range[0]))
+            return queryset.filter(total_balance__gte=Decimal(_balance_range[0]))
 
         if _balance_range[1] != "":
-            return queryset.filter(balance__lte=Decimal(_balance_range[1]))
+            return queryset.filter(total_balance__lte=Decimal(_balance_range[1]))
 
         raise ValueError("Range should contain exactly two values")
 
@@ -83,7 +128,10 @@ class BudgetViewSet(viewsets.ModelViewSet):
         currencies = self.request.query_params.get("currencies")
         balance_range = self.request.query_params.get("balance_range")
 
-        queryset = self.queryset
+        # Filters see the balances as served, with their unfolded stripes.
+        queryset = annotate_unfolded(self.queryset).alias(
+            total_balance=F("balance") + Coalesce("unfolded_balance", Decimal("0"))
+        )
 
         if balance_range:
             queryset = self._get_balance_range_filtered_queryset(
@@ -92,25 +140,129 @@ class BudgetViewSet(viewsets.ModelViewSet):
 
         if balance:
             _balance = self._params_to_decimal(balance)
-            queryset = queryset.filter(balance=_balance)
+            queryset = queryset.filter(total_balance=_balance)
 
         if currencies:
             currencies_list = self._params_to_upper_str_list(currencies)
             queryset = queryset.filter(currency__in=currencies_list)
 
-        return queryset.filter(user=self.request.user).order_by("-id").distinct()
+        return queryset.for_user(self.request.user).order_by("-id").distinct()
+
+    def _get_month_total(self, month_start, sign):
+        # Reads the signed amount only, without joining categories.
+        total = Sum(
+            "transaction__signed_amount",
+            filter=Q(
+                transaction__created__gte=month_start,
+                **{"transaction__signed_amount__%s" % sign: 0},
+            ),
+        )
+        return Coalesce(
+            Abs(total),
+            Value(Decimal("0")),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
 
     def get_serializer_class(self):
         if self.action == "list":
             return serializers.BudgetSerializer
+        if self.action == "summary":
+            return serializers.BudgetSummarySerializer
+        if self.action == "forecast":
+            return serializers.ForecastSerializer
+        if self.action == "balances":
+            return serializers.BalanceSeriesSerializer
 
         return self.serializer_class
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        budget = serializer.instance
+        using = budget._state.db
+        with transaction.atomic(using=using):
+            # A balance written replaces the one with the stripes folded in.
+            fold_balance_stripes([budget.pk], using)
+            budget.refresh_from_db(fields=["balance"])
+            del budget.unfolded_balance
+            serializer.save()
+
+    def destroy(self, request, *args, **kwargs):
+        """Delete the budget, and its transactions in the background.
+
+        The ``Location`` header links to the purge job with its progress.
+        """
+        job = delete_budget(self.get_object())
+        return Response(
+            status=status.HTTP_204_NO_CONTENT,
+            headers={"Location": reverse("job:job-detail", args=[job.pk])},
+        )
+
+    @coalesced
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(parameters=[serializers.BalanceAtQuerySerializer])
+    def retrieve(self, request, *args, **kwargs):
+        """The budget, with its balance at ``balance_at`` if given."""
+        query = serializers.BalanceAtQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        data = serializer.data
+        if "balance_at" in query.validated_data:
+            data["balance"] = serializer.fields["balance"].to_representation(
+                get_balance_at(instance, query.validated_data["balance_at"])
+            )
+        return Response(data)
+
+    @action(detail=False, methods=["get"], throttle_scope="summary")
+    @coalesced
+    def summary(self, request, *args, **kwargs):
+        """Balances and month-to-date totals of all budgets, in one query."""
+        month_start = timezone.localtime().replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        queryset = self.get_queryset().annotate(
+            month_income=self._get_month_total(month_start, "gt"),
+            month_expense=self._get_month_total(month_start, "lt"),
+            # Counting an indexed column keeps this an index-only scan.
+            transaction_count=Count("transaction__created"),
+        )
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[serializers.ForecastQuerySerializer])
+    @action(detail=True, methods=["get"], throttle_scope="forecast")
+    def forecast(self, request, *args, **kwargs):
+        """Daily balances of the coming months, projected from the history."""
+        query = serializers.ForecastQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        today = timezone.localdate()
+        end = add_months(today, query.validated_data["months"])
+        balances = get_forecast(self.get_object(), (end - today).days, today)
+        serializer = self.get_serializer(
+            {
+                "start": today + timedelta(days=1),
+                "balances": balances.round(2).tolist(),
+            }
+        )
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[serializers.BalanceSeriesQuerySerializer])
+    @action(detail=True, methods=["get"], throttle_scope="balances")
+    def balances(self, request, *args, **kwargs):
+        """Balances over a time range for charts, downsampled to ``points``."""
+        query = serializers.BalanceSeriesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        times, balances = get_balance_series(self.get_object(), **query.validated_data)
+        serializer = self.get_serializer({"times": times, "balances": balances})
+        return Response(serializer.data)
+
 
 class BaseBudgetAttrViewSet(
+    ColumnarListMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
@@ -118,7 +270,7 @@ class BaseBudgetAttrViewSet(
 ):
     """Base ViewSet for budget attributes."""
 
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
 
@@ -137,31 +289,254 @@ class CategoryViewSet(BaseBudgetAttrViewSet):
 
     serializer_class = serializers.CategorySerializer
     queryset = Category.objects.all()
+    columnar_fields = {
+        "id": "id",
+        "user": "user_id",
+        "name": "name",
+        "category_type": "category_type",
+    }
+    columnar_dictionary = ["category_type"]
 
     def get_queryset(self):
         return (
             super()
             .get_queryset()
-            .filter(user=self.request.user)
+            .for_user(self.request.user)
             .order_by("-name")
             .distinct()
         )
 
+    @extend_schema(responses=serializers.CategoryStatsSerializer(many=True))
+    @action(detail=True, methods=["get"])
+    def stats(self, request, *args, **kwargs):
+        """Statistics of the amounts of the category in each budget."""
+        category = self.get_object()
+        data = []
+        for obj in CategoryStats.objects.using(category._state.db).filter(
+            category=category, count__gt=0
+        ).order_by("budget_id"):
+            stats = Stats.from_model(obj)
+            data.append(
+                {
+                    "budget": obj.budget_id,
+                    "count": stats.count,
+                    "mean": stats.mean,
+                    "variance": stats.variance,
+                    "median": stats.sketch.quantile(0.5),
+                    "p90": stats.sketch.quantile(0.9),
+                    "p99": stats.sketch.quantile(0.99),
+                }
+            )
+        return Response(serializers.CategoryStatsSerializer(data, many=True).data)
+
 
 @extend_schema(
     tags=["transaction"],
 )
-class TransactionViewSet(BaseBudgetAttrViewSet):
-    """Manage transactions in the database."""
+class TransactionViewSet(mixins.CreateModelMixin, BaseBudgetAttrViewSet):
+    """Manage transactions in the database.
+
+    Writes keep the category stats and spending limits in step, and a
+    created transaction comes with the anomaly score of its amount.
+    Transactions of transfers can't be updated or deleted.
+    """
 
     serializer_class = serializers.TransactionSerializer
     queryset = Transaction.objects.all()
+    columnar_fields = {
+        "id": "id",
+        "budget": "budget_id",
+        "category": "category_id",
+        "amount": "amount",
+        "notes": "notes",
+    }
+    columnar_dictionary = ["budget", "category"]
+    # The list is unpaginated and the most expensive read.
+    throttle_scope = "transactions"
 
     def get_queryset(self):
         return (
             super()
             .get_queryset()
-            .filter(budget__user=self.request.user)
+            .for_user(self.request.user)
             .order_by("-created")
             .distinct()
         )
+
+    def get_serializer_class(self):
+        if self.action == "create":
+            return serializers.TransactionCreateSerializer
+        return self.serializer_class
+
+    def perform_create(self, serializer):
+        item = Transaction(**serializer.validated_data)
+        using = get_shard(self.request.user)
+        serializer.instance = post_transactions([item], using=using)[0]
+
+    def _check_not_transfer(self, item):
+        # A leg changed alone would create or destroy money.
+        legs = Transfer.objects.using(item._state.db).filter(
+            Q(debit=item) | Q(credit=item)
+        )
+        if legs.exists():
+            raise ValidationError("Transactions of transfers can't be changed.")
+
+    def perform_update(self, serializer):
+        item = serializer.instance
+        self._check_not_transfer(item)
+        previous = Transaction(
+            budget_id=item.budget_id,
+            category_id=item.category_id,
+            amount=item.amount,
+            signed_amount=item.signed_amount,
+            created=item.created,
+        )
+        using = item._state.db
+        with transaction.atomic(using=using):
+            # Before the row, as every balance write locks them.
+            lock_budgets([item.budget_id], using)
+            item = serializer.save()
+            if (item.category_id, item.amount) != (
+                previous.category_id,
+                previous.amount,
+            ):
+                apply_balance_deltas(
+                    {item.budget_id: item.signed_amount - previous.signed_amount},
+                    using=using,
+                )
+                track_transactions([previous], using, weight=-1)
+                track_transactions([item], using)
+
+    def perform_destroy(self, instance):
+        self._check_not_transfer(instance)
+        using = instance._state.db
+        with transaction.atomic(using=using):
+            apply_balance_deltas(
+                {instance.budget_id: -instance.signed_amount}, using=using
+            )
+            track_transactions([instance], using, weight=-1)
+            instance.delete()
+
+    @coalesced
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+@extend_schema(
+    tags=["recurring-rule"],
+)
+class RecurringRuleViewSet(viewsets.ModelViewSet):
+    """Manage recurring transaction rules."""
+
+    serializer_class = serializers.RecurringRuleSerializer
+    queryset = RecurringRule.objects.all()
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.queryset.for_user(self.request.user).order_by("-id")
+
+
+@extend_schema(
+    tags=["spending-limit"],
+)
+class SpendingLimitViewSet(viewsets.ModelViewSet):
+    """Manage monthly spending limits of budgets in expense categories.
+
+    ``spent`` is the spending of the current month. Saving a limit counts
+    its spending again.
+    """
+
+    serializer_class = serializers.SpendingLimitSerializer
+    queryset = SpendingLimit.objects.all()
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.queryset.for_user(self.request.user).order_by("-id")
+
+    def perform_create(self, serializer):
+        using = get_shard(self.request.user)
+        with transaction.atomic(using=using):
+            recount(serializer.save())
+
+    def perform_update(self, serializer):
+        using = serializer.instance._state.db
+        with transaction.atomic(using=using):
+            # Waits for the writes counting spending of the limit.
+            list(
+                SpendingLimit.objects.using(using)
+                .select_for_update()
+                .filter(pk=serializer.instance.pk)
+                .values_list("pk")
+            )
+            recount(serializer.save())
+
+    @extend_schema(responses=serializers.LimitAlertSerializer(many=True))
+    @action(detail=False, methods=["get"])
+    def alerts(self, request, *args, **kwargs):
+        """Thresholds of the limits crossed, latest first."""
+        alerts = (
+            LimitAlert.objects.for_user(request.user)
+            .select_related("limit")
+            .order_by("-id")
+        )
+        return Response(serializers.LimitAlertSerializer(alerts, many=True).data)
+
+
+@extend_schema(
+    tags=["transfer"],
+)
+class TransferViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Move money between budgets of the user.
+
+    A transfer posts its debit and credit transactions and updates both
+    balances atomically. Its transactions can't be updated or deleted.
+    """
+
+    serializer_class = serializers.TransferSerializer
+    queryset = Transfer.objects.all()
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            self.queryset.for_user(self.request.user)
+            .select_related("debit", "credit")
+            .order_by("-id")
+        )
+
+    def perform_create(self, serializer):
+        serializer.instance = transfer(**serializer.validated_data)
+
+
+@extend_schema(
+    tags=["sync"],
+    parameters=[serializers.ChangesQuerySerializer],
+)
+class ChangesView(generics.GenericAPIView):
+    """Budgets, categories and transactions changed since a cursor.
+
+    Deleted rows are listed in ``deleted``, including the transactions of a
+    deleted budget or category. Call again with the returned ``cursor``
+    while ``has_more`` is set, and later to sync again.
+    """
+
+    serializer_class = serializers.ChangesSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query = serializers.ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = get_page(
+            request.user,
+            query.validated_data["cursor"],
+            query.validated_data["limit"],
+        )
+        return Response(self.get_serializer(data).data)
@@ -13,4 +13,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from budget import streams  # noqa: E402
+
+event_stream = streams.EventStream()
+
+
+async def application(scope, receive, send):
+    """Serve the event stream, and everything else with Django."""
+    if scope["type"] == "http" and scope["path"] == streams.PATH:
+        await event_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
+
+if settings.CACHE_INVALIDATION:
+    from core import invalidation
+
+    invalidation.start_listener()
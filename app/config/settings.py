@@ -10,11 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
-# from celery.schedules import crontab
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +48,7 @@ INSTALLED_APPS = [
     "core.apps.CoreConfig",
     "user.apps.UserConfig",
     "budget.apps.BudgetConfig",
+    "job.apps.JobConfig",
     # 3-d party apps
     "rest_framework",
     "drf_spectacular",
@@ -58,6 +58,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.AdmissionControlMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -98,9 +100,33 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Connections opened by the worker warmup are kept for requests.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# User data is sharded across the default database and DB_SHARDS, a comma
+# separated list of "[host[:port]/]name" on the credentials of the default
+# one, see core.sharding. The test runner creates test databases of all.
+
+SHARDS = ['default']
+for index, shard in enumerate(
+    filter(None, os.environ.get('DB_SHARDS', '').split(',')), 1
+):
+    address, _, name = shard.strip().rpartition('/')
+    host, _, port = address.partition(':')
+    alias = 'shard_%d' % index
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port,
+    }
+    SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['core.sharding.ShardRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -145,11 +171,32 @@ AUTH_USER_MODEL = "user.User"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        "core.throttling.UserTokenBucketThrottle",
+        "core.throttling.IPTokenBucketThrottle",
+    ],
+    # "<kind>.<scope>" applies to views with that throttle_scope.
+    "DEFAULT_THROTTLE_RATES": {
+        "user": "600/min",
+        "user.transactions": "120/min",
+        "user.summary": "120/min",
+        "user.forecast": "120/min",
+        "user.balances": "120/min",
+        "user.jobs": "120/min",
+        "ip": "1200/min",
+        "ip.token": "30/min",
+        # Overrides as "ip.token=100/min,user=1000/min", e.g. for load tests.
+        **dict(
+            item.split("=", 1)
+            for item in os.environ.get("THROTTLE_RATES", "").split(",")
+            if item
+        ),
+    },
 }
 
 SIMPLE_JWT = {
@@ -164,6 +211,13 @@ SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUEST": True,
 }
 
+# Precomputed schema written by ``manage.py build_schema``, served outside DEBUG.
+SCHEMA_DIR = os.environ.get("SCHEMA_DIR", str(BASE_DIR / "schema"))
+SCHEMA_CACHE_MAX_AGE = int(os.environ.get("SCHEMA_CACHE_MAX_AGE", 24 * 60 * 60))
+
+# Prime imports, resolvers and connections before workers accept traffic.
+WARMUP = bool(int(os.environ.get("WARMUP", 1)))
+
 CORS_ALLOWED_ORIGINS = []
 CORS_ALLOWED_ORIGINS.extend(
     filter(
@@ -179,3 +233,72 @@ CSRF_TRUSTED_ORIGINS.extend(
         os.environ.get("CSRF_TRUSTED_ORIGINS", "").split(","),
     )
 )
+
+# Admission control
+# Seconds a request may wait behind the proxy before it is shed, per route
+# name, optionally prefixed by the method. None never sheds.
+
+ADMISSION_CONTROL = bool(int(os.environ.get("ADMISSION_CONTROL", 1)))
+ADMISSION_QUEUE_BUDGETS = {
+    "default": 5.0,
+    "POST job:job-list": 1.0,
+    "budget:budget-summary": 2.0,
+    "budget:transaction-list": 2.0,
+    "api-schema": 2.0,
+    "metrics": None,
+}
+
+# Shed requests are counted instead of logged as errors.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "shed_requests": {"()": "core.middleware.ShedRequestFilter"},
+    },
+    "loggers": {
+        "django.request": {"filters": ["shed_requests"]},
+    },
+}
+
+# Throttling
+# Token buckets shared by the workers of a host, see core.throttling.
+
+THROTTLE_FILE = os.environ.get(
+    "THROTTLE_FILE",
+    os.path.join(tempfile.gettempdir(), "finance_app_throttle.db"),
+)
+
+# Cache invalidation
+# Changes of cached rows are published with NOTIFY, see core.invalidation.
+
+CACHE_INVALIDATION = bool(int(os.environ.get("CACHE_INVALIDATION", 1)))
+
+# Live updates
+# Logging changes notifies the event streams of their owners, see
+# budget.streams.
+
+LIVE_UPDATES = bool(int(os.environ.get("LIVE_UPDATES", 1)))
+
+# Metrics
+# Every worker writes its samples to its own file in this directory.
+
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), "finance_app_metrics"),
+)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Job files
+# Files written by jobs, such as exports, in the default storage. Workers and
+# the API share it, see budget.jobs.
+
+MEDIA_ROOT = os.environ.get(
+    "MEDIA_ROOT",
+    os.path.join(tempfile.gettempdir(), "finance_app_media"),
+)
+
+# Single-flight coalescing
+# Seconds a request waits for an identical in-flight computation.
+
+SINGLE_FLIGHT_TIMEOUT = 10
+SINGLE_FLIGHT_ACROSS_WORKERS = True
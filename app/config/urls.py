@@ -14,21 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
+from drf_spectacular.views import SpectacularSwaggerView
 from django.contrib import admin
 from django.urls import path, include
 
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from core.views import SchemaView, metrics_view
+
+from user.views import RefreshTokenView, TokenView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("api/schema/", SpectacularAPIView.as_view(), name="api-schema"),
+    path("api/schema/", SchemaView.as_view(), name="api-schema"),
     path(
         "api/docs/",
         SpectacularSwaggerView.as_view(url_name="api-schema"),
@@ -36,7 +32,10 @@ urlpatterns = [
     ),
     path("api/user/", include("user.urls")),
     path("api/budget/", include("budget.urls")),
+    path("api/job/", include("job.urls")),
+
+    path('api/token/', TokenView.as_view(), name='token'),
+    path('api/token/refresh/', RefreshTokenView.as_view(), name='token_refresh'),
 
-    path('api/token/', TokenObtainPairView.as_view(), name='token'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -14,3 +14,28 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from core import invalidation, warmup  # noqa: E402
+
+
+def post_fork():
+    """Prepare a forked uwsgi worker, which inherits no threads or connections."""
+    if settings.WARMUP:
+        # Workers connect to the database before their first request.
+        warmup.connect()
+    if settings.CACHE_INVALIDATION:
+        invalidation.start_listener()
+
+
+if settings.WARMUP:
+    warmup.prime()
+
+try:
+    import uwsgi
+except ImportError:
+    if settings.CACHE_INVALIDATION:
+        invalidation.start_listener()
+else:
+    uwsgi.post_fork_hook = post_fork
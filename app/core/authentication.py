@@ -0,0 +1,37 @@
+"""
+Authentication of API requests.
+"""
+import copy
+
+from django.contrib.auth import get_user_model
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .invalidation import LocalCache, get_tag
+
+USER_CACHE_TTL = 60 * 60
+
+users = LocalCache(ttl=USER_CACHE_TTL)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication reading users from a per-process cache.
+
+    Saves the user query of every request. Saving or deleting a user evicts
+    it in all workers, so a deactivated user is refused right away.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        def load():
+            return super(CachedJWTAuthentication, self).get_user(validated_token)
+
+        user = users.get_or_set(
+            user_id, load, [get_tag(get_user_model(), user_id)]
+        )
+        # Requests may change their user, they must not share the instance.
+        return copy.copy(user)
@@ -0,0 +1,138 @@
+"""
+Change log of the budgets, categories and transactions synced by clients.
+
+Each write upserts one ``Change`` row per object, with a tombstone for a
+delete, so the log keeps the latest change of every object. A client passes
+the cursor of its last sync and gets the changes after it from one range
+scan of ``change_feed_idx``.
+
+Changes are ordered by the id of the PostgreSQL transaction that wrote
+them, not by a sequence. Sequence values are taken before commit, so a
+slow transaction could still add changes below a cursor already handed
+out. A read only returns changes of transactions older than the oldest one
+still running, the xmin of its snapshot, which have all finished, and the
+next cursor never passes that horizon.
+
+Logging changes also sends ``"<txid> <user id>,<user id>,..."`` on
+``CHANNEL`` with ``NOTIFY``, delivered on commit, to wake the event streams
+of the owners.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from .models import Budget, Category, Change, Transaction
+
+SYNCED_MODELS = {
+    "budget": Budget,
+    "category": Category,
+    "transaction": Transaction,
+}
+MODEL_NAMES = {model: name for name, model in SYNCED_MODELS.items()}
+# Lookup of the owner of the rows of each synced model.
+OWNERS = {
+    Budget: "user_id",
+    Category: "user_id",
+    Transaction: "budget__user_id",
+}
+START = (0, 0)
+CHANNEL = "changes"
+# Owners per message, keeping payloads far below the 8000 bytes limit.
+USERS_PER_NOTIFY = 500
+
+# A row of the log, lighter than a model instance for pages of thousands.
+LoggedChange = namedtuple(
+    "LoggedChange", ["id", "model", "object_id", "deleted", "txid"]
+)
+
+
+def log_changes(queryset, deleted=False):
+    """Log the rows of ``queryset`` as changed, or as deleted.
+
+    Deletes are logged before the rows go, while their owner can be read.
+    """
+    model = queryset.model
+    sql, params = (
+        queryset.order_by().values_list(OWNERS[model], "pk").query.sql_with_params()
+    )
+    sql = (
+        "INSERT INTO %s (user_id, object_id, model, deleted, txid) "
+        "SELECT *, %%s, %%s, pg_current_xact_id()::text::bigint "
+        "FROM (%s) AS rows ON CONFLICT (model, object_id) DO UPDATE SET "
+        "user_id = EXCLUDED.user_id, deleted = EXCLUDED.deleted, "
+        "txid = EXCLUDED.txid" % (Change._meta.db_table, sql)
+    )
+    params = [MODEL_NAMES[model], deleted, *params]
+    if settings.LIVE_UPDATES:
+        # Notify the owners from the same statement, in groups of user ids.
+        sql = (
+            "WITH logged AS (%s RETURNING user_id) "
+            "SELECT pg_notify(%%s, pg_current_xact_id()::text || ' ' || "
+            "string_agg(user_id::text, ',')) "
+            "FROM (SELECT DISTINCT user_id FROM logged) AS owners "
+            "GROUP BY user_id / %%s" % sql
+        )
+        params += [CHANNEL, USERS_PER_NOTIFY]
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def forget_user(user_id, using=None):
+    """Remove the changes of a deleted user."""
+    using = using or router.db_for_write(Change)
+    Change.objects.using(using).filter(user_id=user_id).delete()
+
+
+def format_cursor(cursor, shard=DEFAULT_DB_ALIAS):
+    """Return the cursor ``(txid, id)`` of the log of ``shard`` as text."""
+    value = "%d-%d" % cursor
+    return value if shard == DEFAULT_DB_ALIAS else "%s-%s" % (value, shard)
+
+
+def parse_cursor(value):
+    """Return the ``(txid, id)`` cursor of ``value`` and its shard.
+
+    Raise ``ValueError`` for an invalid cursor. Transaction ids of shards are
+    unrelated, a cursor only applies to the log of its shard.
+    """
+    txid, change_id, *shard = value.split("-", 2)
+    cursor = int(txid), int(change_id)
+    if min(cursor) < 0:
+        raise ValueError("Negative cursor.")
+    return cursor, shard[0] if shard else DEFAULT_DB_ALIAS
+
+
+def current_cursor(using=None):
+    """Return a cursor skipping the changes of finished transactions."""
+    using = using or router.db_for_read(Change)
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+        return cursor.fetchone()[0], 0
+
+
+def read_changes(user_id, cursor=START, limit=500, using=None):
+    """Return the changes of a user after ``cursor``.
+
+    Return at most ``limit`` changes, the cursor to read the following ones
+    and whether more changes are ready.
+    """
+    using = using or router.db_for_read(Change)
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(
+            "SELECT h.horizon, c.id, c.model, c.object_id, c.deleted, c.txid "
+            "FROM (SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint "
+            "AS horizon) AS h LEFT JOIN LATERAL ("
+            "SELECT id, model, object_id, deleted, txid FROM %s "
+            "WHERE user_id = %%s AND (txid, id) > (%%s, %%s) AND txid < h.horizon "
+            "ORDER BY txid, id LIMIT %%s) AS c ON true" % Change._meta.db_table,
+            [user_id, *cursor, limit + 1],
+        )
+        rows = db_cursor.fetchall()
+
+    horizon = rows[0][0]
+    changes = [LoggedChange(*row[1:]) for row in rows if row[1] is not None]
+    if len(changes) > limit:
+        changes = changes[:limit]
+        return changes, (changes[-1].txid, changes[-1].id), True
+    return changes, max(cursor, (horizon, 0)), False
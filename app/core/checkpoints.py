@@ -0,0 +1,187 @@
+"""
+Balances of budgets at points in time.
+
+The balance of a budget at a time is its balance less the transactions
+created after it. Summing those would scan the whole history for old times,
+so each budget gets a ``BalanceCheckpoint`` at the start of every local
+month: the total of its transactions created before it. The balance at a
+time then takes the checkpoints before it and before now, plus the
+transactions since each, which is at most a month of rows apiece.
+
+Checkpoints are created when a balance needs them, or ahead of time by the
+``checkpoint_balances`` command, up to ``CHECKPOINT_DELAY`` ago, so
+transactions being written when a month starts land before the checkpoint
+counts them. Writing a transaction before the start of the current month
+deletes the checkpoints of its budget after it, and only those.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import connections, transaction
+from django.db.models import Min, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    BalanceCheckpoint,
+    Budget,
+    Transaction,
+    add_months,
+    month_start,
+)
+
+CHECKPOINT_DELAY = timedelta(hours=1)
+
+
+def get_checkpoint_time(value):
+    """Return the start of the local month of ``value``, as a datetime."""
+    return timezone.make_aware(datetime.combine(month_start(value), time.min))
+
+
+def _next_checkpoint_time(value):
+    return timezone.make_aware(
+        datetime.combine(add_months(timezone.localtime(value).date(), 1), time.min)
+    )
+
+
+def _sum_months(budget, times, start):
+    """Return the sums of the transactions of ``budget`` in the months
+    from ``start`` to each of ``times``.
+    """
+    with connections[budget._state.db].cursor() as cursor:
+        # Bucket 0 is before times[0], bucket i before times[i].
+        cursor.execute(
+            "SELECT width_bucket(created, %%s::timestamptz[]), sum(signed_amount) "
+            "FROM %s WHERE budget_id = %%s AND created >= %%s AND created < %%s "
+            "GROUP BY 1" % Transaction._meta.db_table,
+            [times, budget.pk, start, times[-1]],
+        )
+        sums = dict(cursor.fetchall())
+    return [sums.get(i, 0) for i in range(len(times))]
+
+
+def ensure_checkpoints(budget, until):
+    """Create the missing checkpoints of ``budget`` up to ``until``.
+
+    Return the latest checkpoint at or before ``until``, None before the
+    first transaction.
+    """
+    using = budget._state.db
+    end = get_checkpoint_time(min(until, timezone.now() - CHECKPOINT_DELAY))
+    checkpoints = BalanceCheckpoint.objects.using(using).filter(budget=budget)
+    with transaction.atomic(using=using):
+        # Waits for backdated writes to the budget, which delete checkpoints.
+        list(
+            Budget._base_manager.using(using)
+            .select_for_update(no_key=True)
+            .filter(pk=budget.pk)
+            .values_list("pk", flat=True)
+        )
+        latest = checkpoints.filter(at__lte=end).order_by("-at").first()
+        if latest is not None and latest.at == end:
+            return latest
+        if latest is None:
+            first = (
+                Transaction.objects.using(using)
+                .filter(budget=budget)
+                .aggregate(first=Min("created"))["first"]
+            )
+            if first is None or first >= end:
+                return None
+            latest = BalanceCheckpoint(
+                budget=budget, at=get_checkpoint_time(first), total=0
+            )
+            new = [latest]
+        else:
+            new = []
+        times = []
+        at = _next_checkpoint_time(latest.at)
+        while at <= end:
+            times.append(at)
+            at = _next_checkpoint_time(at)
+        total = latest.total
+        if times:
+            for at, amount in zip(times, _sum_months(budget, times, latest.at)):
+                total += amount
+                new.append(BalanceCheckpoint(budget=budget, at=at, total=total))
+        BalanceCheckpoint.objects.using(using).bulk_create(new, ignore_conflicts=True)
+        return new[-1] if new else latest
+
+
+def _since(checkpoint):
+    if checkpoint is None:
+        return Q(pk__isnull=False)
+    return Q(created__gte=checkpoint.at)
+
+
+def get_balance_at(budget, at):
+    """Return the balance of ``budget`` at the time ``at``."""
+    using = budget._state.db
+    latest = ensure_checkpoints(budget, timezone.now())
+    before = latest
+    if latest is not None and latest.at > at:
+        before = (
+            BalanceCheckpoint.objects.using(using)
+            .filter(budget=budget, at__lte=at)
+            .order_by("-at")
+            .first()
+        )
+    since_latest = _since(latest)
+    until_at = _since(before) & Q(created__lte=at)
+    sums = (
+        Transaction.objects.using(using)
+        .filter(budget=budget)
+        .filter(since_latest | until_at)
+        .aggregate(
+            since_latest=Sum("signed_amount", filter=since_latest),
+            until_at=Sum("signed_amount", filter=until_at),
+        )
+    )
+    # Totals before now and before at.
+    total = (latest.total if latest else 0) + (sums["since_latest"] or 0)
+    total_at = (before.total if before else 0) + (sums["until_at"] or 0)
+    return budget.current_balance - (total - total_at)
+
+
+def invalidate_checkpoints(times, using):
+    """Delete the checkpoints after transactions written at ``times``,
+    ``{budget_id: earliest created}``.
+
+    The budgets are locked in id order until the end of the transaction.
+    """
+    start = get_checkpoint_time(timezone.now())
+    times = {pk: created for pk, created in times.items() if created < start}
+    if not times:
+        return
+    with transaction.atomic(using=using):
+        list(
+            Budget._base_manager.using(using)
+            .select_for_update(no_key=True)
+            .filter(pk__in=times)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        stale = Q()
+        for pk, created in times.items():
+            stale |= Q(budget_id=pk, at__gt=created)
+        BalanceCheckpoint._base_manager.using(using).filter(stale).delete()
+
+
+def invalidate_transactions(transactions, using):
+    """Delete the checkpoints counting ``transactions``, before writing them."""
+    times = {}
+    for item in transactions:
+        if item.budget_id not in times or item.created < times[item.budget_id]:
+            times[item.budget_id] = item.created
+    invalidate_checkpoints(times, using)
+
+
+def invalidate_category(category):
+    """Delete the checkpoints counting the transactions of ``category``."""
+    using = category._state.db
+    times = (
+        Transaction._base_manager.using(using)
+        .filter(category=category)
+        .values("budget_id")
+        .annotate(first=Min("created"))
+        .values_list("budget_id", "first")
+    )
+    invalidate_checkpoints(dict(times), using)
@@ -0,0 +1,188 @@
+"""
+Deleting budgets and users without deleting their rows in the request.
+
+Deleting a budget or user through Django's cascade loads every dependent
+transaction and deletes them in one transaction, which takes long and holds
+locks on large accounts. Instead, ``delete_budget()`` and ``delete_user()``
+soft delete the parent, which hides it and the rows of its budgets from
+the default managers, log it as deleted and queue a purge job.
+
+The job deletes the dependent rows in batches of ``PURGE_BATCH_SIZE``, each
+in a short transaction with the tombstones of the transactions it deletes,
+and the parent last. Progress counts the deleted transactions, and a
+retried job continues with the rows left.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import jobs
+from .changes import log_changes
+from .checkpoints import invalidate_category
+from .invalidation import get_related_tag, get_tag, get_tags, publish
+from .models import (
+    BalanceCheckpoint,
+    BalanceStripe,
+    Budget,
+    Category,
+    CategoryStats,
+    Change,
+    LimitAlert,
+    RecurringRule,
+    SpendingLimit,
+    Transaction,
+    Transfer,
+)
+from .sharding import get_shard
+
+PURGE_BATCH_SIZE = 5000
+# Rows of budgets and categories, by the prefix of the lookups of their
+# budget and category, deleted in this order.
+DEPENDENT_ROWS = [
+    (Transfer, "debit__"),
+    (Transfer, "credit__"),
+    (Transaction, ""),
+    (RecurringRule, ""),
+    (LimitAlert, "limit__"),
+    (SpendingLimit, ""),
+    (CategoryStats, ""),
+]
+
+
+def _budget_tags(budget_ids):
+    return [get_tag(Budget, pk) for pk in budget_ids] + [
+        get_related_tag(Transaction, "budget", pk) for pk in budget_ids
+    ]
+
+
+def delete_budget(budget):
+    """Soft delete ``budget`` and queue the purge of its rows."""
+    using = budget._state.db
+    budget.deleted = timezone.now()
+    # The job commits with the budget, even on another database.
+    with transaction.atomic(using=using), transaction.atomic():
+        queryset = Budget._base_manager.using(using).filter(pk=budget.pk)
+        queryset.update(deleted=budget.deleted)
+        log_changes(queryset, deleted=True)
+        publish(_budget_tags([budget.pk]), using=using)
+        return jobs.enqueue("purge_budget", {"budget": budget.pk}, user=budget.user)
+
+
+def delete_user(user):
+    """Soft delete ``user`` and its budgets, and queue the purge of its rows.
+
+    The email of the user is freed for a new account.
+    """
+    User = type(user)
+    using = get_shard(user)
+    now = timezone.now()
+    with transaction.atomic(using=using), transaction.atomic():
+        # The copy on the shard too, emails are unique there as well.
+        for alias in {DEFAULT_DB_ALIAS, using}:
+            User._base_manager.using(alias).filter(pk=user.pk).update(
+                deleted=now, is_active=False, email="deleted-%s@invalid" % user.pk
+            )
+        budgets = Budget._base_manager.using(using).filter(user=user, deleted=None)
+        budget_ids = list(budgets.values_list("pk", flat=True))
+        log_changes(budgets, deleted=True)
+        log_changes(Category.objects.using(using).filter(user=user), deleted=True)
+        budgets.update(deleted=now)
+        publish(_budget_tags(budget_ids), using=using)
+        # No user on the job, deleting the user would delete it.
+        job = jobs.enqueue("purge_user", {"user": user.pk})
+    # Refuses the tokens of the user right away.
+    publish(get_tags(user))
+    return job
+
+
+def purge_rows(job, queryset, logged=False):
+    """Delete the rows of ``queryset`` in batches, return the number deleted.
+
+    Logs tombstones of the rows if ``logged``, and adds the rows to the
+    progress of ``job``.
+    """
+    using = queryset.db
+    count = 0
+    while True:
+        with transaction.atomic(using=using), transaction.atomic():
+            ids = list(queryset.values_list("pk", flat=True)[:PURGE_BATCH_SIZE])
+            if not ids:
+                return count
+            batch = queryset.model._base_manager.using(using).filter(pk__in=ids)
+            if logged:
+                log_changes(batch, deleted=True)
+                job.set_progress(job.progress_current + len(ids))
+            batch._raw_delete(using)
+        count += len(ids)
+
+
+def purge_dependent_rows(job, using, parent, value):
+    """Delete the rows depending on the budgets or categories of a lookup.
+
+    ``parent`` is ``"budget"`` or ``"category"``, ``value`` filters them.
+    Return the counts of the deleted rows.
+    """
+    querysets = [
+        model._base_manager.using(using).filter(**{prefix + parent: value})
+        for model, prefix in DEPENDENT_ROWS
+    ]
+    transactions = Transaction._base_manager.using(using).filter(**{parent: value})
+    job.set_progress(
+        job.progress_current, job.progress_current + transactions.count()
+    )
+    counts = defaultdict(int)
+    for queryset in querysets:
+        counts[queryset.model._meta.model_name] += purge_rows(
+            job, queryset, logged=queryset.model is Transaction
+        )
+    return counts
+
+
+@jobs.register("purge_budget", priority=-1, max_attempts=10)
+def purge_budget(job):
+    """Delete a soft deleted budget and its rows in batches."""
+    budget_id = job.payload["budget"]
+    using = get_shard(job.user_id)
+    counts = purge_dependent_rows(job, using, "budget", budget_id)
+    for model in [BalanceCheckpoint, BalanceStripe]:
+        counts[model._meta.model_name] = purge_rows(
+            job, model._base_manager.using(using).filter(budget_id=budget_id)
+        )
+    counts["budget"] = purge_rows(
+        job,
+        Budget._base_manager.using(using).filter(pk=budget_id, deleted__isnull=False),
+    )
+    return counts
+
+
+@jobs.register("purge_user", priority=-1, max_attempts=10)
+def purge_user(job):
+    """Delete a soft deleted user and all its rows in batches."""
+    User = get_user_model()
+    user_id = job.payload["user"]
+    using = get_shard(user_id)
+    counts = purge_dependent_rows(job, using, "budget__user", user_id)
+    for model in [BalanceCheckpoint, BalanceStripe]:
+        counts[model._meta.model_name] = purge_rows(
+            job, model._base_manager.using(using).filter(budget__user_id=user_id)
+        )
+    # Rows of budgets of others in categories of the user, whose balance
+    # checkpoints count them.
+    for category in Category._base_manager.using(using).filter(user_id=user_id):
+        invalidate_category(category)
+    for name, count in purge_dependent_rows(
+        job, using, "category__user", user_id
+    ).items():
+        counts[name] += count
+    for model in [Budget, Category, Change]:
+        counts[model._meta.model_name] = purge_rows(
+            job, model._base_manager.using(using).filter(user_id=user_id)
+        )
+    # Little is left to cascade to. The delete receivers of the user delete
+    # its copy on its shard.
+    user = User._base_manager.using(DEFAULT_DB_ALIAS).filter(pk=user_id).first()
+    if user is not None:
+        user.delete()
+    return counts
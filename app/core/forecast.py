@@ -0,0 +1,280 @@
+"""
+Forecasts of budget balances.
+
+Budgets are forecast in batches, from arrays instead of a Python loop over
+transactions. PostgreSQL sums the transactions of the last ``HISTORY_DAYS``
+of the batch per budget, category and day, and NumPy splits the sums into
+flows, one per budget and category:
+
+* Recurring flows, paid about every week, two weeks or month for similar
+  amounts, are projected on their schedule.
+* Other flows are projected at their trend, a least squares line through
+  their totals of 30 day windows, spread evenly over the days.
+* Active recurring rules are projected on their schedule. The transactions
+  they posted are left out of the flows.
+
+``forecast()`` returns the daily balances from tomorrow on.
+``get_forecast()`` caches them per version of the owner's change log, which
+changes with every write to the budget, its categories or transactions.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+from django.db import connections
+from django.utils import timezone
+
+from .invalidation import LocalCache, get_tag
+from .models import Budget, Change, RecurringRule, Transaction, signed_amount
+
+HISTORY_DAYS = 360
+WINDOW_DAYS = 30
+# Bounds of the gaps in days between the payments of a recurring flow.
+PERIODS = [(6, 8), (13, 15), (28, 31)]
+MIN_OCCURRENCES = 3
+# Largest spread of the amounts of a recurring flow, relative to their mean.
+MAX_AMOUNT_SPREAD = 0.2
+# Recurring rules aren't in the change log, their edits show after this.
+FORECAST_TTL = 60 * 60
+
+forecasts = LocalCache(ttl=FORECAST_TTL, maxsize=2000)
+
+
+def load_history(budget_ids, today, using):
+    """Return the daily totals of the budgets as arrays.
+
+    Return budget ids, category ids, days relative to ``today`` and signed
+    totals, sorted by budget, category and day.
+    """
+    start, end = (
+        timezone.make_aware(datetime.combine(today + timedelta(days=days), time.min))
+        for days in [1 - HISTORY_DAYS, 1]
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT t.budget_id, t.category_id, "
+            "(t.created AT TIME ZONE %%s)::date - %%s::date, "
+            "sum(t.signed_amount)::float8 FROM %s AS t "
+            "WHERE t.budget_id = ANY(%%s) AND t.created >= %%s AND t.created < %%s "
+            "AND NOT EXISTS (SELECT 1 FROM %s AS r WHERE r.is_active "
+            "AND r.budget_id = t.budget_id AND r.category_id = t.category_id "
+            "AND r.amount = t.amount) GROUP BY 1, 2, 3"
+            % (Transaction._meta.db_table, RecurringRule._meta.db_table),
+            [
+                timezone.get_current_timezone_name(),
+                today,
+                budget_ids.tolist(),
+                start,
+                end,
+            ],
+        )
+        rows = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 4)
+    order = np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0]))
+    rows = rows[order]
+    # PostgreSQL reads some zone names as fixed offsets, for example CET, so
+    # a total can fall a day outside the range.
+    day = np.clip(rows[:, 2].astype(np.int64), 1 - HISTORY_DAYS, 0)
+    return rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64), day, rows[:, 3]
+
+
+def project_flows(rows, size, budget, category, day, amount, days):
+    """Return the daily deltas of ``size`` budgets from their daily totals.
+
+    ``rows`` maps each total to the row of its budget in the result.
+    """
+    deltas = np.zeros((size, days))
+    count = len(day)
+    if not count:
+        return deltas
+
+    new = np.ones(count, dtype=bool)
+    new[1:] = (budget[1:] != budget[:-1]) | (category[1:] != category[:-1])
+    starts = np.flatnonzero(new)
+    ends = np.append(starts[1:], count) - 1
+    flow = np.cumsum(new) - 1
+    occurrences = ends - starts + 1
+    first, last = day[starts], day[ends]
+    mean = np.add.reduceat(amount, starts) / occurrences
+
+    gaps = np.diff(day, prepend=0).astype(np.float64)
+    min_gap = np.minimum.reduceat(np.where(new, np.inf, gaps), starts)
+    max_gap = np.maximum.reduceat(np.where(new, -np.inf, gaps), starts)
+    spread = np.maximum.reduceat(amount, starts) - np.minimum.reduceat(amount, starts)
+    recurring = np.zeros(len(starts), dtype=bool)
+    for low, high in PERIODS:
+        # Paid on schedule, and still paid.
+        recurring |= (min_gap >= low) & (max_gap <= high) & (last >= -high)
+    recurring &= (occurrences >= MIN_OCCURRENCES) & (
+        spread <= MAX_AMOUNT_SPREAD * np.abs(mean)
+    )
+
+    # Recurring flows continue at their mean gap, overdue payments tomorrow.
+    period = (last - first) / np.maximum(occurrences - 1, 1)
+    steps = np.arange(1, days // PERIODS[0][0] + 2)
+    due = np.rint(
+        last[recurring, None] + period[recurring, None] * steps
+    ).astype(np.int64)
+    due = np.maximum(due, 1)
+    scheduled = due <= days
+    flow_rows = np.broadcast_to(rows[starts][recurring, None], due.shape)
+    np.add.at(
+        deltas,
+        (flow_rows[scheduled], due[scheduled] - 1),
+        np.broadcast_to(mean[recurring, None], due.shape)[scheduled],
+    )
+
+    # Windows of the other flows, from the latest one (0) back, counted
+    # from the first window with a payment.
+    windows = HISTORY_DAYS // WINDOW_DAYS
+    other = ~recurring[flow]
+    totals = np.bincount(
+        flow[other] * windows + (-day[other]) // WINDOW_DAYS,
+        weights=amount[other],
+        minlength=len(starts) * windows,
+    ).reshape(len(starts), windows)[~recurring]
+    observed = np.arange(windows) <= ((-first[~recurring]) // WINDOW_DAYS)[:, None]
+    x = -np.arange(windows, dtype=np.float64)
+    n = observed.sum(axis=1)
+    mean_x = (observed * x).sum(axis=1) / n
+    mean_y = totals.sum(axis=1) / n
+    dx = np.where(observed, x - mean_x[:, None], 0)
+    sxx = (dx * dx).sum(axis=1)
+    slope = np.divide(
+        (dx * totals).sum(axis=1), sxx, out=np.zeros_like(sxx), where=sxx > 0
+    )
+    future = np.arange(1, days // WINDOW_DAYS + 2)
+    projected = mean_y[:, None] + slope[:, None] * (future - mean_x[:, None])
+    # A trend can't flip the sign of a flow, nor more than double it.
+    low = np.minimum(0, 2 * mean_y)[:, None]
+    high = np.maximum(0, 2 * mean_y)[:, None]
+    projected = np.clip(projected, low, high) / WINDOW_DAYS
+    per_budget = np.zeros((len(deltas), len(future)))
+    np.add.at(per_budget, rows[starts][~recurring], projected)
+    deltas += per_budget[:, np.arange(days) // WINDOW_DAYS]
+    return deltas
+
+
+def project_rules(rules, rows, today, days, deltas):
+    """Add the occurrences of recurring ``rules`` to the daily ``deltas``.
+
+    ``rules`` are tuples of category type, amount, frequency, interval,
+    start, end and posted occurrences, ``rows`` the rows of their budgets.
+    """
+    if not rules:
+        return
+    category_type, amount, frequency, interval, start, end, posted = zip(*rules)
+    amount = np.array(
+        [float(signed_amount(*item)) for item in zip(amount, category_type)]
+    )
+    frequency = np.array(frequency)
+    interval = np.array(interval)
+    posted = np.array(posted)
+    start = np.array(
+        [timezone.localtime(value).date() for value in start], dtype="datetime64[D]"
+    )
+    end = np.array(
+        [timezone.localtime(value).date() if value else "NaT" for value in end],
+        dtype="datetime64[D]",
+    )
+
+    # RecurringRule.get_occurrence() of the next occurrences of all rules.
+    steps = (posted[:, None] + np.arange(days + 1)) * interval[:, None]
+    day_steps = steps * np.select(
+        [frequency == RecurringRule.DAILY, frequency == RecurringRule.WEEKLY],
+        [1, 7],
+    )[:, None]
+    month_steps = steps * np.select(
+        [frequency == RecurringRule.MONTHLY, frequency == RecurringRule.YEARLY],
+        [1, 12],
+    )[:, None]
+    month = start.astype("datetime64[M]")[:, None] + month_steps
+    month_start = month.astype("datetime64[D]")
+    month_length = ((month + 1).astype("datetime64[D]") - month_start).astype(int)
+    day_of_month = (start - start.astype("datetime64[M]")).astype(int)[:, None]
+    dates = month_start + np.minimum(day_of_month, month_length - 1) + day_steps
+
+    # Occurrences the rules haven't posted yet are due tomorrow.
+    due = np.maximum((dates - np.datetime64(today)).astype(np.int64), 1)
+    scheduled = (due <= days) & ~(dates > end[:, None])
+    np.add.at(
+        deltas,
+        (np.broadcast_to(rows[:, None], due.shape)[scheduled], due[scheduled] - 1),
+        np.broadcast_to(amount[:, None], due.shape)[scheduled],
+    )
+
+
+def forecast(budgets, days, today=None):
+    """Return ``{budget id: daily balances}`` of the next ``days`` days.
+
+    The budgets are those of one database. The first balance is the one at
+    the end of tomorrow.
+    """
+    if not budgets:
+        return {}
+    today = today or timezone.localdate()
+    using = budgets[0]._state.db
+    budget_ids = np.unique([budget.pk for budget in budgets])
+
+    budget, category, day, amount = load_history(budget_ids, today, using)
+    deltas = project_flows(
+        np.searchsorted(budget_ids, budget),
+        len(budget_ids),
+        budget,
+        category,
+        day,
+        amount,
+        days,
+    )
+
+    rules = (
+        RecurringRule.objects.using(using)
+        .filter(budget_id__in=budget_ids.tolist(), is_active=True)
+        .values_list(
+            "budget_id",
+            "category__category_type",
+            "amount",
+            "frequency",
+            "interval",
+            "start",
+            "end",
+            "occurrences",
+        )
+    )
+    rules = [(rule[0], rule[1:]) for rule in rules]
+    project_rules(
+        [rule for _, rule in rules],
+        np.searchsorted(budget_ids, [budget_id for budget_id, _ in rules]),
+        today,
+        days,
+        deltas,
+    )
+
+    rows = np.searchsorted(budget_ids, [budget.pk for budget in budgets])
+    balances = np.array([float(budget.current_balance) for budget in budgets])
+    result = balances[:, None] + np.cumsum(deltas[rows], axis=1)
+    return {budget.pk: result[i] for i, budget in enumerate(budgets)}
+
+
+def get_version(user_id, using):
+    """Return the id of the transaction of the latest change of a user."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT max(txid) FROM %s WHERE user_id = %%s" % Change._meta.db_table,
+            [user_id],
+        )
+        return cursor.fetchone()[0]
+
+
+def get_forecast(budget, days, today=None):
+    """Return the daily balances of ``budget`` of the next ``days`` days.
+
+    Forecasts are cached until a change of the owner of the budget.
+    """
+    today = today or timezone.localdate()
+    using = budget._state.db
+    key = (budget.pk, days, today, get_version(budget.user_id, using))
+    return forecasts.get_or_set(
+        key,
+        lambda: forecast([budget], days, today)[budget.pk],
+        [get_tag(Budget, budget.pk)],
+    )
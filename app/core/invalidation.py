@@ -0,0 +1,278 @@
+"""
+Invalidation of per-process caches across workers and hosts.
+
+Saving or deleting a user, budget, category or transaction publishes tags
+of the changed row with PostgreSQL ``NOTIFY`` on ``CHANNEL``. The message
+is sent in the transaction of the change, so it is delivered on commit and
+dropped on rollback. Each worker runs a listener thread on a connection of
+its own, which evicts entries with matching tags from its
+:class:`LocalCache` instances.
+
+A row publishes ``"<model label>:<pk>"`` and, for each of its foreign keys,
+``"<model label>:<field>=<value>"``, for example ``"core.transaction:7"``,
+``"core.transaction:budget=3"`` and ``"core.transaction:category=9"``.
+Cascade deletes only publish the deleted parents, so entries should also be
+tagged with the rows they belong to.
+
+Caches only keep entries while the listener is connected and are cleared
+when it disconnects, as messages sent in between are lost.
+"""
+import functools
+import os
+import select
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+from psycopg2 import Error as Psycopg2Error
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+CHANNEL = "cache_invalidation"
+# PostgreSQL rejects payloads of 8000 bytes or more.
+MAX_PAYLOAD = 7900
+POLL_TIMEOUT = 5
+INITIAL_DELAY = 0.1
+MAX_DELAY = 30
+# Notice a vanished database server within about 25 seconds.
+KEEPALIVES = {
+    "keepalives": 1,
+    "keepalives_idle": 10,
+    "keepalives_interval": 5,
+    "keepalives_count": 3,
+}
+
+_caches = weakref.WeakSet()
+_listening = threading.Event()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_tag(model, pk):
+    """Return the tag of the row ``pk`` of ``model``."""
+    return "%s:%s" % (model._meta.label_lower, pk)
+
+
+def get_related_tag(model, field, value):
+    """Return the tag of the rows of ``model`` whose ``field`` is ``value``."""
+    return "%s:%s=%s" % (model._meta.label_lower, field, value)
+
+
+def get_tags(instance):
+    """Return the tags published when ``instance`` changes."""
+    model = type(instance)
+    tags = [get_tag(model, instance.pk)]
+    for field in model._meta.concrete_fields:
+        if field.many_to_one:
+            value = getattr(instance, field.attname)
+            if value is not None:
+                tags.append(get_related_tag(model, field.name, value))
+    return tags
+
+
+def _split_payloads(tags):
+    payload = ""
+    for tag in sorted(set(tags)):
+        if payload and len(payload) + len(tag) >= MAX_PAYLOAD:
+            yield payload
+            payload = ""
+        payload = "%s,%s" % (payload, tag) if payload else tag
+    if payload:
+        yield payload
+
+
+def publish(tags, using=DEFAULT_DB_ALIAS):
+    """Evict ``tags`` in all processes once the current transaction commits."""
+    if not settings.CACHE_INVALIDATION or not tags:
+        return
+    with connections[using].cursor() as cursor:
+        for payload in _split_payloads(tags):
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+    # Don't wait for the message to come back, so a worker reads its own
+    # writes right away.
+    transaction.on_commit(functools.partial(evict, tags), using=using)
+
+
+def evict(tags):
+    """Evict the entries tagged with any of ``tags`` from local caches."""
+    for cache in list(_caches):
+        cache.evict(tags)
+
+
+def clear():
+    """Empty all local caches."""
+    for cache in list(_caches):
+        cache.clear()
+
+
+class LocalCache:
+    """Cache of one process whose entries are evicted by tag.
+
+    Entries expire after ``ttl`` seconds, which can be long, as changes of
+    the rows they were read from evict them earlier. Beyond ``maxsize``
+    entries the oldest is dropped.
+    """
+
+    def __init__(self, ttl, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # Key to expiry time, value and tags.
+        self._entries = {}
+        self._keys = defaultdict(set)
+        # Bumped by evictions, so values computed before one aren't stored.
+        self._generation = 0
+        _caches.add(self)
+
+    def get_or_set(self, key, compute, tags):
+        """Return the value of ``key``, or ``compute()`` it under ``tags``."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            generation = self._generation
+
+        value = compute()
+        if _listening.is_set():
+            with self._lock:
+                if self._generation == generation:
+                    self._store(key, value, tags, now + self.ttl)
+        return value
+
+    def _store(self, key, value, tags, expires):
+        self._remove(key)
+        if len(self._entries) >= self.maxsize:
+            self._remove(next(iter(self._entries)))
+        self._entries[key] = (expires, value, tags)
+        for tag in tags:
+            self._keys[tag].add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys[tag]
+            keys.discard(key)
+            if not keys:
+                del self._keys[tag]
+
+    def evict(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._keys.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Listener(threading.Thread):
+    """Thread evicting local cache entries on invalidation messages."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.using = using
+        self.stopped = threading.Event()
+        # Wakes the thread from select() when stopped.
+        self._wakeup_read, self._wakeup_write = os.pipe()
+
+    def connect(self):
+        """Open a connection of the listener's own and subscribe to ``CHANNEL``."""
+        wrapper = connections[self.using]
+        params = {**wrapper.get_connection_params(), **KEEPALIVES}
+        connection = wrapper.get_new_connection(params)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("LISTEN %s" % CHANNEL)
+        return connection
+
+    def listen(self, connection):
+        while not self.stopped.is_set():
+            ready = select.select(
+                [connection, self._wakeup_read], [], [], POLL_TIMEOUT
+            )[0]
+            if connection not in ready:
+                continue
+            connection.poll()
+            tags = set()
+            while connection.notifies:
+                tags.update(connection.notifies.pop().payload.split(","))
+            evict(tags)
+
+    def run(self):
+        delay = INITIAL_DELAY
+        while not self.stopped.is_set():
+            try:
+                connection = self.connect()
+            except Psycopg2Error:
+                self.stopped.wait(delay)
+                delay = min(delay * 2, MAX_DELAY)
+                continue
+
+            delay = INITIAL_DELAY
+            _listening.set()
+            try:
+                self.listen(connection)
+            except (Psycopg2Error, OSError):
+                pass
+            finally:
+                _listening.clear()
+                clear()
+                connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        os.write(self._wakeup_write, b"\0")
+        self.join()
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+
+
+def start_listener():
+    """Start the listener thread of this process, unless it's running."""
+    global _listener
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = Listener()
+            _listener.start()
+    return _listener
+
+
+def stop_listener():
+    """Stop the listener thread of this process and empty local caches."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def wait_listening(timeout=None):
+    """Wait until the listener is subscribed, return whether it is."""
+    return _listening.wait(timeout)
+
+
+def _after_fork():
+    # The listener thread doesn't exist in the child, and entries inherited
+    # from the parent would never be evicted.
+    global _listener, _listening, _listener_lock
+    _listener = None
+    _listening = threading.Event()
+    _listener_lock = threading.Lock()
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+        cache.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
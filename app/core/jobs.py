@@ -0,0 +1,146 @@
+"""
+Background jobs stored in PostgreSQL.
+
+Handlers are registered per job kind with :func:`register`. Workers claim
+queued jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` and retry failed ones
+with exponential backoff.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+
+
+class JobType:
+    """Handler and defaults of a registered job kind."""
+
+    def __init__(self, kind, handler, public, priority, max_attempts, serializer):
+        self.kind = kind
+        self.handler = handler
+        self.public = public
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.serializer = serializer
+
+
+registry = {}
+
+
+def register(kind, public=False, priority=0, max_attempts=3, serializer=None):
+    """Register the decorated function as the handler of ``kind`` jobs.
+
+    The handler is called with the running :class:`~core.models.Job` and its
+    return value is stored as the job result. Public kinds can be enqueued
+    through the API, their payload is validated with ``serializer``.
+
+    Handlers producing a file store it in the default storage and return its
+    name under ``"file"``, see :func:`get_file`.
+    """
+
+    def decorator(handler):
+        registry[kind] = JobType(
+            kind, handler, public, priority, max_attempts, serializer
+        )
+        return handler
+
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None, priority=None, run_after=None):
+    """Create a queued job of a registered kind."""
+    job_type = registry[kind]
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        user=user,
+        priority=job_type.priority if priority is None else priority,
+        max_attempts=job_type.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def get_file(result):
+    """Return the name of the file in the default storage of a job result.
+
+    Files are served by the job download API and deleted with their job.
+    """
+    if isinstance(result, dict):
+        return result.get("file")
+    return None
+
+
+def get_backoff(attempts):
+    """Return the delay before retrying a job that failed ``attempts`` times."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim(worker, kinds=None):
+    """Mark the most urgent runnable job as running and return it."""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED, run_after__lte=now
+        )
+        if kinds is not None:
+            queryset = queryset.filter(kind__in=kinds)
+        job = queryset.order_by("-priority", "run_after", "id").first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.worker = worker
+        job.started = job.heartbeat = now
+        job.save(
+            update_fields=["status", "attempts", "worker", "started", "heartbeat"]
+        )
+    return job
+
+
+def run(job):
+    """Execute a claimed job and record its outcome."""
+    try:
+        result = registry[job.kind].handler(job)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + get_backoff(job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+        logger.exception("Job %s failed on attempt %s", job.pk, job.attempts)
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.error = ""
+        job.finished = timezone.now()
+    job.save(update_fields=["status", "result", "error", "run_after", "finished"])
+    return job
+
+
+def requeue_stale(timeout):
+    """Queue again running jobs whose worker stopped sending heartbeats.
+
+    Jobs out of attempts are failed instead, so a job crashing its worker
+    can't loop forever.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING, heartbeat__lt=now - timedelta(seconds=timeout)
+    )
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, finished=now, error="Worker stopped responding."
+    )
+    return stale.update(status=Job.QUEUED, run_after=now)
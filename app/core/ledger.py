@@ -0,0 +1,195 @@
+"""
+Posting transactions and keeping budget balances, balance checkpoints,
+category stats and spending limits in step with them.
+
+Writes to a budget wait for each other on the lock of its row while they
+update its balance. Budgets written by many concurrent writers, such as
+those fed by imports, can have ``balance_stripes``: their writes add to one
+of that many ``BalanceStripe`` rows at random instead. Reads add the
+stripes to the balance, see ``Budget.current_balance``, and
+``fold_balance_stripes()``, run periodically by the command of the same
+name, moves them into it.
+"""
+import random
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import OuterRef, Subquery, Sum
+
+from .changes import log_changes
+from .checkpoints import invalidate_transactions
+from .invalidation import get_related_tag, get_tag, publish
+from .limits import record_spending
+from .models import BalanceStripe, Budget, Category, Transaction, signed_amount
+from .stats import record_transactions
+
+
+def lock_budgets(budget_ids, using):
+    """Lock the budgets without balance stripes, return their ids.
+
+    Budgets are locked in id order until the end of the transaction, so
+    concurrent callers touching overlapping budgets never deadlock. The lock
+    leaves the keys shared, so transactions of the budgets can still be
+    inserted meanwhile. Budgets with stripes aren't locked, their writes add
+    to a stripe instead.
+    """
+    return set(
+        Budget._base_manager.using(using)
+        .select_for_update(no_key=True)
+        .filter(id__in=budget_ids, balance_stripes=0)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def _add_to_balances(deltas, using):
+    values = ", ".join(["(%s, %s::numeric)"] * len(deltas))
+    params = [value for item in sorted(deltas.items()) for value in item]
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "UPDATE %s AS b SET balance = b.balance + d.delta "
+            "FROM (VALUES %s) AS d (id, delta) WHERE b.id = d.id"
+            % (Budget._meta.db_table, values),
+            params,
+        )
+    log_changes(Budget.objects.using(using).filter(id__in=deltas))
+
+
+def _add_to_stripes(deltas, using):
+    stripes = dict(
+        Budget._base_manager.using(using)
+        .filter(id__in=deltas)
+        .values_list("id", "balance_stripes")
+    )
+    # In budget order, so concurrent writers never deadlock.
+    rows = sorted(
+        (budget_id, random.randrange(max(stripes[budget_id], 1)), delta)
+        for budget_id, delta in deltas.items()
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO %s AS s (budget_id, stripe, delta) VALUES %s "
+            "ON CONFLICT (budget_id, stripe) DO UPDATE "
+            "SET delta = s.delta + EXCLUDED.delta"
+            % (
+                BalanceStripe._meta.db_table,
+                ", ".join(["(%s, %s, %s::numeric)"] * len(rows)),
+            ),
+            [value for row in rows for value in row],
+        )
+
+
+def apply_balance_deltas(deltas, using=None):
+    """Add ``{budget_id: delta}`` to the budget balances in bulk.
+
+    Deltas of budgets with balance stripes go to one of their stripes at
+    random, so concurrent writers rarely wait for each other. They're left
+    out of the change log until ``fold_balance_stripes()``.
+    """
+    deltas = {budget_id: delta for budget_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    using = using or router.db_for_write(Budget)
+    with transaction.atomic(using=using):
+        locked = lock_budgets(deltas, using)
+        striped = {pk: delta for pk, delta in deltas.items() if pk not in locked}
+        if striped:
+            _add_to_stripes(striped, using)
+        if locked:
+            _add_to_balances({pk: deltas[pk] for pk in locked}, using)
+        publish([get_tag(Budget, budget_id) for budget_id in deltas], using=using)
+
+
+def fold_balance_stripes(budget_ids, using=None):
+    """Move the deltas of the balance stripes of the budgets to their balances.
+
+    Return the number of stripes folded.
+    """
+    using = using or router.db_for_write(Budget)
+    with transaction.atomic(using=using):
+        list(
+            Budget._base_manager.using(using)
+            .select_for_update(no_key=True)
+            .filter(id__in=budget_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM %s WHERE budget_id = ANY(%%s) RETURNING budget_id, delta"
+                % BalanceStripe._meta.db_table,
+                [list(budget_ids)],
+            )
+            rows = cursor.fetchall()
+        deltas = defaultdict(int)
+        for budget_id, delta in rows:
+            deltas[budget_id] += delta
+        deltas = {budget_id: delta for budget_id, delta in deltas.items() if delta}
+        if deltas:
+            _add_to_balances(deltas, using)
+            publish([get_tag(Budget, budget_id) for budget_id in deltas], using=using)
+    return len(rows)
+
+
+def annotate_unfolded(queryset):
+    """Annotate budgets with the ``unfolded_balance`` of their stripes."""
+    return queryset.annotate(
+        unfolded_balance=Subquery(
+            BalanceStripe._base_manager.filter(budget=OuterRef("pk"))
+            .values("budget")
+            .annotate(total=Sum("delta"))
+            .values("total")
+        )
+    )
+
+
+def track_transactions(transactions, using, weight=1):
+    """Add ``transactions`` to the category stats and spending limits.
+
+    A weight of -1 removes them, before they're deleted or changed. Backdated
+    ones delete the balance checkpoints after them. Return the limit alerts
+    created.
+    """
+    invalidate_transactions(transactions, using)
+    record_transactions(transactions, using, weight)
+    return record_spending(transactions, using, weight)
+
+
+def post_transactions(transactions, using=None):
+    """Create ``transactions`` in bulk and apply them to budget balances.
+
+    They're added to the category stats and spending limits, and each gets
+    the ``anomaly_score`` of its amount.
+    """
+    if not transactions:
+        return []
+    using = using or router.db_for_write(Transaction, instance=transactions[0])
+    category_types = dict(
+        Category.objects.using(using)
+        .filter(id__in={t.category_id for t in transactions})
+        .values_list("id", "category_type")
+    )
+    deltas = defaultdict(int)
+    for item in transactions:
+        item.signed_amount = signed_amount(
+            item.amount, category_types[item.category_id]
+        )
+        deltas[item.budget_id] += item.signed_amount
+
+    with transaction.atomic(using=using):
+        # Before the inserts, whose foreign keys share locks of the budgets.
+        lock_budgets(deltas, using)
+        created = Transaction.objects.using(using).bulk_create(
+            transactions, batch_size=1000
+        )
+        apply_balance_deltas(deltas, using=using)
+        track_transactions(created, using)
+        log_changes(
+            Transaction.objects.using(using).filter(id__in=[t.id for t in created])
+        )
+        publish(
+            [get_related_tag(Transaction, "budget", pk) for pk in deltas]
+            + [get_related_tag(Transaction, "category", pk) for pk in category_types],
+            using=using,
+        )
+    return created
@@ -0,0 +1,139 @@
+"""
+Monthly spending limits of budgets in categories, and their alerts.
+
+A :class:`~core.models.SpendingLimit` counts the spending of its budget in
+its category in the current month. Writes of transactions add their
+spending to the counters in the transaction of the write, under a lock of
+the limit rows, instead of summing the month again, so a write costs the
+same however many transactions the month holds. The first write of a month
+resets the counters of its limits.
+
+When a counter crosses one of ``THRESHOLDS`` of its limit, a
+:class:`~core.models.LimitAlert` is created, once per threshold and month.
+Only transactions of expense categories dated in the current month count.
+
+The ledger and the transaction API record their writes. Other writes, like
+seeded data or changed category types, are counted again when the limit is
+saved.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import LimitAlert, SpendingLimit, Transaction, add_months, month_start
+
+# Percentages of the limit amount alerted when crossed.
+THRESHOLDS = [80, 100]
+
+
+def get_threshold(spent, amount):
+    """Return the highest threshold ``spent`` reaches of ``amount``, or 0."""
+    reached = [t for t in THRESHOLDS if spent * 100 >= t * amount]
+    return reached[-1] if reached else 0
+
+
+def check_thresholds(limit):
+    """Return the alerts of the thresholds ``limit`` crossed since its last.
+
+    Thresholds alerted in the period aren't alerted again, even after the
+    spending dropped below them.
+    """
+    threshold = get_threshold(limit.spent, limit.amount)
+    if threshold <= limit.alerted:
+        return []
+    alerts = [
+        LimitAlert(limit=limit, period=limit.period, threshold=t, spent=limit.spent)
+        for t in THRESHOLDS
+        if limit.alerted < t <= threshold
+    ]
+    limit.alerted = threshold
+    return alerts
+
+
+def apply_spending(rows, using):
+    """Add ``(budget id, category id, spending)`` rows to the current month.
+
+    Return the alerts created.
+    """
+    spending = defaultdict(Decimal)
+    for budget_id, category_id, amount in rows:
+        if amount:
+            spending[budget_id, category_id] += amount
+    if not spending:
+        return []
+    period = month_start(timezone.now())
+    with transaction.atomic(using=using):
+        limits = [
+            limit
+            for limit in SpendingLimit.objects.using(using)
+            .select_for_update()
+            .filter(
+                budget_id__in={budget_id for budget_id, _ in spending},
+                category_id__in={category_id for _, category_id in spending},
+            )
+            .order_by("id")
+            if (limit.budget_id, limit.category_id) in spending
+        ]
+        if not limits:
+            return []
+        alerts = []
+        for limit in limits:
+            if limit.period != period:
+                limit.period = period
+                limit.spent = Decimal("0")
+                limit.alerted = 0
+            limit.spent += spending[limit.budget_id, limit.category_id]
+            alerts += check_thresholds(limit)
+        SpendingLimit.objects.using(using).bulk_update(
+            limits, ["period", "spent", "alerted"]
+        )
+        if alerts:
+            LimitAlert.objects.using(using).bulk_create(alerts, ignore_conflicts=True)
+    return alerts
+
+
+def record_spending(transactions, using, weight=1):
+    """Add the spending of ``transactions`` to their limits, -1 to remove it."""
+    period = month_start(timezone.now())
+    return apply_spending(
+        [
+            (t.budget_id, t.category_id, weight * -t.signed_amount)
+            for t in transactions
+            if t.signed_amount < 0 and month_start(t.created) == period
+        ],
+        using,
+    )
+
+
+def recount(limit):
+    """Count the spending of ``limit`` in the current month again.
+
+    Return the alerts created. ``limit`` is saved, and should be locked.
+    """
+    using = limit._state.db
+    period = month_start(timezone.now())
+    start = timezone.make_aware(datetime.combine(period, time.min))
+    total = (
+        Transaction.objects.using(using)
+        .filter(
+            budget_id=limit.budget_id,
+            category_id=limit.category_id,
+            signed_amount__lt=0,
+            created__gte=start,
+            created__lt=add_months(start, 1),
+        )
+        .aggregate(total=Sum("signed_amount"))["total"]
+    )
+    if limit.period != period:
+        limit.period = period
+        limit.alerted = 0
+    limit.spent = -(total or Decimal("0"))
+    alerts = check_thresholds(limit)
+    with transaction.atomic(using=using):
+        limit.save(update_fields=["period", "spent", "alerted"])
+        LimitAlert.objects.using(using).bulk_create(alerts, ignore_conflicts=True)
+    return alerts
@@ -0,0 +1,24 @@
+"""
+Django command to precompute the OpenAPI schema.
+"""
+from django.core.management.base import BaseCommand
+
+from core.schema import generate_schema, write_schema
+
+
+class Command(BaseCommand):
+    """Django command to write the schema files served by the API."""
+
+    help = "Generate the OpenAPI schema once and write it to SCHEMA_DIR."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            default=None,
+            help="Directory of the schema files, SCHEMA_DIR by default.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for path in write_schema(generate_schema(), options["output_dir"]):
+            self.stdout.write(self.style.SUCCESS("Wrote %s" % path))
@@ -0,0 +1,36 @@
+"""
+Django command to create the balance checkpoints of budgets.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.checkpoints import ensure_checkpoints
+from core.models import Budget
+
+
+class Command(BaseCommand):
+    """Django command to create the missing monthly balance checkpoints."""
+
+    help = (
+        "Create the missing balance checkpoints of all budgets, or of the "
+        "given ones, for example monthly, so balance reads don't create them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=int, action="append", dest="budgets")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        now = timezone.now()
+        budgets = 0
+        for using in settings.SHARDS:
+            queryset = Budget.objects.using(using).order_by("pk")
+            if options["budgets"]:
+                queryset = queryset.filter(pk__in=options["budgets"])
+            for budget in queryset.iterator():
+                ensure_checkpoints(budget, now)
+                budgets += 1
+        self.stdout.write(
+            self.style.SUCCESS("Checkpointed the balances of %d budgets." % budgets)
+        )
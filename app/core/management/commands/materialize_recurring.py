@@ -0,0 +1,100 @@
+"""
+Django command to create the transactions of due recurring rules.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from core.ledger import post_transactions
+from core.models import RecurringRule, Transaction
+
+
+def materialize_batch(batch_size, max_occurrences, now=None, using=DEFAULT_DB_ALIAS):
+    """Post the due occurrences of up to ``batch_size`` rules of a shard.
+
+    Rules are claimed with ``FOR UPDATE SKIP LOCKED``, so several workers can
+    run side by side without posting an occurrence twice. Returns the number
+    of claimed rules and of created transactions.
+    """
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        rules = list(
+            RecurringRule.objects.using(using)
+            .select_for_update(skip_locked=True)
+            .filter(is_active=True, next_occurrence__lte=now)
+            .order_by("next_occurrence")[:batch_size]
+        )
+        transactions = []
+        for rule in rules:
+            occurrence = rule.next_occurrence
+            posted = 0
+            while occurrence <= now and posted < max_occurrences:
+                if rule.end is not None and occurrence > rule.end:
+                    break
+                transactions.append(
+                    Transaction(
+                        budget_id=rule.budget_id,
+                        category_id=rule.category_id,
+                        amount=rule.amount,
+                        notes=rule.notes,
+                        created=occurrence,
+                    )
+                )
+                posted += 1
+                occurrence = rule.get_occurrence(rule.occurrences + posted)
+            rule.occurrences += posted
+            rule.next_occurrence = occurrence
+            if rule.end is not None and occurrence > rule.end:
+                rule.is_active = False
+
+        post_transactions(transactions, using=using)
+        RecurringRule.objects.using(using).bulk_update(
+            rules, ["occurrences", "next_occurrence", "is_active"], batch_size=1000
+        )
+    return len(rules), len(transactions)
+
+
+class Command(BaseCommand):
+    """Django command to materialize recurring transactions."""
+
+    help = "Create the transactions of recurring rules that are due."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--max-occurrences",
+            type=int,
+            default=100,
+            help="Occurrences posted per rule and batch when catching up.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for due rules instead of exiting when done.",
+        )
+        parser.add_argument("--sleep", type=float, default=60)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        total = 0
+        while True:
+            claimed = created = 0
+            for using in settings.SHARDS:
+                rules, posted = materialize_batch(
+                    options["batch_size"], options["max_occurrences"], using=using
+                )
+                claimed += rules
+                created += posted
+            total += created
+            if claimed:
+                self.stdout.write(
+                    "Posted %d transactions for %d rules." % (created, claimed)
+                )
+            elif options["loop"]:
+                time.sleep(options["sleep"])
+            else:
+                break
+        self.stdout.write(self.style.SUCCESS("Posted %d transactions." % total))
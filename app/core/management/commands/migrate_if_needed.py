@@ -0,0 +1,85 @@
+"""
+Django command to migrate the database only when migrations are pending.
+"""
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Serializes migrations of containers starting at the same time.
+MIGRATE_LOCK_ID = 0x6D696772617465
+
+
+def get_migration_plan(connection):
+    """Return the migrations missing from ``django_migrations``."""
+    executor = MigrationExecutor(connection)
+    targets = executor.loader.graph.leaf_nodes()
+    return executor.migration_plan(targets)
+
+
+def _try_lock(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [MIGRATE_LOCK_ID])
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    """Django command to skip ``migrate`` on an up to date database.
+
+    The check loads the migration graph from disk and reads the applied
+    set with one query, a full ``migrate`` also renders model states and
+    runs post-migrate handlers.
+    """
+
+    help = "Run migrate if migrations on disk are missing from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            action="append",
+            help="Database to migrate, by default the default one and the shards.",
+        )
+        parser.add_argument(
+            "--wait",
+            action="store_true",
+            help="Wait for the database first, saving a separate Django startup.",
+        )
+
+    def lock(self, connection):
+        # Polling instead of blocking in pg_advisory_lock(): a blocked
+        # statement holds a snapshot, which CREATE INDEX CONCURRENTLY of
+        # the migrating container would wait for.
+        while not _try_lock(connection):
+            self.stdout.write("Waiting for another container to migrate...")
+            time.sleep(1)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options["wait"]:
+            call_command("wait_for_db", stdout=self.stdout)
+        for database in options["database"] or settings.SHARDS:
+            self.migrate(database, options["verbosity"])
+
+    def migrate(self, database, verbosity):
+        connection = connections[database]
+        if not get_migration_plan(connection):
+            self.stdout.write(self.style.SUCCESS("No migrations to apply."))
+            return
+
+        self.lock(connection)
+        try:
+            # Another container may have migrated while we waited for the lock.
+            if get_migration_plan(connection):
+                call_command(
+                    "migrate",
+                    database=database,
+                    interactive=False,
+                    verbosity=verbosity,
+                    stdout=self.stdout,
+                )
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [MIGRATE_LOCK_ID])
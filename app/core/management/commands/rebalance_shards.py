@@ -0,0 +1,261 @@
+"""
+Django command to move users between shards.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core.changes import SYNCED_MODELS, current_cursor, log_changes, read_changes
+from core.invalidation import get_tag, publish
+from core.models import (
+    BalanceCheckpoint,
+    BalanceStripe,
+    Budget,
+    Category,
+    CategoryStats,
+    Change,
+    LimitAlert,
+    RecurringRule,
+    SpendingLimit,
+    Transaction,
+    Transfer,
+)
+from core.sharding import copy_user, get_placement, get_shard
+
+# Parents first.
+MODELS = [
+    Budget,
+    Category,
+    Transaction,
+    Transfer,
+    RecurringRule,
+    CategoryStats,
+    SpendingLimit,
+    LimitAlert,
+    BalanceCheckpoint,
+    BalanceStripe,
+]
+# Copied again at the cut-over, as their writes aren't in the change log.
+UNLOGGED_MODELS = [
+    Transfer,
+    RecurringRule,
+    CategoryStats,
+    SpendingLimit,
+    LimitAlert,
+    BalanceCheckpoint,
+    BalanceStripe,
+]
+BATCH_SIZE = 2000
+# The cut-over blocks the writes of the user, so catching up continues
+# until few changes are left for it.
+MAX_PASSES = 10
+CUT_OVER_CHANGES = 100
+
+
+def owned(model, user, using):
+    """Return the rows of ``model`` owned by ``user`` on ``using``."""
+    owner = model._meta.default_manager.owner
+    # Soft deleted rows move too, their purge continues on the target.
+    return model._base_manager.using(using).filter(**{owner: user})
+
+
+def copy_rows(queryset, using):
+    """Insert or update the rows of ``queryset`` on ``using``, return the count."""
+    model = queryset.model
+    fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+    count = 0
+    batch = []
+    for obj in queryset.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            count += _upsert(model, batch, fields, using)
+            batch = []
+    return count + _upsert(model, batch, fields, using)
+
+
+def _upsert(model, objs, fields, using):
+    if objs:
+        model.objects.using(using).bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.name],
+            update_fields=fields,
+        )
+    return len(objs)
+
+
+def apply_changes(changes, source, target):
+    """Copy the rows of ``(model, object_id, deleted)`` changes to ``target``."""
+    updated = defaultdict(list)
+    deleted = defaultdict(list)
+    for model, object_id, is_deleted in changes:
+        (deleted if is_deleted else updated)[model].append(object_id)
+    for name, model in SYNCED_MODELS.items():
+        # Soft deleted rows are logged as deleted, but still copied.
+        ids = updated[name] + deleted[name]
+        if ids:
+            rows = model._base_manager.using(source).filter(pk__in=ids)
+            copied = set(rows.values_list("pk", flat=True))
+            deleted[name] = [pk for pk in deleted[name] if pk not in copied]
+            copy_rows(rows, target)
+    for name, model in reversed(SYNCED_MODELS.items()):
+        if deleted[name]:
+            model.objects.using(target).filter(pk__in=deleted[name]).delete()
+
+
+def catch_up(user, cursor, source, target):
+    """Apply the changes of ``user`` after ``cursor``, return the count and cursor."""
+    count = 0
+    while True:
+        changes, cursor, has_more = read_changes(
+            user.pk, cursor, BATCH_SIZE, using=source
+        )
+        apply_changes(
+            [(c.model, c.object_id, c.deleted) for c in changes], source, target
+        )
+        count += len(changes)
+        if not has_more:
+            return count, cursor
+
+
+def lock_user(user, using):
+    """Block the writes of ``user`` on ``using`` until the transaction ends.
+
+    Inserts lock the user, budget or category they reference, other writes
+    the rows they change.
+    """
+    User = type(user)
+    list(
+        User._base_manager.using(using)
+        .select_for_update()
+        .filter(pk=user.pk)
+        .values_list("pk")
+    )
+    for model in MODELS:
+        rows = owned(model, user, using).select_for_update(of=("self",))
+        list(rows.values_list("pk"))
+
+
+def delete_rows(user, using):
+    """Delete the rows of ``user`` from ``using``, without cascades or signals."""
+    for model in [
+        Change,
+        BalanceCheckpoint,
+        BalanceStripe,
+        LimitAlert,
+        SpendingLimit,
+        CategoryStats,
+        Transfer,
+        Transaction,
+        RecurringRule,
+        Category,
+        Budget,
+    ]:
+        owned(model, user, using)._raw_delete(using)
+    if using != DEFAULT_DB_ALIAS:
+        type(user)._base_manager.using(using).filter(pk=user.pk)._raw_delete(using)
+
+
+def move_user(user, target):
+    """Move the rows of ``user`` to the shard ``target``, return their count.
+
+    The rows are copied while the user keeps working, then the changes made
+    meanwhile, read from the change log of the source. The final changes
+    are copied while the writes of the user are blocked, before the
+    directory points to the target and the source rows are deleted.
+
+    Clients sync again from the start, the change log of the target has a
+    change of every row. A write blocked by the cut-over fails or, for an
+    update, affects no row.
+    """
+    source = get_shard(user)
+    if source == target:
+        return 0
+    if target != DEFAULT_DB_ALIAS:
+        copy_user(user, target)
+
+    cursor = current_cursor(using=source)
+    count = sum(copy_rows(owned(model, user, source), target) for model in MODELS)
+    for _ in range(MAX_PASSES):
+        changes, cursor = catch_up(user, cursor, source, target)
+        if changes < CUT_OVER_CHANGES:
+            break
+
+    with transaction.atomic(using=source):
+        lock_user(user, source)
+        with transaction.atomic(using=target):
+            # The writes of the user have finished, no need to wait for the
+            # horizon of the log.
+            apply_changes(
+                Change.objects.using(source)
+                .filter(user=user.pk, txid__gte=cursor[0])
+                .values_list("model", "object_id", "deleted"),
+                source,
+                target,
+            )
+            for model in UNLOGGED_MODELS:
+                rows = owned(model, user, source)
+                owned(model, user, target).exclude(
+                    pk__in=list(rows.values_list("pk", flat=True))
+                ).delete()
+                copy_rows(rows, target)
+            for model in SYNCED_MODELS.values():
+                log_changes(owned(model, user, target))
+
+        user.shard = target
+        type(user)._base_manager.using(DEFAULT_DB_ALIAS).filter(pk=user.pk).update(
+            shard=target
+        )
+        publish([get_tag(type(user), user.pk)], using=DEFAULT_DB_ALIAS)
+        delete_rows(user, source)
+    return count
+
+
+class Command(BaseCommand):
+    """Django command to move users to the shards they belong on."""
+
+    help = (
+        "Move users whose shard differs from the one a hash of their id "
+        "places them on, for example after adding a shard, or move the given "
+        "users to --to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users")
+        parser.add_argument("--to", help="Shard to move the users to.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        target = options["to"]
+        if target is not None and target not in settings.SHARDS:
+            raise CommandError(
+                "Unknown shard %s, shards are %s."
+                % (target, ", ".join(settings.SHARDS))
+            )
+
+        users = get_user_model()._base_manager.using(DEFAULT_DB_ALIAS).order_by("pk")
+        if options["users"]:
+            users = users.filter(pk__in=options["users"])
+
+        moved = 0
+        for user in users.iterator(chunk_size=BATCH_SIZE):
+            source, shard = get_shard(user), target or get_placement(user.pk)
+            if source == shard:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(
+                    "Would move user %s from %s to %s." % (user.pk, source, shard)
+                )
+            else:
+                count = move_user(user, shard)
+                self.stdout.write(
+                    "Moved user %s from %s to %s, %d rows."
+                    % (user.pk, source, shard, count)
+                )
+            moved += 1
+        verb = "Would move" if options["dry_run"] else "Moved"
+        self.stdout.write(self.style.SUCCESS("%s %d users." % (verb, moved)))
@@ -0,0 +1,39 @@
+"""
+Django command to recompute the category stats of budgets.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Budget
+from core.stats import rebuild
+
+
+class Command(BaseCommand):
+    """Django command to rebuild category stats from the transactions."""
+
+    help = (
+        "Recompute the category stats of all budgets, or of the given ones, "
+        "from their transactions, for example after seeding or bulk deletes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=int, action="append", dest="budgets")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        budgets = pairs = 0
+        for using in settings.SHARDS:
+            queryset = Budget.objects.using(using).order_by("pk")
+            if options["budgets"]:
+                queryset = queryset.filter(pk__in=options["budgets"])
+            ids = list(queryset.values_list("pk", flat=True))
+            for start in range(0, len(ids), options["batch_size"]):
+                batch = ids[start : start + options["batch_size"]]
+                pairs += rebuild(batch, using)
+                budgets += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rebuilt the stats of %d categories in %d budgets." % (pairs, budgets)
+            )
+        )
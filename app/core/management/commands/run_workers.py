@@ -0,0 +1,145 @@
+"""
+Django command to run background job workers.
+"""
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+
+class Heartbeat:
+    """Refresh the heartbeat of a running job from a background thread."""
+
+    def __init__(self, job, interval):
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                Job.objects.filter(pk=self.job.pk, status=Job.RUNNING).update(
+                    heartbeat=timezone.now()
+                )
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class Worker:
+    """Loop claiming and running jobs until stopped."""
+
+    def __init__(self, name, options):
+        self.name = name
+        self.poll_interval = options["poll_interval"]
+        self.stale_timeout = options["stale_timeout"]
+        self.burst = options["burst"]
+        self.kinds = options["kinds"].split(",") if options["kinds"] else None
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        processed = 0
+        last_recovery = 0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - last_recovery > self.stale_timeout:
+                jobs.requeue_stale(self.stale_timeout)
+                last_recovery = time.monotonic()
+
+            job = jobs.claim(self.name, self.kinds)
+            if job is None:
+                if self.burst:
+                    break
+                # Jitter keeps idle workers from polling in lockstep.
+                time.sleep(self.poll_interval * random.uniform(0.5, 1.5))
+                continue
+
+            with Heartbeat(job, self.stale_timeout / 3):
+                jobs.run(job)
+            processed += 1
+        return processed
+
+
+def _run_process(name, options):
+    # Connections inherited from the parent must not be shared.
+    connections.close_all()
+    worker = Worker(name, options)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+class Command(BaseCommand):
+    """Django command to process background jobs."""
+
+    help = "Run a pool of worker processes executing queued jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--stale-timeout",
+            type=float,
+            default=60,
+            help="Seconds without heartbeat after which a running job is retried.",
+        )
+        parser.add_argument(
+            "--kinds",
+            default="",
+            help="Comma separated job kinds to process, all kinds by default.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        prefix = "%s:%s" % (socket.gethostname(), os.getpid())
+        if options["processes"] <= 1:
+            processed = Worker(prefix, options).run()
+            self.stdout.write(self.style.SUCCESS("Processed %d jobs." % processed))
+            return
+
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_run_process, args=("%s/%d" % (prefix, i), options)
+            )
+            for i in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+
+        def forward(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
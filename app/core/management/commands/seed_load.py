@@ -0,0 +1,311 @@
+"""
+Django command to generate synthetic load-test data with COPY.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.changes import log_changes
+from core.models import Budget, Category, Change, Transaction
+
+CATEGORIES = [
+    # (name, category type, relative frequency, median amount)
+    ("Salary", "Income", 2, 2500),
+    ("Freelance", "Income", 1, 600),
+    ("Interest", "Income", 1, 15),
+    ("Rent", "Expense", 2, 900),
+    ("Groceries", "Expense", 30, 45),
+    ("Restaurants", "Expense", 12, 30),
+    ("Transport", "Expense", 10, 12),
+    ("Utilities", "Expense", 3, 80),
+    ("Subscriptions", "Expense", 4, 12),
+    ("Entertainment", "Expense", 6, 35),
+    ("Health", "Expense", 3, 50),
+    ("Shopping", "Expense", 8, 60),
+]
+CURRENCIES = ["USD", "EUR", "UAH", "PLN", "GBP"]
+NOTES = ["", "", "", "card payment", "cash", "monthly", "online order"]
+MAX_BALANCE = Decimal("99999999.99")
+
+
+class CopyStream:
+    """File-like object feeding chunks of generated rows to ``COPY``."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def read(self, size=-1):
+        return next(self._chunks, "")
+
+    readline = read
+
+
+def copy_rows(cursor, table, columns, rows, chunk_size=5000):
+    """Stream tab-separated ``rows`` into ``table`` with ``COPY``."""
+
+    def chunks():
+        lines = []
+        for row in rows:
+            lines.append("\t".join(row))
+            if len(lines) >= chunk_size:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    cursor.copy_expert(
+        "COPY %s (%s) FROM STDIN" % (table, ", ".join(columns)),
+        CopyStream(chunks()),
+    )
+
+
+def reserve_ids(cursor, table, count):
+    """Advance the id sequence of ``table`` by ``count``, return the first id."""
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+        "nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+        [table, table, count],
+    )
+    return cursor.fetchone()[0] - count + 1
+
+
+def power_law_counts(total, size, alpha, rng):
+    """Split ``total`` into ``size`` Pareto-distributed parts."""
+    weights = [rng.paretovariate(alpha) for _ in range(size)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    counts[weights.index(max(weights))] += total - sum(counts)
+    return counts
+
+
+class Command(BaseCommand):
+    """Django command to seed the database with synthetic data."""
+
+    help = (
+        "Generate users, budgets, categories and power-law distributed "
+        "transactions for load testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--transactions", type=int, default=10000000)
+        parser.add_argument("--max-budgets", type=int, default=3)
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.2,
+            help="Pareto shape of the transactions per budget distribution.",
+        )
+        parser.add_argument(
+            "--email-prefix",
+            default="load",
+            help="Users are created as <prefix><n>@example.com, n from 0.",
+        )
+        parser.add_argument("--password", default="loadtest123")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options["seed"])
+        users = options["users"]
+        budgets_per_user = [
+            rng.randint(1, options["max_budgets"]) for _ in range(users)
+        ]
+        budgets = sum(budgets_per_user)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            first_user = self._copy_users(cursor, users, options)
+            first_category = self._copy_categories(cursor, first_user, users)
+            first_budget, owners = self._copy_budgets(
+                cursor, first_user, budgets_per_user, rng
+            )
+            counts = power_law_counts(
+                options["transactions"], budgets, options["alpha"], rng
+            )
+            balances = self._copy_transactions(
+                cursor, first_budget, owners, first_category, counts, options, rng
+            )
+            self._update_balances(cursor, first_budget, balances)
+            self._log_changes(first_user, users)
+            cursor.execute(
+                "ANALYZE %s, %s, %s, %s, %s"
+                % (
+                    get_user_model()._meta.db_table,
+                    Budget._meta.db_table,
+                    Category._meta.db_table,
+                    Transaction._meta.db_table,
+                    Change._meta.db_table,
+                )
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Created %d users, %d budgets, %d categories and %d transactions."
+                % (users, budgets, users * len(CATEGORIES), options["transactions"])
+            )
+        )
+
+    def _copy_users(self, cursor, users, options):
+        table = get_user_model()._meta.db_table
+        first = reserve_ids(cursor, table, users)
+        password = make_password(options["password"])
+        now = datetime.now(timezone.utc).isoformat()
+        prefix = options["email_prefix"]
+        rows = (
+            (
+                str(first + i),
+                "%s%d@example.com" % (prefix, i),
+                password,
+                "f",
+                "f",
+                "t",
+                now,
+                # On the default database, like every user placed before sharding.
+                "",
+            )
+            for i in range(users)
+        )
+        copy_rows(
+            cursor,
+            table,
+            [
+                "id",
+                "email",
+                "password",
+                "is_superuser",
+                "is_staff",
+                "is_active",
+                "date_joined",
+                "shard",
+            ],
+            rows,
+        )
+        self.stdout.write("Users copied.")
+        return first
+
+    def _copy_categories(self, cursor, first_user, users):
+        table = Category._meta.db_table
+        first = reserve_ids(cursor, table, users * len(CATEGORIES))
+        now = datetime.now(timezone.utc).isoformat()
+        rows = (
+            (
+                str(first + user * len(CATEGORIES) + i),
+                str(first_user + user),
+                name,
+                category_type,
+                now,
+            )
+            for user in range(users)
+            for i, (name, category_type, _, _) in enumerate(CATEGORIES)
+        )
+        copy_rows(
+            cursor, table, ["id", "user_id", "name", "category_type", "created"], rows
+        )
+        self.stdout.write("Categories copied.")
+        return first
+
+    def _copy_budgets(self, cursor, first_user, budgets_per_user, rng):
+        table = Budget._meta.db_table
+        owners = [
+            user for user, count in enumerate(budgets_per_user) for _ in range(count)
+        ]
+        first = reserve_ids(cursor, table, len(owners))
+        now = datetime.now(timezone.utc).isoformat()
+        rows = (
+            (
+                str(first + i),
+                str(first_user + user),
+                rng.choice(CURRENCIES),
+                "0",
+                "0",
+                now,
+            )
+            for i, user in enumerate(owners)
+        )
+        copy_rows(
+            cursor,
+            table,
+            ["id", "user_id", "currency", "balance", "balance_stripes", "created"],
+            rows,
+        )
+        self.stdout.write("Budgets copied.")
+        return first, owners
+
+    def _copy_transactions(
+        self, cursor, first_budget, owners, first_category, counts, options, rng
+    ):
+        table = Transaction._meta.db_table
+        balances = [0] * len(counts)
+        weights = [frequency for _, _, frequency, _ in CATEGORIES]
+        indexes = list(range(len(CATEGORIES)))
+        end = datetime.now(timezone.utc)
+        span = timedelta(days=options["days"]).total_seconds()
+
+        def rows():
+            for budget, count in enumerate(counts):
+                user_categories = first_category + owners[budget] * len(CATEGORIES)
+                picks = rng.choices(indexes, weights, k=count)
+                for i in picks:
+                    _, category_type, _, median = CATEGORIES[i]
+                    cents = max(1, int(median * rng.lognormvariate(0, 0.6) * 100))
+                    if category_type == "Expense":
+                        cents = -cents
+                    balances[budget] += cents
+                    created = end - timedelta(seconds=rng.random() * span)
+                    amount = "%.2f" % (cents / 100)
+                    yield (
+                        str(first_budget + budget),
+                        str(user_categories + i),
+                        amount,
+                        # Expense amounts are already negative.
+                        amount,
+                        rng.choice(NOTES),
+                        created.isoformat(),
+                    )
+
+        copy_rows(
+            cursor,
+            table,
+            ["budget_id", "category_id", "amount", "signed_amount", "notes", "created"],
+            rows(),
+        )
+        self.stdout.write("Transactions copied.")
+        return balances
+
+    def _update_balances(self, cursor, first_budget, balances):
+        cursor.execute(
+            "CREATE TEMPORARY TABLE seed_balance (id bigint, balance numeric) "
+            "ON COMMIT DROP"
+        )
+        rows = (
+            (
+                str(first_budget + i),
+                str(
+                    max(-MAX_BALANCE, min(MAX_BALANCE, Decimal(cents) / 100))
+                ),
+            )
+            for i, cents in enumerate(balances)
+        )
+        copy_rows(cursor, "seed_balance", ["id", "balance"], rows)
+        cursor.execute(
+            "UPDATE %s AS b SET balance = s.balance FROM seed_balance AS s "
+            "WHERE b.id = s.id" % Budget._meta.db_table
+        )
+
+    def _log_changes(self, first_user, users):
+        # Clients of the new users sync everything on their first call.
+        owners = {"user__gte": first_user, "user__lt": first_user + users}
+        log_changes(Budget.objects.filter(**owners))
+        log_changes(Category.objects.filter(**owners))
+        log_changes(
+            Transaction.objects.filter(
+                **{"budget__%s" % lookup: value for lookup, value in owners.items()}
+            )
+        )
+        self.stdout.write("Changes logged.")
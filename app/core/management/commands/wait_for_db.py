@@ -1,26 +1,70 @@
 """
 Django command to wait for the database to be available.
 """
+import socket
 import time
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+INITIAL_DELAY = 0.05
 
 
 class Command(BaseCommand):
     """Django command to wait for the database."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=120,
+            help="Seconds to wait before giving up.",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=1.0,
+            help="Longest pause between two attempts.",
+        )
+
+    def probe(self, connection):
+        """Open and close a TCP connection to the database server.
+
+        This fails fast while the server isn't listening, without the cost
+        of a PostgreSQL handshake.
+        """
+        host = connection.settings_dict["HOST"] or "localhost"
+        if host.startswith("/"):
+            # Unix socket directory, left to connect() to check.
+            return
+        port = int(connection.settings_dict["PORT"] or 5432)
+        socket.create_connection((host, port), timeout=1).close()
+
+    def connect(self, connection):
+        """Check that the database accepts sessions, not just TCP."""
+        connection.ensure_connection()
+        connection.close()
+
     def handle(self, *args, **options):
         """Entrypoint for command."""
         self.stdout.write(self.style.WARNING("\nWaiting for database..."))
-        db_up = False
-        while db_up is False:
+        connection = connections["default"]
+        deadline = time.monotonic() + options["timeout"]
+        delay = INITIAL_DELAY
+        while True:
             try:
-                self.check(databases=["default"])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write("Database unavailable, waiting 1 second...")
-                time.sleep(1)
+                self.probe(connection)
+                self.connect(connection)
+                break
+            except (OSError, Psycopg2OpError, OperationalError):
+                if time.monotonic() >= deadline:
+                    raise CommandError("Database unavailable, giving up.")
+                self.stdout.write(
+                    "Database unavailable, waiting %.2f seconds..." % delay
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options["max_delay"])
         self.stdout.write(self.style.SUCCESS("Database available!"))
@@ -0,0 +1,340 @@
+"""
+Process-shared request and database metrics.
+
+Every process writes to its own memory-mapped file in ``METRICS_DIR``, so
+recording a sample never waits on another uwsgi worker. A scrape reads the
+files of all workers, sums them and renders the Prometheus text format.
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0,
+)
+
+_HEADER = struct.Struct("<Q")
+_ENTRY = struct.Struct("<II")
+_INITIAL_SIZE = 1 << 20
+
+
+def _padded(length):
+    return (length + 7) & ~7
+
+
+class ProcessStore:
+    """Memory-mapped file holding the samples of a single process.
+
+    The file starts with the number of bytes in use, followed by entries of
+    ``key length, value count, key, values``. An entry is fully written before
+    the header is advanced, so readers always see a consistent prefix.
+    """
+
+    def __init__(self, directory, ident):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "metrics_%s.db" % ident)
+        self.lock = threading.Lock()
+        self.positions = {}
+
+        self._file = open(self.path, "a+b")
+        size = max(os.fstat(self._file.fileno()).st_size, _INITIAL_SIZE)
+        self._map(size)
+
+        used = _HEADER.unpack_from(self._mmap, 0)[0]
+        if used == 0:
+            used = _HEADER.size
+            _HEADER.pack_into(self._mmap, 0, used)
+        self._used = used
+        for key, index, _ in _iter_entries(self._mmap, used):
+            self.positions[_decode_key(key)] = index
+
+    def _map(self, size):
+        self._file.truncate(size)
+        self._size = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self.values = memoryview(self._mmap).cast("d")
+
+    def _grow(self, required):
+        size = self._size
+        while size < required:
+            size *= 2
+        self.values.release()
+        self._mmap.close()
+        self._map(size)
+
+    def allocate(self, key, count):
+        """Reserve ``count`` zeroed values for ``key``, return the first index.
+
+        Must be called with ``lock`` held.
+        """
+        index = self.positions.get(key)
+        if index is not None:
+            return index
+
+        encoded = json.dumps([key[0], list(key[1])]).encode()
+        offset = self._used
+        values_offset = offset + _ENTRY.size + _padded(len(encoded))
+        end = values_offset + count * 8
+        if end > self._size:
+            self._grow(end)
+
+        _ENTRY.pack_into(self._mmap, offset, len(encoded), count)
+        self._mmap[offset + _ENTRY.size:offset + _ENTRY.size + len(encoded)] = encoded
+        self._used = end
+        _HEADER.pack_into(self._mmap, 0, end)
+
+        index = values_offset // 8
+        self.positions[key] = index
+        return index
+
+    def close(self):
+        self.values.release()
+        self._mmap.close()
+        self._file.close()
+
+
+def _iter_entries(buffer, used):
+    offset = _HEADER.size
+    while offset < used:
+        key_length, count = _ENTRY.unpack_from(buffer, offset)
+        key_offset = offset + _ENTRY.size
+        key = bytes(buffer[key_offset:key_offset + key_length])
+        values_offset = key_offset + _padded(key_length)
+        yield key, values_offset // 8, count
+        offset = values_offset + count * 8
+
+
+def _decode_key(raw):
+    name, labelvalues = json.loads(raw)
+    return name, tuple(labelvalues)
+
+
+class Registry:
+    """Collection of metrics sharing one metrics directory."""
+
+    def __init__(self, directory=None, ident=None):
+        self._directory = directory
+        self._ident = ident
+        self._store = None
+        self._lock = threading.Lock()
+        self.metrics = {}
+        _registries.add(self)
+
+    @property
+    def directory(self):
+        return self._directory or settings.METRICS_DIR
+
+    def _reset(self):
+        # A forked worker must never write into its parent's file.
+        self._store = None
+        self._lock = threading.Lock()
+
+    def get_store(self):
+        store = self._store
+        if store is None:
+            with self._lock:
+                if self._store is None:
+                    ident = self._ident or os.getpid()
+                    self._store = ProcessStore(self.directory, ident)
+                store = self._store
+        return store
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError("Metric %s is already registered" % metric.name)
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        """Return ``{name: {labelvalues: values}}`` summed over all processes."""
+        samples = {}
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.db")):
+            try:
+                with open(path, "rb") as metrics_file:
+                    data = metrics_file.read()
+            except FileNotFoundError:
+                continue
+            if len(data) < _HEADER.size:
+                continue
+            used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+            for raw, index, count in _iter_entries(data, used):
+                name, labelvalues = _decode_key(raw)
+                values = struct.unpack_from("<%dd" % count, data, index * 8)
+                series = samples.setdefault(name, {})
+                if labelvalues in series:
+                    series[labelvalues] = [
+                        a + b for a, b in zip(series[labelvalues], values)
+                    ]
+                else:
+                    series[labelvalues] = list(values)
+        return samples
+
+    def render(self):
+        """Render all registered metrics in the Prometheus text format."""
+        samples = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append("# HELP %s %s" % (name, metric.documentation))
+            lines.append("# TYPE %s %s" % (name, metric.kind))
+            for labelvalues, values in sorted(samples.get(name, {}).items()):
+                lines.extend(metric.render(labelvalues, values))
+        return "\n".join(lines) + "\n"
+
+
+_registries = weakref.WeakSet()
+
+
+def _reset_registries():
+    for registry in list(_registries):
+        registry._reset()
+
+
+os.register_at_fork(after_in_child=_reset_registries)
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (k, _escape(str(v))) for k, v in pairs)
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """Base class for metrics stored in a registry."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        registry.register(self)
+
+    @property
+    def size(self):
+        return 1
+
+    def _index(self, store, labelvalues):
+        index = store.positions.get((self.name, labelvalues))
+        if index is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(
+                    "%s expects labels %s" % (self.name, self.labelnames)
+                )
+            index = store.allocate((self.name, labelvalues), self.size)
+        return index
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        store = self.registry.get_store()
+        with store.lock:
+            index = self._index(store, labelvalues)
+            store.values[index] += amount
+
+    def render(self, labelvalues, values):
+        return [
+            "%s%s %s"
+            % (
+                self.name,
+                _format_labels(self.labelnames, labelvalues),
+                _format_value(values[0]),
+            )
+        ]
+
+
+class Histogram(Metric):
+    """Fixed-bucket distribution of observed values."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=LATENCY_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(*args, **kwargs)
+
+    @property
+    def size(self):
+        # One slot per bucket, one for +Inf and one for the sum.
+        return len(self.buckets) + 2
+
+    def observe(self, value, *labelvalues):
+        bucket = bisect_left(self.buckets, value)
+        store = self.registry.get_store()
+        with store.lock:
+            index = self._index(store, labelvalues)
+            values = store.values
+            values[index + bucket] += 1
+            values[index + len(self.buckets) + 1] += value
+
+    def render(self, labelvalues, values):
+        lines = []
+        cumulative = 0
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, values):
+            cumulative += count
+            lines.append(
+                "%s_bucket%s %s"
+                % (
+                    self.name,
+                    _format_labels(self.labelnames, labelvalues, [("le", bound)]),
+                    _format_value(cumulative),
+                )
+            )
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append("%s_sum%s %s" % (self.name, labels, _format_value(values[-1])))
+        lines.append("%s_count%s %s" % (self.name, labels, _format_value(cumulative)))
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ["method", "route", "status"],
+)
+REQUEST_EXCEPTIONS = Counter(
+    "http_exceptions_total",
+    "Unhandled exceptions raised by views.",
+    ["route", "exception"],
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing database queries.",
+    ["database", "operation"],
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_QUEUE_TIME = Histogram(
+    "http_request_queue_seconds",
+    "Time requests waited between the proxy and a worker.",
+    ["route"],
+)
+REQUEST_SHED = Counter(
+    "http_requests_shed_total",
+    "Requests rejected because they waited longer than their route's budget.",
+    ["route"],
+)
@@ -0,0 +1,150 @@
+"""
+Middleware for the finance app.
+"""
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+
+from .metrics import (
+    QUERY_LATENCY,
+    REQUEST_EXCEPTIONS,
+    REQUEST_LATENCY,
+    REQUEST_QUEUE_TIME,
+    REQUEST_SHED,
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+QUERY_OPERATIONS = frozenset(["SELECT", "INSERT", "UPDATE", "DELETE", "COPY"])
+
+
+def get_route(request):
+    """Return a low-cardinality name of the view that handled the request."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return match.view_name or match.route
+
+
+def _observe_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        words = sql[:16].split(None, 1)
+        operation = words[0].upper() if words else ""
+        QUERY_LATENCY.observe(
+            time.perf_counter() - start,
+            context["connection"].alias,
+            operation if operation in QUERY_OPERATIONS else "OTHER",
+        )
+
+
+class MetricsMiddleware:
+    """Record request latency per route and status, and query latency."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        wrapped = connections.all()
+        for conn in wrapped:
+            conn.execute_wrappers.append(_observe_query)
+        try:
+            response = self.get_response(request)
+        finally:
+            for conn in wrapped:
+                conn.execute_wrappers.remove(_observe_query)
+
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            request.method,
+            get_route(request),
+            str(response.status_code),
+        )
+        return response
+
+    def process_exception(self, request, exception):
+        REQUEST_EXCEPTIONS.inc(get_route(request), type(exception).__name__)
+
+
+def get_request_start(request):
+    """Return the time the proxy received the request, in epoch seconds.
+
+    Reads ``X-Request-Start`` as set by nginx (``t=<seconds>.<millis>``).
+    Millisecond and microsecond integers are accepted as well.
+    """
+    header = request.META.get("HTTP_X_REQUEST_START")
+    if not header:
+        return None
+    try:
+        value = float(header[2:] if header.startswith("t=") else header)
+    except ValueError:
+        return None
+    if value > 1e14:
+        return value / 1e6
+    if value > 1e11:
+        return value / 1e3
+    return value
+
+
+class AdmissionControlMiddleware:
+    """Shed requests that waited in the queue longer than their route allows.
+
+    A request that already waited past its budget would most likely time out
+    at the client anyway, so rejecting it with a fast 503 frees the worker
+    for requests that can still succeed. Expensive routes get shorter
+    budgets, so they are shed first when queues build up.
+    """
+
+    def __init__(self, get_response):
+        if not settings.ADMISSION_CONTROL:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def get_budget(self, request, route):
+        budgets = settings.ADMISSION_QUEUE_BUDGETS
+        key = "%s %s" % (request.method, route)
+        if key in budgets:
+            return budgets[key]
+        return budgets.get(route, budgets["default"])
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        start = get_request_start(request)
+        if start is None:
+            return None
+
+        route = get_route(request)
+        waited = max(0.0, time.time() - start)
+        REQUEST_QUEUE_TIME.observe(waited, route)
+        budget = self.get_budget(request, route)
+        if budget is None or waited <= budget:
+            return None
+
+        REQUEST_SHED.inc(route)
+        request.shed = True
+        response = JsonResponse(
+            {"detail": "Server is overloaded, retry later."}, status=503
+        )
+        response["Retry-After"] = str(max(1, math.ceil(min(waited, 30))))
+        return response
+
+
+class ShedRequestFilter(logging.Filter):
+    """Drop the ``django.request`` records of requests shed by admission control.
+
+    Django logs every 5xx, rendering a traceback for the admin mail handler,
+    which would cost more than the request being shed. ``REQUEST_SHED``
+    already counts it.
+    """
+
+    def filter(self, record):
+        return not getattr(getattr(record, "request", None), "shed", False)
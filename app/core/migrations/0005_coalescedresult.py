@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoalescedResult',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('value', models.JSONField()),
+                ('finished', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        # Results only live for the duration of a request, so they don't need
+        # to survive a crash or be replicated.
+        migrations.RunSQL(
+            "ALTER TABLE core_coalescedresult SET UNLOGGED",
+            "ALTER TABLE core_coalescedresult SET LOGGED",
+        ),
+    ]
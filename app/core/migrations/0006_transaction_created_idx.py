@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Building the index concurrently keeps large transaction tables writable.
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_coalescedresult'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['created'], name='transaction_created_idx'),
+        ),
+    ]
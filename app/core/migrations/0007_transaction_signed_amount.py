@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:15
+
+from decimal import Decimal
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+BATCH_SIZE = 10000
+
+
+def backfill_signed_amount(apps, schema_editor):
+    """Fill ``signed_amount`` in id ranges, each committed on its own.
+
+    Every batch locks at most ``BATCH_SIZE`` rows for a short update instead
+    of the whole table for one long one.
+    """
+    Transaction = apps.get_model("core", "Transaction")
+    Category = apps.get_model("core", "Category")
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(id), max(id) FROM %s" % Transaction._meta.db_table
+        )
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BATCH_SIZE):
+            cursor.execute(
+                "UPDATE %s AS t SET signed_amount = CASE "
+                "WHEN c.category_type = 'Income' THEN abs(t.amount) "
+                "ELSE -abs(t.amount) END "
+                "FROM %s AS c "
+                "WHERE c.id = t.category_id AND t.id >= %%s AND t.id < %%s"
+                % (Transaction._meta.db_table, Category._meta.db_table),
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+    # Each backfill batch and the index build run outside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_transaction_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='signed_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=10),
+        ),
+        migrations.RunPython(
+            backfill_signed_amount, migrations.RunPython.noop, atomic=False
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['budget', 'created'], include=('signed_amount',), name='transaction_budget_totals_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+# Owner and id of the rows of each synced table.
+SYNCED_ROWS = {
+    "budget": "SELECT user_id, id FROM core_budget",
+    "category": "SELECT user_id, id FROM core_category",
+    "transaction": (
+        "SELECT b.user_id, t.id FROM core_transaction AS t "
+        "JOIN core_budget AS b ON b.id = t.budget_id"
+    ),
+}
+
+
+def backfill_changes(apps, schema_editor):
+    """Log every existing row as changed, in id ranges committed on their own.
+
+    A client syncing from scratch then receives all of its rows.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        for model, select in SYNCED_ROWS.items():
+            table = "core_%s" % model
+            cursor.execute("SELECT min(id), max(id) FROM %s" % table)
+            first, last = cursor.fetchone()
+            if first is None:
+                continue
+            alias = "t" if model == "transaction" else table
+            for start in range(first, last + 1, BATCH_SIZE):
+                cursor.execute(
+                    "INSERT INTO core_change (user_id, object_id, model, deleted, txid) "
+                    "SELECT *, %%s, false, pg_current_xact_id()::text::bigint "
+                    "FROM (%s WHERE %s.id >= %%s AND %s.id < %%s) AS rows "
+                    "ON CONFLICT (model, object_id) DO NOTHING"
+                    % (select, alias, alias),
+                    [model, start, start + BATCH_SIZE],
+                )
+
+
+class Migration(migrations.Migration):
+    # Each backfill batch runs in a transaction of its own.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0007_transaction_signed_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('txid', models.BigIntegerField()),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'txid', 'id'], include=('model', 'object_id', 'deleted'), name='change_feed_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='change',
+            constraint=models.UniqueConstraint(fields=('model', 'object_id'), name='change_object_uniq'),
+        ),
+        migrations.RunPython(
+            backfill_changes, migrations.RunPython.noop, atomic=False
+        ),
+    ]
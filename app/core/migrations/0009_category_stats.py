@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('sketch', models.BinaryField(default=bytes)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.budget')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Category stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='categorystats',
+            constraint=models.UniqueConstraint(fields=('budget', 'category'), name='category_stats_uniq'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:27
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_category_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('period', models.DateField(blank=True, editable=False, null=True)),
+                ('spent', models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=12)),
+                ('alerted', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.budget')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.category')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LimitAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('period', models.DateField()),
+                ('threshold', models.PositiveSmallIntegerField()),
+                ('spent', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('limit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='core.spendinglimit')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='spendinglimit',
+            constraint=models.UniqueConstraint(fields=('budget', 'category'), name='spending_limit_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='limitalert',
+            constraint=models.UniqueConstraint(fields=('limit', 'period', 'threshold'), name='limit_alert_uniq'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_spending_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='deleted',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(condition=models.Q(('deleted__isnull', False)), fields=['id'], name='budget_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_budget_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.DateTimeField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.budget')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='balancecheckpoint',
+            constraint=models.UniqueConstraint(fields=('budget', 'at'), name='balance_checkpoint_uniq'),
+        ),
+    ]
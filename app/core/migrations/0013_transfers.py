@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:45
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_balance_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('rate', models.DecimalField(decimal_places=8, default=Decimal('1'), max_digits=18)),
+                ('credit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.transaction')),
+                ('debit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.transaction')),
+            ],
+            options={
+                'ordering': ['-created'],
+                'abstract': False,
+            },
+        ),
+    ]
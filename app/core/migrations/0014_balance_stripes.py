@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:49
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_transfers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='balance_stripes',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(64)]),
+        ),
+        migrations.CreateModel(
+            name='BalanceStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe', models.PositiveSmallIntegerField()),
+                ('delta', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.budget')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='balancestripe',
+            constraint=models.UniqueConstraint(fields=('budget', 'stripe'), name='balance_stripe_uniq'),
+        ),
+    ]
@@ -2,15 +2,24 @@
 Database models.
 """
 
+import calendar
+from datetime import timedelta
 from decimal import Decimal
 from django.conf import settings
-from django.db import models
+from django.core.validators import MaxValueValidator
+from django.db import models, router, transaction
+from django.db.models.functions import Abs
+from django.utils import timezone
 
 from .currency_choices import CURRENCY_CHOICES
+from .invalidation import get_related_tag, get_tags, publish
+from .sharding import ShardedManager
+
+MAX_BALANCE_STRIPES = 64
 
 
 class CommonInfo(models.Model):
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(default=timezone.now, editable=False)
     objects = models.Manager()
 
     class Meta:
@@ -24,10 +33,81 @@ class Budget(CommonInfo):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     currency = models.CharField(max_length=15, choices=CURRENCY_CHOICES, blank=False)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0"))
+    # Number of BalanceStripe rows the balance deltas of writes go to instead
+    # of the balance, for budgets with many concurrent writers. See
+    # core.ledger.
+    balance_stripes = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(MAX_BALANCE_STRIPES)]
+    )
+    # Set when the budget is deleted, until core.deletion purges it.
+    deleted = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ShardedManager("user", visible=models.Q(deleted=None))
+
+    class Meta(CommonInfo.Meta):
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(deleted__isnull=False),
+                name="budget_deleted_idx",
+            ),
+        ]
 
     def __str__(self):
         return "%s ID(%s)" % (self.user.email, self.pk)
 
+    @property
+    def current_balance(self):
+        """Balance with the deltas of its stripes not folded into it yet.
+
+        Reads the ``unfolded_balance`` annotation of
+        ``core.ledger.annotate_unfolded()`` if present.
+        """
+        if hasattr(self, "unfolded_balance"):
+            unfolded = self.unfolded_balance
+        else:
+            unfolded = (
+                BalanceStripe._base_manager.using(self._state.db)
+                .filter(budget=self)
+                .aggregate(total=models.Sum("delta"))["total"]
+            )
+        return self.balance + (unfolded or 0)
+
+
+class BalanceStripe(models.Model):
+    """Balance delta of a budget not folded into its balance yet."""
+
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name="+")
+    stripe = models.PositiveSmallIntegerField()
+    delta = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0"))
+
+    objects = ShardedManager("budget__user")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "stripe"], name="balance_stripe_uniq"
+            ),
+        ]
+
+
+def in_visible_budget(budget_id):
+    """Return a filter of rows whose budget, at ``budget_id``, isn't deleted.
+
+    A subquery instead of a join, so locking the rows doesn't lock budgets.
+    """
+    return ~models.Exists(
+        Budget._base_manager.filter(
+            pk=models.OuterRef(budget_id), deleted__isnull=False
+        )
+    )
+
+
+def signed_amount(amount, category_type):
+    """Return the change of the budget balance caused by a transaction."""
+    amount = abs(amount)
+    return amount if category_type == "Income" else -amount
+
 
 class Category(CommonInfo):
     """Base model for income and expense categories."""
@@ -41,12 +121,54 @@ class Category(CommonInfo):
     name = models.CharField(max_length=50)
     category_type = models.CharField(max_length=7, choices=CATEGORY_TYPES, blank=False)
 
+    objects = ShardedManager("user")
+
     class Meta:
         verbose_name_plural = "Categories"
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_category_type = instance.__dict__.get("category_type")
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_category_type", None)
+        changed = loaded is not None and loaded != self.category_type
+        if not changed:
+            super().save(*args, **kwargs)
+            return
+
+        from .checkpoints import invalidate_category
+        from .ledger import apply_balance_deltas
+
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            self.transaction_set.update(
+                signed_amount=Abs("amount")
+                if self.category_type == "Income"
+                else -Abs("amount")
+            )
+            # Each balance loses the old signed amounts and gains the new ones.
+            totals = (
+                self.transaction_set.values("budget")
+                .annotate(total=models.Sum("signed_amount"))
+                .values_list("budget", "total")
+            )
+            apply_balance_deltas(
+                {budget_id: 2 * total for budget_id, total in totals},
+                using=self._state.db,
+            )
+            invalidate_category(self)
+            publish(
+                [get_related_tag(Transaction, "category", self.pk)],
+                using=self._state.db,
+            )
+        self._loaded_category_type = self.category_type
+
 
 class Transaction(CommonInfo):
     """Represents budget transactions."""
@@ -54,8 +176,374 @@ class Transaction(CommonInfo):
     budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Amount signed by the category type, so aggregates don't join categories.
+    signed_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, default=Decimal("0"), editable=False
+    )
     notes = models.TextField(blank=True)
 
+    objects = ShardedManager(
+        "budget__user", visible=in_visible_budget("budget_id")
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["created"], name="transaction_created_idx"),
+            models.Index(
+                fields=["budget", "created"],
+                include=["signed_amount"],
+                name="transaction_budget_totals_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.signed_amount = signed_amount(self.amount, self.category.category_type)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "signed_amount"}
+        super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        from .changes import log_changes
+        from .checkpoints import invalidate_transactions
+
+        using = using or router.db_for_write(Transaction, instance=self)
+        tags = get_tags(self)
+        with transaction.atomic(using=using):
+            invalidate_transactions([self], using)
+            log_changes(
+                Transaction.objects.using(using).filter(pk=self.pk), deleted=True
+            )
+            result = super().delete(using=using, keep_parents=keep_parents)
+        publish(tags, using=using)
+        return result
+
+
+class Transfer(CommonInfo):
+    """Money moved between two budgets of a user, see core.transfers."""
+
+    debit = models.OneToOneField(
+        Transaction, on_delete=models.CASCADE, related_name="+"
+    )
+    credit = models.OneToOneField(
+        Transaction, on_delete=models.CASCADE, related_name="+"
+    )
+    # Units of the currency of the credited budget per unit of the debited one.
+    rate = models.DecimalField(max_digits=18, decimal_places=8, default=Decimal("1"))
+
+    objects = ShardedManager(
+        "debit__budget__user", visible=in_visible_budget("debit__budget_id")
+    )
+
+    def __str__(self):
+        return "%s to %s" % (self.debit, self.credit)
+
+
+class CategoryStats(models.Model):
+    """Statistics of the amounts of a budget in a category, see core.stats."""
+
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name="+")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    # Sum of squared deviations from the mean.
+    m2 = models.FloatField(default=0)
+    # Bucket indexes and counts of a core.stats.Sketch.
+    sketch = models.BinaryField(default=bytes)
+
+    objects = ShardedManager(
+        "budget__user", visible=in_visible_budget("budget_id")
+    )
+
+    class Meta:
+        verbose_name_plural = "Category stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "category"], name="category_stats_uniq"
+            ),
+        ]
+
+
+def month_start(value):
+    """Return the first day of the local month of the datetime ``value``."""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+class SpendingLimit(CommonInfo):
+    """Monthly limit of the spending of a budget in a category, see core.limits."""
+
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Spending counter of the month starting on ``period``, reset by the
+    # first write of a later month.
+    period = models.DateField(null=True, blank=True, editable=False)
+    spent = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0"), editable=False
+    )
+    # Highest threshold, in percent, alerted in the period.
+    alerted = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = ShardedManager(
+        "budget__user", visible=in_visible_budget("budget_id")
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "category"], name="spending_limit_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return "%s limit of %s" % (self.category, self.amount)
+
+    @property
+    def current_spent(self):
+        """Spending of the current month."""
+        if self.period != month_start(timezone.now()):
+            return Decimal("0")
+        return self.spent
+
+
+class LimitAlert(CommonInfo):
+    """Crossing of a threshold of a spending limit, once per month."""
+
+    limit = models.ForeignKey(
+        SpendingLimit, on_delete=models.CASCADE, related_name="alerts"
+    )
+    period = models.DateField()
+    threshold = models.PositiveSmallIntegerField()
+    spent = models.DecimalField(max_digits=12, decimal_places=2)
+
+    objects = ShardedManager(
+        "limit__budget__user", visible=in_visible_budget("limit__budget_id")
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["limit", "period", "threshold"], name="limit_alert_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return "%s%% of %s" % (self.threshold, self.limit)
+
+
+class BalanceCheckpoint(models.Model):
+    """Sum of the transactions of a budget before a month, see core.checkpoints."""
+
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name="+")
+    # Start of a local month.
+    at = models.DateTimeField()
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    objects = ShardedManager(
+        "budget__user", visible=in_visible_budget("budget_id")
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "at"], name="balance_checkpoint_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return "%s at %s" % (self.total, self.at)
+
+
+def add_months(value, months):
+    """Shift ``value`` by ``months``, clamping the day to the month length."""
+    month = value.month - 1 + months
+    year = value.year + month // 12
+    month = month % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+class RecurringRule(CommonInfo):
+    """Template for a transaction repeated on a schedule."""
+
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    MONTHLY = "monthly"
+    YEARLY = "yearly"
+    FREQUENCIES = [
+        (DAILY, "Daily"),
+        (WEEKLY, "Weekly"),
+        (MONTHLY, "Monthly"),
+        (YEARLY, "Yearly"),
+    ]
+
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    notes = models.TextField(blank=True)
+    frequency = models.CharField(max_length=7, choices=FREQUENCIES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    # High-water mark: number of materialized occurrences and the next one due.
+    occurrences = models.PositiveIntegerField(default=0)
+    next_occurrence = models.DateTimeField()
+
+    objects = ShardedManager(
+        "budget__user", visible=in_visible_budget("budget_id")
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(
+                fields=["next_occurrence"],
+                condition=models.Q(is_active=True),
+                name="recurring_rule_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return "%s every %s %s" % (self.category, self.interval, self.frequency)
+
+    def get_occurrence(self, n):
+        """Return the ``n``-th occurrence, counted from zero."""
+        start = timezone.localtime(self.start)
+        steps = n * self.interval
+        if self.frequency == self.DAILY:
+            value = start + timedelta(days=steps)
+        elif self.frequency == self.WEEKLY:
+            value = start + timedelta(weeks=steps)
+        elif self.frequency == self.MONTHLY:
+            value = add_months(start, steps)
+        else:
+            value = add_months(start, 12 * steps)
+        return value
+
+    def save(self, *args, **kwargs):
+        if self.next_occurrence is None:
+            self.next_occurrence = self.get_occurrence(self.occurrences)
+        super().save(*args, **kwargs)
+
+
+class Job(CommonInfo):
+    """Unit of background work executed by the ``run_workers`` command."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True
+    )
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=9, choices=STATUSES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress_current = models.PositiveBigIntegerField(default=0)
+    progress_total = models.PositiveBigIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(
+                fields=["-priority", "run_after", "id"],
+                condition=models.Q(status="queued"),
+                name="job_queue_idx",
+            ),
+            models.Index(
+                fields=["heartbeat"],
+                condition=models.Q(status="running"),
+                name="job_running_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return "%s ID(%s)" % (self.kind, self.pk)
+
+    def set_progress(self, current, total=None):
+        """Store the progress of a running job and refresh its heartbeat."""
+        self.progress_current = current
+        if total is not None:
+            self.progress_total = total
+        self.heartbeat = timezone.now()
+        Job.objects.filter(pk=self.pk).update(
+            progress_current=self.progress_current,
+            progress_total=self.progress_total,
+            heartbeat=self.heartbeat,
+        )
+
+
+class CoalescedResult(models.Model):
+    """Result of a coalesced computation handed over to waiting workers."""
+
+    key = models.CharField(max_length=64, primary_key=True)
+    value = models.JSONField()
+    finished = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class Change(models.Model):
+    """Latest change of a budget, category or transaction, see core.changes."""
+
+    # No database constraint: tombstones are logged while deleting the user, and
+    # are removed with ``core.changes.forget_user()`` afterwards.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        # Leads change_feed_idx.
+        db_index=False,
+        related_name="+",
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    # Id of the PostgreSQL transaction that wrote the change.
+    txid = models.BigIntegerField()
+
+    objects = ShardedManager("user")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model", "object_id"], name="change_object_uniq"
+            ),
+        ]
+        indexes = [
+            # Covering, so reading a page is an index-only scan.
+            models.Index(
+                fields=["user", "txid", "id"],
+                include=["model", "object_id", "deleted"],
+                name="change_feed_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return "%s %s" % (self.model, self.object_id)
+
 
 # class Cashflow(CommonInfo):
 #     """Base class for income and expense."""
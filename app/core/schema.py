@@ -0,0 +1,57 @@
+"""
+OpenAPI schema generated once at build time.
+
+``manage.py build_schema`` renders the schema into files named after the
+API version, which :class:`core.views.SchemaView` serves from memory.
+"""
+import functools
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+RENDERERS = [OpenApiYamlRenderer, OpenApiJsonRenderer]
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """The ``jwtAuth`` security scheme of ``CachedJWTAuthentication``."""
+
+    target_class = "core.authentication.CachedJWTAuthentication"
+
+
+def get_schema_path(suffix, directory=None):
+    """Return the schema file of the current API version for ``suffix``."""
+    directory = Path(directory or settings.SCHEMA_DIR)
+    return directory / ("schema-%s.%s" % (spectacular_settings.VERSION, suffix))
+
+
+def generate_schema():
+    """Return the public schema, as served to anonymous clients."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def write_schema(schema, directory=None):
+    """Render ``schema`` in every served format and return the written paths."""
+    paths = []
+    for renderer_class in RENDERERS:
+        path = get_schema_path(renderer_class.format, directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = renderer_class().render(schema, renderer_class.media_type)
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.write_bytes(content)
+        os.replace(temporary, path)
+        paths.append(path)
+    return paths
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema(path):
+    """Return the content of a schema file and its strong ETag."""
+    content = Path(path).read_bytes()
+    return content, '"%s"' % hashlib.sha256(content).hexdigest()
@@ -0,0 +1,64 @@
+"""
+Time series of budget balances for charts.
+
+PostgreSQL computes the running balance after each transaction with a
+window function, from the balance at the start of the range. Long ranges
+are downsampled in the same query: the range is split into buckets of
+equal time and only the lowest and highest balance of each is returned, so
+a chart keeps its peaks and dips at about ``points`` points, however many
+transactions there are. Ranges with fewer transactions return them all.
+"""
+from django.db import connections
+
+from .checkpoints import get_balance_at
+from .models import Transaction
+
+
+def get_balance_series(budget, start, end, points):
+    """Return the times and balances of ``budget`` from ``start`` to ``end``.
+
+    The first point is the balance at ``start`` and the last the balance at
+    ``end``, with at most ``points`` points in all.
+    """
+    balance = get_balance_at(budget, start)
+    buckets = max((points - 2) // 2, 1)
+    with connections[budget._state.db].cursor() as cursor:
+        # Ordering by created alone keeps the scan on the covering index.
+        cursor.execute(
+            "WITH running AS ("
+            "SELECT created, %%s + sum(signed_amount) OVER ("
+            "ORDER BY created ROWS UNBOUNDED PRECEDING) AS balance, "
+            "least(width_bucket(extract(epoch FROM created)::float8, "
+            "%%s, %%s, %%s), %%s) AS bucket, count(*) OVER () AS total, "
+            "%%s + sum(signed_amount) OVER () AS closing "
+            "FROM %s WHERE budget_id = %%s AND created > %%s AND created <= %%s"
+            "), ranked AS ("
+            "SELECT created, balance, total, closing, row_number() OVER ("
+            "PARTITION BY bucket ORDER BY balance, created) AS low, "
+            "row_number() OVER ("
+            "PARTITION BY bucket ORDER BY balance DESC, created) AS high "
+            "FROM running"
+            ") SELECT created, balance, closing FROM ranked "
+            "WHERE total <= %%s OR low = 1 OR high = 1 ORDER BY created"
+            % Transaction._meta.db_table,
+            [
+                balance,
+                start.timestamp(),
+                end.timestamp(),
+                buckets,
+                buckets,
+                balance,
+                budget.pk,
+                start,
+                end,
+                points - 2,
+            ],
+        )
+        rows = cursor.fetchall()
+    # Downsampled rows may have left out the last transaction.
+    last = rows[0][2] if rows else balance
+    return [start, *(row[0] for row in rows), end], [
+        balance,
+        *(row[1] for row in rows),
+        last,
+    ]
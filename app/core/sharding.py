@@ -0,0 +1,209 @@
+"""
+Sharding of user data across databases.
+
+Budgets, categories, transactions, recurring rules and the change log each
+belong to one user and live on the shard of that user, one of the aliases
+in ``settings.SHARDS``. Users, jobs and everything else stay on the default
+database, which is also the first shard.
+
+The ``shard`` column of a user is the directory. It is set when the user is
+created, by a stable hash of the user id, and changed when the
+``rebalance_shards`` command moves the user. An empty shard is the default
+database, where all rows lived before sharding.
+
+Each shard holds a copy of the users placed on it, so its foreign keys to
+users hold. It also hands out ids from a range of its own, so rows keep
+their ids when their user moves.
+
+``ShardRouter`` sends the queries of an object to its database, and a new
+object to the shard of the user or parent it is created with. Queries
+without an object have no user to route by. They use
+``Model.objects.for_user(user)``, or ``using()`` with ``get_shard()``.
+"""
+import copy
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, models, router
+
+from .invalidation import LocalCache, get_tag
+
+# Ids handed out by each shard, counted from its index times the span.
+ID_SPAN = 10**12
+DIRECTORY_TTL = 60 * 60
+
+directory = LocalCache(ttl=DIRECTORY_TTL)
+
+
+def is_sharded(model):
+    """Return whether the rows of ``model`` live on the shards of their users."""
+    return isinstance(model._meta.default_manager, ShardedManager)
+
+
+def get_placement(user_id, shards=None):
+    """Return the shard a stable hash of ``user_id`` places it on.
+
+    Rendezvous hashing: adding a shard only moves the users it wins.
+    """
+    shards = shards or settings.SHARDS
+
+    def weight(alias):
+        key = ("%s:%s" % (alias, user_id)).encode()
+        return hashlib.blake2b(key, digest_size=8).digest()
+
+    return max(shards, key=weight)
+
+
+def get_shard(user):
+    """Return the alias of the database with the rows of ``user``.
+
+    ``user`` is a user or the id of one.
+    """
+    if len(settings.SHARDS) == 1:
+        return settings.SHARDS[0]
+    if isinstance(user, models.Model):
+        return user.shard or DEFAULT_DB_ALIAS
+
+    User = get_user_model()
+
+    def load():
+        return (
+            User._base_manager.using(DEFAULT_DB_ALIAS)
+            .filter(pk=user)
+            .values_list("shard", flat=True)
+            .first()
+        )
+
+    return directory.get_or_set(user, load, [get_tag(User, user)]) or DEFAULT_DB_ALIAS
+
+
+def copy_user(user, using):
+    """Store a copy of ``user`` on the shard ``using``, for its foreign keys."""
+    User = type(user)
+    User._base_manager.using(using).bulk_create(
+        [copy.copy(user)],
+        update_conflicts=True,
+        unique_fields=[User._meta.pk.name],
+        update_fields=[
+            field.name for field in User._meta.concrete_fields if not field.primary_key
+        ],
+    )
+
+
+def place_user(user):
+    """Record the shard of a new user and copy the user there."""
+    if len(settings.SHARDS) == 1:
+        return
+    user.shard = get_placement(user.pk)
+    type(user)._base_manager.using(DEFAULT_DB_ALIAS).filter(pk=user.pk).update(
+        shard=user.shard
+    )
+    if user.shard != DEFAULT_DB_ALIAS:
+        copy_user(user, user.shard)
+
+
+def reserve_ids(using):
+    """Make the sharded tables of ``using`` hand out ids of its range only."""
+    if len(settings.SHARDS) == 1 or using not in settings.SHARDS:
+        return
+    low = settings.SHARDS.index(using) * ID_SPAN + 1
+    high = low + ID_SPAN - 1
+    with connections[using].cursor() as cursor:
+        for model in apps.get_models():
+            if not is_sharded(model):
+                continue
+            cursor.execute(
+                "SELECT pg_get_serial_sequence(%s, %s)",
+                [model._meta.db_table, model._meta.pk.column],
+            )
+            sequence = cursor.fetchone()[0]
+            cursor.execute("SELECT last_value, is_called FROM %s" % sequence)
+            last_value, is_called = cursor.fetchone()
+            sql = "ALTER SEQUENCE %s MINVALUE %d MAXVALUE %d START WITH %d" % (
+                sequence,
+                low,
+                high,
+                low,
+            )
+            # Only restart unused ranges, ids may be taken concurrently.
+            if last_value + is_called < low:
+                sql += " RESTART WITH %d" % low
+            cursor.execute(sql)
+
+
+class ShardedQuerySet(models.QuerySet):
+    """Queryset of a model whose rows live on the shards of their users."""
+
+    def for_user(self, user):
+        """Return the rows of ``user``, a user or an id, on its shard."""
+        owner = self.model._meta.default_manager.owner
+        return self.using(get_shard(user)).filter(**{owner: user})
+
+    def create(self, **kwargs):
+        # Saves where the router sends the new object, instead of to the
+        # database of this unrouted queryset.
+        obj = self.model(**kwargs)
+        self._for_write = True
+        using = self._db or router.db_for_write(self.model, instance=obj)
+        obj.save(force_insert=True, using=using)
+        return obj
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # Inserts where the router sends the first object, like create().
+        objs = list(objs)
+        if self._db is None and objs:
+            using = router.db_for_write(self.model, instance=objs[0])
+            return self.using(using).bulk_create(objs, *args, **kwargs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class ShardedManager(models.Manager.from_queryset(ShardedQuerySet)):
+    """Manager of a model sharded by the user at the end of ``owner``.
+
+    Querysets only return rows matching the ``visible`` filter, if any, for
+    example to hide soft deleted rows. ``_base_manager`` returns all rows.
+    """
+
+    # Related managers subclass this one and pass no arguments.
+    def __init__(self, owner=None, visible=None):
+        super().__init__()
+        self.owner = owner
+        self.visible = visible
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        visible = self.model._meta.default_manager.visible
+        return queryset.filter(visible) if visible is not None else queryset
+
+
+class ShardRouter:
+    """Route user data to the shard of its user, the rest to the default."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if not is_sharded(model):
+            # The user of a row is read from the directory, not the copy.
+            if instance is not None and is_sharded(type(instance)):
+                return DEFAULT_DB_ALIAS
+            return None
+        if instance is None:
+            return None
+        if isinstance(instance, get_user_model()):
+            return get_shard(instance)
+        if instance._state.db:
+            return instance._state.db
+        user_id = getattr(instance, "user_id", None)
+        return get_shard(user_id) if user_id is not None else None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = is_sharded(type(obj1)), is_sharded(type(obj2))
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        if any(sharded):
+            # Shards have copies of their users.
+            return True
+        return None
@@ -0,0 +1,91 @@
+"""
+Signal handlers keeping caches, the change log, balance checkpoints, shards
+and job files in step with writes.
+
+Transactions handle their deletes in ``Transaction.delete()``: a delete
+receiver would make deleting a budget or category load its transactions
+one by one instead of deleting them in bulk.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from .changes import MODEL_NAMES, forget_user, log_changes
+from .checkpoints import invalidate_category, invalidate_transactions
+from .invalidation import get_tags, publish
+from .jobs import get_file
+from .models import Budget, Category, Job, Transaction
+from .sharding import get_shard, place_user, reserve_ids
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Category)
+def publish_change(sender, instance, using, **kwargs):
+    """Evict cache entries of ``instance`` in all processes."""
+    publish(get_tags(instance), using=using)
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Transaction)
+def log_save(sender, instance, using, **kwargs):
+    log_changes(sender.objects.using(using).filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Transaction)
+def invalidate_saved_transaction(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        invalidate_transactions([instance], using)
+
+
+@receiver(pre_delete, sender=Category)
+def invalidate_deleted_category(sender, instance, using, **kwargs):
+    invalidate_category(instance)
+
+
+@receiver(pre_delete, sender=Budget)
+@receiver(pre_delete, sender=Category)
+def log_delete(sender, instance, using, **kwargs):
+    """Log tombstones of ``instance`` and of the transactions it cascades to."""
+    transactions = Transaction.objects.using(using).filter(
+        **{MODEL_NAMES[sender]: instance}
+    )
+    log_changes(transactions, deleted=True)
+    log_changes(sender.objects.using(using).filter(pk=instance.pk), deleted=True)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def place_new_user(sender, instance, created, using, raw=False, **kwargs):
+    if created and not raw and using == DEFAULT_DB_ALIAS:
+        place_user(instance)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_deleted_user(sender, instance, using, **kwargs):
+    shard = get_shard(instance)
+    if using != shard:
+        # Deleting the copy on the shard deletes the rows of the user there.
+        sender._base_manager.using(shard).filter(pk=instance.pk).delete()
+    else:
+        forget_user(instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Job)
+def delete_job_file(sender, instance, using, **kwargs):
+    name = get_file(instance.result)
+    if name is not None:
+        # Only once the delete is committed, it may still roll back.
+        transaction.on_commit(lambda: default_storage.delete(name), using=using)
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    if sender.name == "core":
+        reserve_ids(using)
@@ -0,0 +1,207 @@
+"""
+Single-flight coalescing of identical expensive reads.
+
+Concurrent calls with the same key share one computation: threads of a
+worker wait on an in-process call, and workers wait on a PostgreSQL
+advisory lock held by the worker computing the value. The leader hands
+its result over through ``CoalescedResult`` only when another worker is
+actually waiting for it.
+"""
+import functools
+import hashlib
+import json
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import CoalescedResult
+
+RESULT_RETENTION = timedelta(minutes=10)
+CLEANUP_PROBABILITY = 0.01
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Group:
+    """Collapse concurrent calls with the same key within a process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, timeout=None):
+        """Return ``func()``, shared with concurrent callers of ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.value
+            # The leader is too slow, don't wait for it any longer.
+            return func()
+
+        try:
+            call.value = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+_group = Group()
+
+
+def get_lock_id(key):
+    """Return a signed 64-bit advisory lock id for ``key``."""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _has_waiters(cursor, lock_id):
+    unsigned = lock_id & 0xFFFFFFFFFFFFFFFF
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' "
+        "AND classid = %s AND objid = %s AND objsubid = 1 AND NOT granted)",
+        [unsigned >> 32, unsigned & 0xFFFFFFFF],
+    )
+    return cursor.fetchone()[0]
+
+
+def _lead(cursor, key, lock_id, compute):
+    value = compute()
+    table = CoalescedResult._meta.db_table
+    if _has_waiters(cursor, lock_id):
+        cursor.execute(
+            "INSERT INTO %s (key, value, finished) "
+            "VALUES (%%s, %%s, clock_timestamp()) ON CONFLICT (key) "
+            "DO UPDATE SET value = EXCLUDED.value, finished = EXCLUDED.finished"
+            % table,
+            [key, json.dumps(value, cls=JSONEncoder)],
+        )
+    if random.random() < CLEANUP_PROBABILITY:
+        cursor.execute(
+            "DELETE FROM %s WHERE finished < clock_timestamp() - %%s" % table,
+            [RESULT_RETENTION],
+        )
+    return value
+
+
+def coalesce_across_workers(key, compute, timeout):
+    """Share ``compute()`` with other workers through an advisory lock.
+
+    A worker that finds the lock taken waits for it and reuses the stored
+    result if it was finished after the worker found the lock taken. Times
+    come from the database clock, so app hosts may disagree on the time.
+    """
+    lock_id = get_lock_id(key)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_try_advisory_xact_lock(%s), clock_timestamp()", [lock_id]
+        )
+        acquired, arrived = cursor.fetchone()
+        if acquired:
+            return _lead(cursor, key, lock_id, compute)
+
+        try:
+            with transaction.atomic():
+                cursor.execute(
+                    "SET LOCAL lock_timeout = %s", ["%dms" % (timeout * 1000)]
+                )
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [lock_id])
+                cursor.execute("SET LOCAL lock_timeout TO DEFAULT")
+        except OperationalError:
+            return compute()
+
+        result = CoalescedResult.objects.filter(
+            key=key, finished__gte=arrived
+        ).first()
+        if result is not None:
+            return result.value
+        return _lead(cursor, key, lock_id, compute)
+
+
+def coalesce(key, compute):
+    """Return ``compute()``, shared with concurrent identical calls."""
+    timeout = settings.SINGLE_FLIGHT_TIMEOUT
+    if not settings.SINGLE_FLIGHT_ACROSS_WORKERS:
+        return _group.do(key, compute, timeout)
+
+    return _group.do(
+        key, lambda: coalesce_across_workers(key, compute, timeout), timeout
+    )
+
+
+def make_key(request, view_name, kwargs):
+    """Build a key from the user, route, normalized query parameters and the
+    format negotiated.
+    """
+    params = sorted(
+        (name, sorted(value.strip() for value in values))
+        for name, values in request.query_params.lists()
+    )
+    renderer = getattr(request, "accepted_renderer", None)
+    raw = json.dumps(
+        [
+            request.user.pk,
+            view_name,
+            sorted(kwargs.items()),
+            params,
+            getattr(renderer, "format", None),
+        ],
+        default=str,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def coalesced(method):
+    """Coalesce identical concurrent calls of a DRF view method.
+
+    Only successful responses are shared, the decorated method must not set
+    response headers.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = make_key(
+            request, "%s.%s" % (type(self).__name__, method.__name__), kwargs
+        )
+
+        def compute():
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                raise _Unshared(response.data, response.status_code)
+            return response.data
+
+        try:
+            return Response(coalesce(key, compute))
+        except _Unshared as unshared:
+            return Response(unshared.data, status=unshared.status)
+
+    return wrapper
+
+
+class _Unshared(Exception):
+    def __init__(self, data, status):
+        super().__init__(status)
+        self.data = data
+        self.status = status
@@ -0,0 +1,119 @@
+"""
+Tests for the Django admin.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.admin import EstimatedCountPaginator
+from core.models import Budget, Category, Transaction
+
+
+class AdminTests(TestCase):
+    """Test admin pages of large tables."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="testpass123"
+        )
+        self.client.force_login(self.admin)
+        # The admin reads the default database, whatever the shard of a user.
+        self.budget = Budget.objects.using(DEFAULT_DB_ALIAS).create(
+            user=self.admin, currency="UAH"
+        )
+        self.category = Category.objects.using(DEFAULT_DB_ALIAS).create(
+            user=self.admin, name="Food", category_type="Expense"
+        )
+
+    def _create_transactions(self, count):
+        Transaction.objects.bulk_create(
+            Transaction(budget=self.budget, category=self.category, amount=Decimal(1))
+            for _ in range(count)
+        )
+
+    def _count_changelist_queries(self):
+        url = reverse("admin:core_transaction_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_constant(self):
+        self._create_transactions(1)
+        baseline = self._count_changelist_queries()
+
+        self._create_transactions(20)
+
+        self.assertEqual(self._count_changelist_queries(), baseline)
+
+    def test_change_form_does_not_list_budgets(self):
+        self._create_transactions(1)
+        transaction = Transaction.objects.get()
+        url = reverse("admin:core_transaction_change", args=[transaction.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, "<option value=\"%s\"" % self.budget.id)
+        self.assertContains(res, "vForeignKeyRawIdAdminField")
+
+    def test_numeric_search_matches_ids(self):
+        self._create_transactions(2)
+        transaction = Transaction.objects.first()
+        url = reverse("admin:core_transaction_changelist")
+
+        res = self.client.get(url, {"q": str(transaction.id)})
+
+        self.assertEqual(list(res.context["cl"].result_list), [transaction])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Test the estimated count paginator."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        Category.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            Category(user=user, name="Category %d" % i, category_type="Expense")
+            for i in range(30)
+        )
+
+    def test_small_table_counted_exactly(self):
+        paginator = EstimatedCountPaginator(Category.objects.order_by("id"), 10)
+
+        self.assertEqual(paginator.count, 30)
+
+    @patch.object(EstimatedCountPaginator, "estimate_above", 1)
+    def test_large_table_uses_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_category")
+        paginator = EstimatedCountPaginator(Category.objects.order_by("id"), 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 30)
+
+        self.assertIn("reltuples", queries[0]["sql"])
+        self.assertNotIn("COUNT", queries[0]["sql"].upper())
+
+    @patch.object(EstimatedCountPaginator, "estimate_above", 1)
+    def test_filtered_queryset_uses_plan_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_category")
+        queryset = Category.objects.filter(category_type="Expense").order_by("id")
+        paginator = EstimatedCountPaginator(queryset, 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+
+        self.assertGreater(count, 0)
+        self.assertTrue(queries[0]["sql"].startswith("EXPLAIN"))
@@ -0,0 +1,126 @@
+"""
+Tests for admission control.
+"""
+import logging
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import ShedRequestFilter, get_request_start
+
+BUDGETS_URL = reverse("budget:budget-list")
+
+
+class RequestStartTests(SimpleTestCase):
+    """Test parsing the proxy's request start header."""
+
+    def _parse(self, header):
+        request = RequestFactory().get("/", HTTP_X_REQUEST_START=header)
+        return get_request_start(request)
+
+    def test_nginx_seconds(self):
+        self.assertEqual(self._parse("t=1700000000.250"), 1700000000.25)
+
+    def test_milliseconds_and_microseconds(self):
+        self.assertEqual(self._parse("t=1700000000250"), 1700000000.25)
+        self.assertEqual(self._parse("1700000000250000"), 1700000000.25)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(get_request_start(RequestFactory().get("/")))
+        self.assertIsNone(self._parse("t=soon"))
+
+
+class ShedRequestFilterTests(SimpleTestCase):
+    """Test dropping the log records of shed requests."""
+
+    def _log(self, request):
+        logging.getLogger("django.request").error(
+            "Service Unavailable: /", extra={"status_code": 503, "request": request}
+        )
+
+    def test_shed_request_dropped(self):
+        request = RequestFactory().get("/")
+        request.shed = True
+
+        with self.assertNoLogs("django.request"):
+            self._log(request)
+
+    def test_other_requests_logged(self):
+        with self.assertLogs("django.request", "ERROR"):
+            self._log(RequestFactory().get("/"))
+
+    def test_record_without_request_kept(self):
+        record = logging.makeLogRecord({"msg": "Internal Server Error"})
+
+        self.assertTrue(ShedRequestFilter().filter(record))
+
+
+@patch("core.middleware.REQUEST_SHED")
+class AdmissionControlTests(TestCase):
+    """Test shedding requests that queued too long."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url, waited, **params):
+        header = "t=%.3f" % (time.time() - waited)
+        return self.client.get(url, HTTP_X_REQUEST_START=header, **params)
+
+    def test_request_within_budget_served(self, patched_shed):
+        res = self._get(BUDGETS_URL, waited=1)
+
+        self.assertEqual(res.status_code, 200)
+        patched_shed.inc.assert_not_called()
+
+    def test_request_over_budget_shed(self, patched_shed):
+        res = self._get(BUDGETS_URL, waited=7.5)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "8")
+        patched_shed.inc.assert_called_once_with("budget:budget-list")
+
+    def test_shed_request_not_logged(self, patched_shed):
+        """Shedding skips Django's costly error logging of 5xx responses."""
+        with self.assertNoLogs("django.request"):
+            res = self._get(BUDGETS_URL, waited=7.5)
+
+        self.assertEqual(res.status_code, 503)
+
+    def test_expensive_route_shed_first(self, patched_shed):
+        summary = self._get(reverse("budget:budget-summary"), waited=3)
+        budgets = self._get(BUDGETS_URL, waited=3)
+
+        self.assertEqual(summary.status_code, 503)
+        self.assertEqual(budgets.status_code, 200)
+
+    def test_budget_per_method(self, patched_shed):
+        jobs_url = reverse("job:job-list")
+
+        self.assertEqual(self._get(jobs_url, waited=1.5).status_code, 200)
+        res = self.client.post(
+            jobs_url,
+            {"kind": "export_transactions", "payload": {}},
+            format="json",
+            HTTP_X_REQUEST_START="t=%.3f" % (time.time() - 1.5),
+        )
+        self.assertEqual(res.status_code, 503)
+
+    def test_request_without_header_served(self, patched_shed):
+        self.assertEqual(self.client.get(BUDGETS_URL).status_code, 200)
+
+    @override_settings(ADMISSION_QUEUE_BUDGETS={"default": 5.0, "metrics": None})
+    def test_exempt_route_never_shed(self, patched_shed):
+        res = self._get(reverse("metrics"), waited=60)
+
+        self.assertEqual(res.status_code, 200)
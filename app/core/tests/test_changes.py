@@ -0,0 +1,103 @@
+"""
+Tests for the change log.
+"""
+import select
+
+import psycopg2
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase
+
+from core.changes import CHANNEL, START, read_changes
+from core.models import Budget, Change
+from core.sharding import get_shard
+
+
+class ReadChangesTests(TransactionTestCase):
+    """Test reading the change log of a user."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.using = get_shard(self.user)
+
+    def _connect(self):
+        params = connections[self.using].get_connection_params()
+        return psycopg2.connect(**params)
+
+    def test_logged_once_per_object(self):
+        budget = Budget.objects.create(user=self.user, currency="USD")
+        budget.currency = "EUR"
+        budget.save()
+
+        changes = Change.objects.for_user(self.user)
+        self.assertEqual(changes.filter(model="budget", object_id=budget.id).count(), 1)
+
+    def test_quiet_read_single_query(self):
+        Budget.objects.create(user=self.user, currency="USD")
+        _, cursor, _ = read_changes(self.user.id, using=self.using)
+
+        with self.assertNumQueries(1, using=self.using):
+            changes, next_cursor, has_more = read_changes(
+                self.user.id, cursor, using=self.using
+            )
+
+        self.assertEqual(changes, [])
+        self.assertGreaterEqual(next_cursor, cursor)
+
+    def test_cursor_stops_before_running_transaction(self):
+        """A transaction committing late can't add changes behind the cursor."""
+        slow = self._connect()
+        self.addCleanup(slow.close)
+        with slow.cursor() as cursor:
+            # Takes its transaction id now, commits after a later writer.
+            cursor.execute("SELECT pg_current_xact_id()")
+        Budget.objects.create(user=self.user, currency="USD")
+
+        changes, cursor, _ = read_changes(self.user.id, using=self.using)
+        self.assertEqual(changes, [])
+
+        with slow.cursor() as db_cursor:
+            db_cursor.execute(
+                "INSERT INTO core_budget "
+                "(user_id, currency, balance, balance_stripes, created) "
+                "VALUES (%s, 'EUR', 0, 0, now()) RETURNING id",
+                [self.user.id],
+            )
+            late_id = db_cursor.fetchone()[0]
+            db_cursor.execute(
+                "INSERT INTO core_change (user_id, object_id, model, deleted, txid) "
+                "VALUES (%s, %s, 'budget', false, pg_current_xact_id()::text::bigint)",
+                [self.user.id, late_id],
+            )
+        slow.commit()
+
+        changes, _, _ = read_changes(self.user.id, cursor, using=self.using)
+        self.assertEqual(len(changes), 2)
+        self.assertIn(late_id, [change.object_id for change in changes])
+
+    def test_read_from_start(self):
+        budget = Budget.objects.create(user=self.user, currency="USD")
+
+        changes, _, has_more = read_changes(self.user.id, START, using=self.using)
+
+        self.assertEqual([change.object_id for change in changes], [budget.id])
+        self.assertFalse(has_more)
+
+    def test_changes_notify_owners(self):
+        listener = self._connect()
+        self.addCleanup(listener.close)
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute("LISTEN %s" % CHANNEL)
+
+        Budget.objects.create(user=self.user, currency="USD")
+
+        select.select([listener], [], [], 5)
+        listener.poll()
+        txid, user_ids = listener.notifies.pop().payload.split(" ")
+        self.assertEqual(user_ids, str(self.user.id))
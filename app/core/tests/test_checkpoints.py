@@ -0,0 +1,152 @@
+"""
+Tests for balances at points in time.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from core import checkpoints
+from core.ledger import post_transactions
+from core.models import BalanceCheckpoint, Budget, Category, Transaction, add_months
+
+
+def months_ago(months, days=10):
+    """Return a time ``days`` into the local month ``months`` ago."""
+    start = checkpoints.get_checkpoint_time(timezone.now())
+    start = timezone.make_aware(
+        add_months(timezone.localtime(start).replace(tzinfo=None), -months)
+    )
+    return start + timedelta(days=days)
+
+
+class CheckpointTests(TestCase):
+    """Test checkpoints of balances and their invalidation."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        for months in range(6, 0, -1):
+            self._post("100", months, category=self.salary)
+            self._post("30", months, days=20)
+
+    def _post(self, amount, months, days=10, category=None):
+        return post_transactions(
+            [
+                Transaction(
+                    budget=self.budget,
+                    category=category or self.food,
+                    amount=Decimal(amount),
+                    created=months_ago(months, days),
+                )
+            ]
+        )[0]
+
+    def _expected(self, at):
+        self.budget.refresh_from_db()
+        after = Transaction.objects.for_user(self.user).filter(
+            budget=self.budget, created__gt=at
+        )
+        return self.budget.balance - (
+            after.aggregate(total=Sum("signed_amount"))["total"] or 0
+        )
+
+    def _balance_at(self, at):
+        self.budget.refresh_from_db()
+        return checkpoints.get_balance_at(self.budget, at)
+
+    def _checkpoint_times(self):
+        saved = BalanceCheckpoint.objects.for_user(self.user).order_by("at")
+        return list(saved.values_list("at", flat=True))
+
+    def test_balance_at(self):
+        for at in [
+            months_ago(7),
+            months_ago(6, days=15),
+            months_ago(3, days=0),
+            months_ago(1, days=25),
+            timezone.now(),
+        ]:
+            self.assertEqual(self._balance_at(at), self._expected(at), at)
+        self.assertEqual(self._balance_at(months_ago(3, days=15)), Decimal("310"))
+
+    def test_monthly_checkpoints(self):
+        self._balance_at(timezone.now())
+
+        times = self._checkpoint_times()
+        self.assertEqual(times[0], months_ago(6, days=0))
+        self.assertEqual(times[-1], months_ago(0, days=0))
+        self.assertEqual(len(times), 7)
+        saved = BalanceCheckpoint.objects.for_user(self.user)
+        self.assertEqual(saved.get(at=months_ago(3, days=0)).total, Decimal("210"))
+
+    def test_no_transactions(self):
+        budget = Budget.objects.create(
+            user=self.budget.user, currency="EUR", balance=Decimal("5")
+        )
+
+        self.assertEqual(checkpoints.get_balance_at(budget, months_ago(2)), 5)
+        saved = BalanceCheckpoint.objects.for_user(self.user)
+        self.assertFalse(saved.filter(budget=budget).exists())
+
+    def test_backdated_transaction_invalidates_later_checkpoints(self):
+        self._balance_at(timezone.now())
+
+        self._post("50", 3, days=5)
+
+        self.assertEqual(
+            self._checkpoint_times(),
+            [months_ago(months, days=0) for months in [6, 5, 4, 3]],
+        )
+        at = months_ago(1, days=15)
+        self.assertEqual(self._balance_at(at), self._expected(at))
+        self.assertEqual(len(self._checkpoint_times()), 7)
+
+    def test_current_transaction_keeps_checkpoints(self):
+        self._balance_at(timezone.now())
+
+        self._post("50", 0, days=0)
+
+        self.assertEqual(len(self._checkpoint_times()), 7)
+
+    def test_deleted_transaction_invalidates_later_checkpoints(self):
+        transactions = Transaction.objects.for_user(self.user)
+        item = transactions.filter(created__lt=months_ago(4, days=0)).first()
+        self._balance_at(timezone.now())
+
+        item.delete()
+
+        self.assertLessEqual(self._checkpoint_times()[-1], item.created)
+        at = months_ago(2)
+        self.assertEqual(self._balance_at(at), self._expected(at))
+
+    def test_category_type_change_invalidates_checkpoints(self):
+        self._balance_at(timezone.now())
+
+        food = Category.objects.for_user(self.user).get(pk=self.food.pk)
+        food.category_type = "Income"
+        food.save()
+
+        self.assertEqual(self._checkpoint_times(), [months_ago(6, days=0)])
+        at = months_ago(2)
+        self.assertEqual(self._balance_at(at), self._expected(at))
+
+    def test_command_creates_checkpoints(self):
+        call_command("checkpoint_balances", stdout=StringIO())
+
+        self.assertEqual(len(self._checkpoint_times()), 7)
@@ -1,31 +1,110 @@
 """
 Test custom Django management commands.
 """
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 
+from core.models import Budget, Change, Transaction
 
-@patch("core.management.commands.wait_for_db.Command.check")
+
+@patch("core.management.commands.wait_for_db.Command.connect")
+@patch("core.management.commands.wait_for_db.Command.probe")
 class CommandTests(SimpleTestCase):
-    def test_wait_for_db(self, patched_check):
-        patched_check.return_value = True
+    def test_wait_for_db(self, patched_probe, patched_connect):
+        call_command("wait_for_db", stdout=StringIO())
+
+        patched_probe.assert_called_once()
+        patched_connect.assert_called_once()
+
+    @patch("time.sleep")
+    def test_wait_db_delay(self, patched_sleep, patched_probe, patched_connect):
+        patched_probe.side_effect = [ConnectionRefusedError] * 3 + [None] * 4
+        patched_connect.side_effect = (
+            [Psycopg2OpError] * 2 + [OperationalError] + [None]
+        )
+
+        call_command("wait_for_db", stdout=StringIO())
 
-        call_command("wait_for_db")
+        self.assertEqual(patched_probe.call_count, 7)
+        self.assertEqual(patched_connect.call_count, 4)
+        delays = [args[0] for args, kwargs in patched_sleep.call_args_list]
+        self.assertEqual(delays, [0.05, 0.1, 0.2, 0.4, 0.8, 1.0])
 
-        patched_check.assert_called_once_with(databases=["default"])
+    @patch("time.sleep")
+    def test_wait_db_delay_capped(self, patched_sleep, patched_probe, patched_connect):
+        patched_probe.side_effect = [ConnectionRefusedError] * 8 + [None]
+
+        call_command("wait_for_db", max_delay=0.5, stdout=StringIO())
+
+        self.assertEqual(max(args[0] for args, _ in patched_sleep.call_args_list), 0.5)
 
     @patch("time.sleep")
-    def test_wait_db_delay(self, patched_sleep, patched_check):
-        patched_check.side_effect = (
-            [Psycopg2OpError] * 2 + [OperationalError] * 3 + [True]
+    def test_wait_db_timeout(self, patched_sleep, patched_probe, patched_connect):
+        patched_probe.side_effect = ConnectionRefusedError
+
+        with self.assertRaises(CommandError):
+            call_command("wait_for_db", timeout=0, stdout=StringIO())
+
+
+class MigrateIfNeededCommandTests(TestCase):
+    """Test skipping migrate on an up to date database."""
+
+    databases = "__all__"
+
+    @patch("core.management.commands.migrate_if_needed.call_command")
+    def test_up_to_date_database_not_migrated(self, patched_call_command):
+        out = StringIO()
+
+        call_command("migrate_if_needed", stdout=out)
+
+        patched_call_command.assert_not_called()
+        self.assertIn("No migrations to apply", out.getvalue())
+
+    @patch("core.management.commands.migrate_if_needed.call_command")
+    @patch("core.management.commands.migrate_if_needed.get_migration_plan")
+    def test_pending_migrations_applied(self, patched_plan, patched_call_command):
+        patched_plan.return_value = [("migration", False)]
+
+        call_command("migrate_if_needed", stdout=StringIO())
+
+        self.assertEqual(patched_call_command.call_args.args, ("migrate",))
+
+
+class SeedLoadCommandTests(TestCase):
+    """Test generating load-test data."""
+
+    databases = "__all__"
+
+    def test_seed_load(self):
+        call_command(
+            "seed_load",
+            users=5,
+            transactions=300,
+            seed=1,
+            stdout=StringIO(),
         )
 
-        call_command("wait_for_db")
+        user_model = get_user_model()
+        self.assertEqual(user_model.objects.count(), 5)
+        self.assertEqual(Transaction.objects.count(), 300)
+        user = user_model.objects.get(email="load0@example.com")
+        self.assertTrue(user.check_password("loadtest123"))
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=["default"])
+        for budget in Budget.objects.all():
+            transactions = Transaction.objects.filter(budget=budget)
+            total = transactions.aggregate(total=Sum("amount"))["total"]
+            self.assertEqual(budget.balance, total or 0)
+            self.assertFalse(
+                transactions.exclude(category__user=budget.user).exists()
+            )
+        self.assertEqual(
+            Change.objects.filter(model="transaction").count(), 300
+        )
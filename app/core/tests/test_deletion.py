@@ -0,0 +1,127 @@
+"""
+Tests for deleting budgets and users in the background.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import deletion, jobs
+from core.models import (
+    Budget,
+    Category,
+    Change,
+    Job,
+    RecurringRule,
+    SpendingLimit,
+    Transaction,
+    Transfer,
+)
+from core.sharding import get_shard
+from core.transfers import transfer
+
+
+class DeletionTests(TestCase):
+    """Test soft deleting budgets and users and purging their rows."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.using = get_shard(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.other = Budget.objects.create(user=self.user, currency="EUR")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+        for budget in [self.budget, self.budget, self.budget, self.other]:
+            Transaction.objects.create(
+                budget=budget, category=self.food, amount=Decimal("5")
+            )
+        SpendingLimit.objects.create(
+            budget=self.budget, category=self.food, amount=Decimal("100")
+        )
+
+    def _run(self, job):
+        job = jobs.claim("test", kinds=[job.kind])
+        with patch.object(deletion, "PURGE_BATCH_SIZE", 2):
+            return jobs.run(job)
+
+    def test_deleted_budget_hidden(self):
+        deletion.delete_budget(self.budget)
+
+        self.assertEqual(list(Budget.objects.for_user(self.user)), [self.other])
+        self.assertEqual(Transaction.objects.for_user(self.user).count(), 1)
+        self.assertFalse(SpendingLimit.objects.for_user(self.user).exists())
+        self.assertEqual(Budget._base_manager.using(self.using).count(), 2)
+        changes = Change.objects.for_user(self.user)
+        self.assertTrue(changes.get(model="budget", object_id=self.budget.pk).deleted)
+
+    def test_purge_budget_in_batches(self):
+        job = deletion.delete_budget(self.budget)
+
+        job = self._run(job)
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result["transaction"], 3)
+        self.assertEqual((job.progress_current, job.progress_total), (3, 3))
+        budgets = Budget._base_manager.using(self.using)
+        self.assertFalse(budgets.filter(pk=self.budget.pk).exists())
+        self.assertEqual(Transaction._base_manager.using(self.using).count(), 1)
+        self.assertFalse(SpendingLimit._base_manager.using(self.using).exists())
+        tombstones = Change.objects.for_user(self.user).filter(
+            model="transaction", deleted=True
+        )
+        self.assertEqual(tombstones.count(), 3)
+
+    def test_purge_budget_with_transfer(self):
+        transfer(self.budget, self.other, Decimal("5"), rate=Decimal("2"))
+        job = deletion.delete_budget(self.budget)
+
+        job = self._run(job)
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertFalse(Transfer._base_manager.using(self.using).exists())
+        transactions = Transaction.objects.for_user(self.user)
+        self.assertEqual(transactions.filter(budget=self.other).count(), 2)
+
+    def test_rules_of_deleted_budget_not_due(self):
+        rule = RecurringRule.objects.create(
+            budget=self.budget,
+            category=self.food,
+            amount=Decimal("5"),
+            frequency=RecurringRule.DAILY,
+            start=self.budget.created,
+        )
+
+        deletion.delete_budget(self.budget)
+
+        rules = RecurringRule.objects.for_user(self.user)
+        self.assertFalse(rules.filter(pk=rule.pk).exists())
+
+    def test_deleted_user_hidden(self):
+        User = get_user_model()
+
+        deletion.delete_user(self.user)
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Budget.objects.for_user(self.user).exists())
+        self.assertFalse(Transaction.objects.for_user(self.user).exists())
+        # The email is free for a new account.
+        User.objects.create_user(email="user@example.com", password="testpass123")
+
+    def test_purge_user(self):
+        job = deletion.delete_user(self.user)
+
+        job = self._run(job)
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result["transaction"], 4)
+        self.assertEqual(job.result["category"], 1)
+        self.assertFalse(get_user_model()._base_manager.exists())
+        for model in [Budget, Category, Transaction, SpendingLimit, Change]:
+            self.assertFalse(model._base_manager.using(self.using).exists())
+        self.assertTrue(Job.objects.filter(pk=job.pk).exists())
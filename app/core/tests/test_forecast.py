@@ -0,0 +1,177 @@
+"""
+Tests for forecasting budget balances.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import threading
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core import forecast, invalidation
+from core.models import Budget, Category, RecurringRule, Transaction
+
+TODAY = date(2026, 3, 15)
+
+
+def on_day(day):
+    """Return noon of ``day`` days from ``TODAY``, negative for the past."""
+    value = datetime.combine(TODAY + timedelta(days=day), time(12))
+    return timezone.make_aware(value)
+
+
+class ForecastTests(TestCase):
+    """Test projecting balances from the history of budgets."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.budget = Budget.objects.create(
+            user=self.user, currency="USD", balance=Decimal("1000")
+        )
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def _create_transaction(self, category, amount, day, budget=None):
+        return Transaction.objects.create(
+            budget=budget or self.budget,
+            category=category,
+            amount=Decimal(amount),
+            created=on_day(day),
+        )
+
+    def test_empty_history_keeps_balance(self):
+        balances = forecast.forecast([self.budget], 30, TODAY)[self.budget.pk]
+
+        np.testing.assert_allclose(balances, np.full(30, 1000))
+
+    def test_recurring_flow_on_schedule(self):
+        for day in [-70, -40, -10]:
+            self._create_transaction(self.salary, "500", day)
+
+        balances = forecast.forecast([self.budget], 60, TODAY)[self.budget.pk]
+
+        # Paid again on days 20 and 50.
+        self.assertEqual(balances[18], 1000)
+        self.assertEqual(balances[19], 1500)
+        self.assertEqual(balances[49], 2000)
+
+    def test_flow_trend(self):
+        # Spending of 60, 70 and 80 in the last three windows.
+        for window, amount in enumerate(["80", "70", "60"]):
+            for offset in [3, 17]:
+                self._create_transaction(
+                    self.food, Decimal(amount) / 2, -window * 30 - offset
+                )
+
+        balances = forecast.forecast([self.budget], 60, TODAY)[self.budget.pk]
+
+        # 90 in the next window, 100 in the one after, spread over days.
+        self.assertAlmostEqual(balances[0], 1000 - 3)
+        self.assertAlmostEqual(balances[29], 1000 - 90)
+        self.assertAlmostEqual(balances[59], 1000 - 190)
+
+    def test_trend_keeps_sign(self):
+        for window, amount in enumerate(["10", "100", "190"]):
+            self._create_transaction(self.food, amount, -window * 30 - 5)
+
+        balances = forecast.forecast([self.budget], 360, TODAY)[self.budget.pk]
+
+        self.assertTrue((np.diff(balances) <= 0).all())
+        self.assertGreater(balances[-1], 0)
+
+    def test_rules_projected_without_their_transactions(self):
+        rule = RecurringRule.objects.create(
+            budget=self.budget,
+            category=self.food,
+            amount=Decimal("25"),
+            frequency=RecurringRule.MONTHLY,
+            start=on_day(-59),
+            occurrences=2,
+            next_occurrence=on_day(0),
+        )
+        for day in [-59, -28]:
+            self._create_transaction(self.food, rule.amount, day)
+
+        balances = forecast.forecast([self.budget], 45, TODAY)[self.budget.pk]
+
+        # Due today and not posted yet, then on the month day of the start.
+        self.assertEqual(balances[0], 975)
+        self.assertEqual(balances[29], 975)
+        self.assertEqual(balances[30], 950)
+
+    def test_rule_end(self):
+        RecurringRule.objects.create(
+            budget=self.budget,
+            category=self.salary,
+            amount=Decimal("10"),
+            frequency=RecurringRule.WEEKLY,
+            start=on_day(1),
+            end=on_day(15),
+        )
+
+        balances = forecast.forecast([self.budget], 30, TODAY)[self.budget.pk]
+
+        self.assertEqual(balances[-1], 1030)
+
+    def test_batch_matches_single(self):
+        other = Budget.objects.create(user=self.user, currency="EUR")
+        for day in [-70, -40, -10]:
+            self._create_transaction(self.salary, "500", day)
+            self._create_transaction(self.food, "-20", day + 2, budget=other)
+
+        batch = forecast.forecast([self.budget, other], 90, TODAY)
+
+        for budget in [self.budget, other]:
+            np.testing.assert_allclose(
+                batch[budget.pk], forecast.forecast([budget], 90, TODAY)[budget.pk]
+            )
+
+
+class GetForecastTests(TransactionTestCase):
+    """Test caching forecasts per version of the change log."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.budget = Budget.objects.create(user=user, currency="USD")
+        self.food = Category.objects.create(
+            user=user, name="Food", category_type="Expense"
+        )
+        forecast.forecasts.clear()
+
+    def _create_transaction(self):
+        Transaction.objects.create(
+            budget=self.budget, category=self.food, amount=Decimal("-20")
+        )
+
+    def test_cached_until_change(self):
+        self._create_transaction()
+        listening = threading.Event()
+        listening.set()
+        with patch.object(invalidation, "_listening", listening), patch(
+            "core.forecast.forecast", wraps=forecast.forecast
+        ) as patched:
+            forecast.get_forecast(self.budget, 30, TODAY)
+            forecast.get_forecast(self.budget, 30, TODAY)
+            self.assertEqual(patched.call_count, 1)
+
+            self._create_transaction()
+            forecast.get_forecast(self.budget, 30, TODAY)
+
+        self.assertEqual(patched.call_count, 2)
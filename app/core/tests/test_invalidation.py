@@ -0,0 +1,255 @@
+"""
+Tests for cache invalidation across processes.
+"""
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import invalidation
+from core.authentication import CachedJWTAuthentication, users
+from core.invalidation import CHANNEL, LocalCache
+from core.models import Budget, Category, Transaction
+
+
+def listening():
+    """Pretend the listener of this process is subscribed."""
+    event = threading.Event()
+    event.set()
+    return patch.object(invalidation, "_listening", event)
+
+
+def _notifications(queries):
+    prefix = "SELECT pg_notify('%s'" % CHANNEL
+    return [q["sql"] for q in queries if q["sql"].startswith(prefix)]
+
+
+class LocalCacheTests(SimpleTestCase):
+    """Test the local cache."""
+
+    def setUp(self):
+        self.cache = LocalCache(ttl=60)
+        self.calls = 0
+
+    def _compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_entry_reused(self):
+        with listening():
+            self.cache.get_or_set("a", self._compute, ["t:1"])
+            value = self.cache.get_or_set("a", self._compute, ["t:1"])
+
+        self.assertEqual(value, 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_nothing_stored_without_listener(self):
+        self.cache.get_or_set("a", self._compute, ["t:1"])
+        self.cache.get_or_set("a", self._compute, ["t:1"])
+
+        self.assertEqual(self.calls, 2)
+
+    def test_evict_by_tag(self):
+        with listening():
+            self.cache.get_or_set("a", self._compute, ["t:1", "t:shared"])
+            self.cache.get_or_set("b", self._compute, ["t:2"])
+
+            invalidation.evict(["t:shared"])
+
+            self.assertEqual(self.cache.get_or_set("a", self._compute, []), 3)
+            self.assertEqual(self.cache.get_or_set("b", self._compute, []), 2)
+
+    def test_value_computed_during_eviction_not_stored(self):
+        def compute():
+            invalidation.evict(["t:1"])
+            return self._compute()
+
+        with listening():
+            self.cache.get_or_set("a", compute, ["t:1"])
+            self.cache.get_or_set("a", self._compute, ["t:1"])
+
+        self.assertEqual(self.calls, 2)
+
+    def test_expired_entry_recomputed(self):
+        cache = LocalCache(ttl=0)
+        with listening():
+            cache.get_or_set("a", self._compute, [])
+            cache.get_or_set("a", self._compute, [])
+
+        self.assertEqual(self.calls, 2)
+
+    def test_oldest_entry_dropped_beyond_maxsize(self):
+        cache = LocalCache(ttl=60, maxsize=2)
+        with listening():
+            for key in "abc":
+                cache.get_or_set(key, self._compute, ["t:%s" % key])
+
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("a", cache._entries)
+        self.assertNotIn("t:a", cache._keys)
+
+
+class PublishTests(TestCase):
+    """Test publishing changes of cached rows."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.category = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def test_tags_of_row_and_foreign_keys(self):
+        item = Transaction(
+            id=7, budget=self.budget, category=self.category, amount=Decimal("1")
+        )
+
+        self.assertEqual(
+            invalidation.get_tags(item),
+            [
+                "core.transaction:7",
+                "core.transaction:budget=%s" % self.budget.id,
+                "core.transaction:category=%s" % self.category.id,
+            ],
+        )
+
+    def test_save_notifies(self):
+        # Notified on the shard of the budget.
+        with CaptureQueriesContext(connections[self.budget._state.db]) as queries:
+            self.budget.save()
+
+        self.assertEqual(
+            _notifications(queries),
+            [
+                "SELECT pg_notify('%s', 'core.budget:%s,core.budget:user=%s')"
+                % (CHANNEL, self.budget.id, self.user.id)
+            ],
+        )
+
+    def test_transaction_delete_notifies(self):
+        item = Transaction.objects.create(
+            budget=self.budget, category=self.category, amount=Decimal("-5")
+        )
+        tag = "core.transaction:%s" % item.id
+
+        with CaptureQueriesContext(connections[item._state.db]) as queries:
+            item.delete()
+
+        self.assertIn(tag, _notifications(queries)[0])
+
+    def test_local_entries_evicted_on_commit(self):
+        cache = LocalCache(ttl=60)
+        tag = "core.budget:%s" % self.budget.id
+        with listening():
+            cache.get_or_set("budget", lambda: "stale", [tag])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.budget.save()
+
+            self.assertEqual(cache.get_or_set("budget", lambda: "fresh", []), "fresh")
+
+    def test_large_change_split_into_messages(self):
+        tags = ["core.budget:%d" % i for i in range(2000)]
+
+        with CaptureQueriesContext(connection) as queries:
+            invalidation.publish(tags)
+
+        notifications = _notifications(queries)
+        self.assertGreater(len(notifications), 1)
+        self.assertTrue(all(len(sql) < 8000 for sql in notifications))
+
+    @override_settings(CACHE_INVALIDATION=False)
+    def test_disabled(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.budget.save()
+
+        self.assertEqual(_notifications(queries), [])
+
+
+class ListenerTests(TransactionTestCase):
+    """Test the listener thread evicting entries published elsewhere."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.listener = invalidation.start_listener()
+        self.addCleanup(invalidation.stop_listener)
+        self.assertTrue(invalidation.wait_listening(10))
+        self.cache = LocalCache(ttl=60)
+
+    def _wait_until_evicted(self, key):
+        deadline = time.monotonic() + 5
+        while key in self.cache._entries and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return key not in self.cache._entries
+
+    def test_notification_evicts_entry(self):
+        self.cache.get_or_set("budget", lambda: 1, ["core.budget:1"])
+        self.cache.get_or_set("other", lambda: 2, ["core.budget:2"])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)", [CHANNEL, "core.budget:1,user.user:1"]
+            )
+
+        self.assertTrue(self._wait_until_evicted("budget"))
+        self.assertIn("other", self.cache._entries)
+
+    def test_caches_cleared_when_listener_stops(self):
+        self.cache.get_or_set("budget", lambda: 1, ["core.budget:1"])
+
+        invalidation.stop_listener()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertFalse(invalidation.wait_listening(0))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Test reading users of tokens from the local cache."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+        users.clear()
+        self.addCleanup(users.clear)
+
+    def test_user_cached(self):
+        with listening():
+            self.authentication.get_user(self.token)
+            with self.assertNumQueries(0):
+                user = self.authentication.get_user(self.token)
+
+        self.assertEqual(user, self.user)
+        self.assertIsNot(user, self.authentication.get_user(self.token))
+
+    def test_deactivated_user_refused(self):
+        with listening():
+            self.authentication.get_user(self.token)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+
+            with self.assertRaises(AuthenticationFailed):
+                self.authentication.get_user(self.token)
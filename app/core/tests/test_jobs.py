@@ -0,0 +1,124 @@
+"""
+Tests for the background job queue.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+calls = []
+
+
+@jobs.register("test_succeed")
+def succeed(job):
+    calls.append(job.pk)
+    job.set_progress(2, 2)
+    return {"value": job.payload.get("value")}
+
+
+@jobs.register("test_fail", max_attempts=2)
+def fail(job):
+    raise RuntimeError("boom")
+
+
+class JobQueueTests(TestCase):
+    """Test claiming and running jobs."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_by_priority_then_age(self):
+        low = jobs.enqueue("test_succeed")
+        high = jobs.enqueue("test_succeed", priority=5)
+        jobs.enqueue("test_succeed", run_after=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(jobs.claim("w").pk, high.pk)
+        self.assertEqual(jobs.claim("w").pk, low.pk)
+        self.assertIsNone(jobs.claim("w"))
+
+    def test_claim_filtered_by_kind(self):
+        jobs.enqueue("test_fail")
+        job = jobs.enqueue("test_succeed")
+
+        self.assertEqual(jobs.claim("w", kinds=["test_succeed"]).pk, job.pk)
+        self.assertIsNone(jobs.claim("w", kinds=["test_succeed"]))
+
+    def test_run_successful(self):
+        jobs.enqueue("test_succeed", {"value": 3})
+
+        job = jobs.run(jobs.claim("w"))
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {"value": 3})
+        self.assertEqual((job.progress_current, job.progress_total), (2, 2))
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished)
+
+    def test_failed_job_retried_with_backoff(self):
+        jobs.enqueue("test_fail")
+
+        job = jobs.run(jobs.claim("w"))
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("boom", job.error)
+        self.assertIsNone(jobs.claim("w"))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = jobs.run(jobs.claim("w"))
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_backoff_grows_exponentially(self):
+        self.assertLessEqual(jobs.get_backoff(1), timedelta(seconds=10))
+        self.assertGreaterEqual(jobs.get_backoff(4), timedelta(seconds=40))
+        self.assertLessEqual(jobs.get_backoff(30), timedelta(seconds=3600))
+
+    def test_stale_jobs_requeued(self):
+        jobs.enqueue("test_succeed")
+        job = jobs.claim("w")
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertEqual(jobs.requeue_stale(60), 1)
+        self.assertEqual(jobs.claim("w").pk, job.pk)
+
+    def test_stale_job_out_of_attempts_failed(self):
+        jobs.enqueue("test_fail")
+        job = jobs.claim("w")
+        Job.objects.filter(pk=job.pk).update(
+            attempts=2, heartbeat=timezone.now() - timedelta(minutes=5)
+        )
+
+        jobs.requeue_stale(60)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    @patch("core.management.commands.run_workers.close_old_connections")
+    def test_run_workers_command(self, patched_close):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        first = jobs.enqueue("test_succeed", user=user)
+        second = jobs.enqueue("test_succeed", user=user)
+
+        out = StringIO()
+        call_command("run_workers", processes=1, burst=True, stdout=out)
+
+        self.assertEqual(calls, [first.pk, second.pk])
+        self.assertIn("Processed 2 jobs", out.getvalue())
@@ -0,0 +1,131 @@
+"""
+Tests for balances with stripes.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+
+from core.ledger import annotate_unfolded, fold_balance_stripes, post_transactions
+from core.models import BalanceStripe, Budget, Category, Change, Transaction
+from core.sharding import get_shard
+
+
+class StripeTests(TestCase):
+    """Test writing balances to stripes and folding them."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.using = get_shard(self.user)
+        self.budget = Budget.objects.create(
+            user=self.user, currency="USD", balance=Decimal("100"), balance_stripes=4
+        )
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+
+    def _post(self, *amounts, budget=None):
+        return post_transactions(
+            [
+                Transaction(
+                    budget=budget or self.budget,
+                    category=self.salary,
+                    amount=Decimal(amount),
+                )
+                for amount in amounts
+            ]
+        )
+
+    def test_writes_go_to_stripes(self):
+        for _ in range(20):
+            self._post("5")
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("100"))
+        self.assertEqual(self.budget.current_balance, Decimal("200"))
+        stripes = BalanceStripe.objects.for_user(self.user)
+        self.assertIn(stripes.count(), range(2, 5))
+        budgets = Budget.objects.for_user(self.user).filter(pk=self.budget.pk)
+        budget = annotate_unfolded(budgets).get()
+        self.assertEqual(budget.current_balance, Decimal("200"))
+
+    def test_unstriped_budget_updated_in_place(self):
+        self.budget.balance_stripes = 0
+        self.budget.save()
+
+        self._post("5")
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("105"))
+        self.assertFalse(BalanceStripe.objects.for_user(self.user).exists())
+
+    def test_fold(self):
+        self._post("5", "7")
+        Change.objects.for_user(self.user).delete()
+
+        folded = fold_balance_stripes([self.budget.pk], self.using)
+
+        self.assertGreaterEqual(folded, 1)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("112"))
+        self.assertEqual(self.budget.current_balance, Decimal("112"))
+        self.assertFalse(BalanceStripe.objects.for_user(self.user).exists())
+        changes = Change.objects.for_user(self.user)
+        self.assertTrue(
+            changes.filter(model="budget", object_id=self.budget.pk).exists()
+        )
+
+    def test_fold_command(self):
+        self._post("5")
+
+        call_command("fold_balance_stripes", stdout=StringIO())
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("105"))
+
+
+class ConcurrentStripeTests(TransactionTestCase):
+    """Test concurrent writes to a budget with stripes."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.using = get_shard(user)
+        self.budget = Budget.objects.create(
+            user=user, currency="USD", balance_stripes=8
+        )
+        self.category = Category.objects.create(
+            user=user, name="Salary", category_type="Income"
+        )
+
+    def _post(self, _):
+        try:
+            post_transactions(
+                [
+                    Transaction(
+                        budget=self.budget, category=self.category, amount=Decimal("1")
+                    )
+                ]
+            )
+        finally:
+            connections.close_all()
+
+    def test_balance_conserved(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(self._post, range(200)))
+
+        self.assertEqual(self.budget.current_balance, Decimal("200"))
+        fold_balance_stripes([self.budget.pk], self.using)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("200"))
@@ -0,0 +1,129 @@
+"""
+Tests for the spending limits.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import limits
+from core.ledger import post_transactions
+from core.models import Budget, Category, LimitAlert, SpendingLimit, Transaction
+from core.sharding import get_shard
+
+
+class LimitTests(TestCase):
+    """Test counting spending and alerting thresholds."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.using = get_shard(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+        self.limit = SpendingLimit.objects.create(
+            budget=self.budget, category=self.food, amount=Decimal("100")
+        )
+
+    def _post(self, *amounts, category=None, created=None):
+        return post_transactions(
+            [
+                Transaction(
+                    budget=self.budget,
+                    category=category or self.food,
+                    amount=Decimal(amount),
+                    created=created or timezone.now(),
+                )
+                for amount in amounts
+            ]
+        )
+
+    def _thresholds(self):
+        alerts = LimitAlert.objects.for_user(self.user).order_by("threshold")
+        return list(alerts.values_list("threshold", flat=True))
+
+    def test_spending_counted(self):
+        self._post("30", "20")
+        self._post("100", category=self.salary)
+
+        self.limit.refresh_from_db()
+        self.assertEqual(self.limit.current_spent, Decimal("50"))
+        self.assertFalse(LimitAlert.objects.for_user(self.user).exists())
+
+    def test_threshold_alerted_once(self):
+        self._post("79")
+        self._post("1")
+        self._post("5")
+
+        alert = LimitAlert.objects.for_user(self.user).get()
+        self.assertEqual(alert.threshold, 80)
+        self.assertEqual(alert.spent, Decimal("80"))
+        self.assertEqual(alert.period, timezone.localdate().replace(day=1))
+
+    def test_thresholds_crossed_at_once(self):
+        self._post("60", "60")
+
+        self.assertEqual(self._thresholds(), [80, 100])
+
+    def test_removed_spending_not_alerted_again(self):
+        (item,) = self._post("90")
+        limits.record_spending([item], self.using, weight=-1)
+
+        self._post("85")
+
+        self.limit.refresh_from_db()
+        self.assertEqual(self.limit.spent, Decimal("85"))
+        self.assertEqual(self._thresholds(), [80])
+
+    def test_other_months_not_counted(self):
+        self._post("90", created=timezone.now() - timedelta(days=40))
+
+        self.limit.refresh_from_db()
+        self.assertEqual(self.limit.current_spent, 0)
+
+    def test_counters_reset_by_new_month(self):
+        self._post("90")
+        next_month = timezone.now() + timedelta(days=32)
+
+        with patch("django.utils.timezone.now", return_value=next_month):
+            self._post("85", created=next_month)
+
+        self.limit.refresh_from_db()
+        self.assertEqual(self.limit.spent, Decimal("85"))
+        self.assertEqual(self.limit.period, limits.month_start(next_month))
+        self.assertEqual(LimitAlert.objects.for_user(self.user).count(), 2)
+
+    def test_queries_independent_of_month(self):
+        self._post("1")
+        (item,) = self._post("1")
+        with CaptureQueriesContext(connections[self.using]) as single:
+            limits.record_spending([item], self.using)
+        self._post(*["0.01"] * 500)
+
+        with self.assertNumQueries(len(single), using=self.using):
+            limits.record_spending([item], self.using)
+
+    def test_recount(self):
+        self._post("50")
+        Transaction.objects.create(
+            budget=self.budget, category=self.food, amount=Decimal("40")
+        )
+
+        alerts = limits.recount(self.limit)
+
+        self.limit.refresh_from_db()
+        self.assertEqual(self.limit.spent, Decimal("90"))
+        self.assertEqual([alert.threshold for alert in alerts], [80])
@@ -0,0 +1,141 @@
+"""
+Tests for the metrics subsystem.
+"""
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse("metrics")
+
+
+def create_registry(directory, ident):
+    registry = metrics.Registry(directory=directory, ident=ident)
+    counter = metrics.Counter("jobs_total", "Jobs.", ["kind"], registry=registry)
+    histogram = metrics.Histogram(
+        "latency_seconds",
+        "Latency.",
+        ["route"],
+        buckets=(0.1, 1.0),
+        registry=registry,
+    )
+    return registry, counter, histogram
+
+
+class RegistryTests(SimpleTestCase):
+    """Test recording and rendering metrics."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_counter_and_histogram_rendered(self):
+        registry, counter, histogram = create_registry(self.directory, "a")
+
+        counter.inc("export")
+        counter.inc("export", amount=2)
+        histogram.observe(0.05, "budget-list")
+        histogram.observe(0.5, "budget-list")
+        histogram.observe(5, "budget-list")
+
+        output = registry.render()
+
+        self.assertIn("# TYPE jobs_total counter", output)
+        self.assertIn('jobs_total{kind="export"} 3', output)
+        self.assertIn('latency_seconds_bucket{route="budget-list",le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{route="budget-list",le="1.0"} 2', output)
+        self.assertIn('latency_seconds_bucket{route="budget-list",le="+Inf"} 3', output)
+        self.assertIn('latency_seconds_sum{route="budget-list"} 5.55', output)
+        self.assertIn('latency_seconds_count{route="budget-list"} 3', output)
+
+    def test_samples_aggregated_across_processes(self):
+        registry_a, counter_a, histogram_a = create_registry(self.directory, "a")
+        _, counter_b, histogram_b = create_registry(self.directory, "b")
+
+        counter_a.inc("export")
+        counter_b.inc("export", amount=4)
+        counter_b.inc("import")
+        histogram_a.observe(0.05, "budget-list")
+        histogram_b.observe(0.05, "budget-list")
+
+        output = registry_a.render()
+
+        self.assertIn('jobs_total{kind="export"} 5', output)
+        self.assertIn('jobs_total{kind="import"} 1', output)
+        self.assertIn('latency_seconds_count{route="budget-list"} 2', output)
+
+    def test_store_reopened_with_existing_samples(self):
+        registry, counter, _ = create_registry(self.directory, "a")
+        counter.inc("export")
+        registry.get_store().close()
+
+        registry, counter, _ = create_registry(self.directory, "a")
+        counter.inc("export")
+
+        self.assertIn('jobs_total{kind="export"} 2', registry.render())
+
+    def test_store_grows_beyond_initial_size(self):
+        registry, counter, _ = create_registry(self.directory, "a")
+
+        for i in range(20000):
+            counter.inc("kind-%d" % i)
+
+        output = registry.render()
+        self.assertIn('jobs_total{kind="kind-0"} 1', output)
+        self.assertIn('jobs_total{kind="kind-19999"} 1', output)
+
+    def test_label_values_escaped(self):
+        registry, counter, _ = create_registry(self.directory, "a")
+
+        counter.inc('a"b\\c')
+
+        self.assertIn('jobs_total{kind="a\\"b\\\\c"} 1', registry.render())
+
+    def test_wrong_label_count_error(self):
+        _, counter, _ = create_registry(self.directory, "a")
+
+        with self.assertRaises(ValueError):
+            counter.inc("export", "extra")
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the metrics endpoint and middleware."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_request_recorded_per_route(self):
+        user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="testpass123",
+        )
+        self.client.force_authenticate(user)
+        self.client.get(reverse("budget:budget-list"))
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        body = res.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",'
+            'route="budget:budget-list",status="200"}',
+            body,
+        )
+        self.assertIn('db_query_duration_seconds_count{database="default",', body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_configured(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(res.status_code, 200)
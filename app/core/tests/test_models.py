@@ -1,10 +1,13 @@
 """
 Tests for models.
 """
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from core import models
+from core.ledger import post_transactions
 
 
 def create_user(email="user@example.com", password="testpass123"):
@@ -26,6 +29,8 @@ def create_category(user, cashflow_type: str, name="default_value"):
 class ModelTests(TestCase):
     """Test models."""
 
+    databases = "__all__"
+
     def test_create_user_with_email_successful(self):
         """Test creating a user with an email is successful."""
         email = "test@example.com"
@@ -100,3 +105,75 @@ class ModelTests(TestCase):
         self.assertEqual(transaction.budget, budget)
         self.assertEqual(transaction.category, category)
         self.assertEqual(transaction.amount, 200)
+
+
+class SignedAmountTests(TestCase):
+    """Test the signed amount stored on transactions."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user()
+        self.budget = create_budget(self.user, 0)
+        self.salary = create_category(self.user, "Income", name="Salary")
+        self.food = create_category(self.user, "Expense", name="Food")
+
+    def _create_transaction(self, category, amount):
+        return models.Transaction.objects.create(
+            budget=self.budget, category=category, amount=Decimal(amount)
+        )
+
+    def test_signed_by_category_type(self):
+        income = self._create_transaction(self.salary, "200")
+        expense = self._create_transaction(self.food, "-50")
+
+        self.assertEqual(income.signed_amount, Decimal("200"))
+        self.assertEqual(expense.signed_amount, Decimal("-50"))
+
+    def test_category_change_updates_sign(self):
+        transaction = self._create_transaction(self.salary, "200")
+
+        transaction.category = self.food
+        transaction.save(update_fields=["category"])
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.signed_amount, Decimal("-200"))
+
+    def test_category_type_change_propagated(self):
+        self._create_transaction(self.food, "-50")
+        self._create_transaction(self.food, "30")
+        other = self._create_transaction(self.salary, "10")
+
+        category = models.Category.objects.for_user(self.user).get(id=self.food.id)
+        category.category_type = "Income"
+        category.save()
+
+        transactions = models.Transaction.objects.for_user(self.user)
+        signed = transactions.filter(category=self.food).values_list(
+            "signed_amount", flat=True
+        )
+        self.assertEqual(sorted(signed), [Decimal("30"), Decimal("50")])
+        other.refresh_from_db()
+        self.assertEqual(other.signed_amount, Decimal("10"))
+
+    def test_unchanged_category_type_not_propagated(self):
+        self._create_transaction(self.food, "-50")
+        category = models.Category.objects.for_user(self.user).get(id=self.food.id)
+
+        # The update, its cache invalidation and change log entry, without
+        # updating transactions.
+        with self.assertNumQueries(3, using=category._state.db):
+            category.name = "Groceries"
+            category.save()
+
+    def test_posted_transactions_signed(self):
+        created = post_transactions(
+            [
+                models.Transaction(
+                    budget=self.budget, category=self.food, amount=Decimal("20")
+                )
+            ]
+        )
+
+        created[0].refresh_from_db()
+        self.assertEqual(created[0].signed_amount, Decimal("-20"))
@@ -0,0 +1,211 @@
+"""
+Tests for recurring rules and their materialization.
+"""
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core.management.commands.materialize_recurring import materialize_batch
+from core.models import Budget, Category, RecurringRule, Transaction
+from core.sharding import get_shard
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_rule(budget, category, **params):
+    defaults = {
+        "amount": Decimal("100"),
+        "frequency": RecurringRule.MONTHLY,
+        "start": timezone.now() - timedelta(days=1),
+    }
+    defaults.update(params)
+    return RecurringRule.objects.create(budget=budget, category=category, **defaults)
+
+
+class RecurringRuleModelTests(TestCase):
+    """Test occurrence computation."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        user = create_user()
+        self.budget = Budget.objects.create(user=user, currency="UAH")
+        self.category = Category.objects.create(
+            user=user, name="Rent", category_type="Expense"
+        )
+
+    def test_monthly_occurrences_clamped_to_month_end(self):
+        start = datetime(2023, 1, 31, 12, tzinfo=dt_timezone.utc)
+        rule = create_rule(self.budget, self.category, start=start)
+
+        days = [rule.get_occurrence(n).day for n in range(4)]
+
+        self.assertEqual(days, [31, 28, 31, 30])
+
+    def test_next_occurrence_starts_at_start(self):
+        start = datetime(2023, 1, 31, 12, tzinfo=dt_timezone.utc)
+        rule = create_rule(self.budget, self.category, start=start)
+
+        self.assertEqual(rule.next_occurrence, start)
+
+    def test_weekly_interval(self):
+        start = datetime(2023, 1, 2, 12, tzinfo=dt_timezone.utc)
+        rule = create_rule(
+            self.budget,
+            self.category,
+            start=start,
+            frequency=RecurringRule.WEEKLY,
+            interval=2,
+        )
+
+        self.assertEqual(rule.get_occurrence(3), start + timedelta(weeks=6))
+
+
+class MaterializeRecurringTests(TestCase):
+    """Test the materialization worker."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = create_user()
+        self.budget = Budget.objects.create(
+            user=self.user, currency="UAH", balance=Decimal("1000")
+        )
+        self.rent = Category.objects.create(
+            user=self.user, name="Rent", category_type="Expense"
+        )
+        self.salary = Category.objects.create(
+            user=self.user, name="Salary", category_type="Income"
+        )
+
+    def test_due_occurrences_posted(self):
+        now = timezone.now()
+        create_rule(
+            self.budget,
+            self.rent,
+            frequency=RecurringRule.DAILY,
+            start=now - timedelta(days=2, hours=1),
+        )
+        create_rule(
+            self.budget,
+            self.salary,
+            amount=Decimal("500"),
+            start=now - timedelta(hours=1),
+        )
+
+        call_command("materialize_recurring", stdout=StringIO())
+
+        transactions = Transaction.objects.for_user(self.user)
+        self.assertEqual(transactions.filter(category=self.rent).count(), 3)
+        self.assertEqual(transactions.filter(category=self.salary).count(), 1)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("1200"))
+
+    def test_occurrences_not_posted_twice(self):
+        rule = create_rule(self.budget, self.rent)
+
+        call_command("materialize_recurring", stdout=StringIO())
+        call_command("materialize_recurring", stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.for_user(self.user).count(), 1)
+        rule.refresh_from_db()
+        self.assertEqual(rule.occurrences, 1)
+        self.assertGreater(rule.next_occurrence, timezone.now())
+
+    def test_transaction_created_at_occurrence(self):
+        start = timezone.now() - timedelta(days=40)
+        create_rule(self.budget, self.rent, start=start)
+
+        call_command("materialize_recurring", stdout=StringIO())
+
+        transactions = Transaction.objects.for_user(self.user).order_by("created")
+        created = list(transactions.values_list("created", flat=True))
+        self.assertEqual(created[0], start)
+        self.assertEqual(len(created), 2)
+
+    def test_rule_deactivated_after_end(self):
+        now = timezone.now()
+        rule = create_rule(
+            self.budget,
+            self.rent,
+            frequency=RecurringRule.DAILY,
+            start=now - timedelta(days=10),
+            end=now - timedelta(days=8, hours=12),
+        )
+
+        call_command("materialize_recurring", stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.for_user(self.user).count(), 2)
+        rule.refresh_from_db()
+        self.assertFalse(rule.is_active)
+
+    def test_catch_up_limited_per_batch(self):
+        create_rule(
+            self.budget,
+            self.rent,
+            frequency=RecurringRule.DAILY,
+            start=timezone.now() - timedelta(days=9, hours=1),
+        )
+
+        claimed, created = materialize_batch(
+            batch_size=10, max_occurrences=4, using=get_shard(self.user)
+        )
+
+        self.assertEqual((claimed, created), (1, 4))
+
+        call_command("materialize_recurring", max_occurrences=4, stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.for_user(self.user).count(), 10)
+
+
+class MaterializeConcurrencyTests(TransactionTestCase):
+    """Test that workers skip rules claimed by another worker."""
+
+    databases = "__all__"
+
+    def test_locked_rule_skipped(self):
+        user = create_user()
+        budget = Budget.objects.create(user=user, currency="UAH")
+        category = Category.objects.create(
+            user=user, name="Rent", category_type="Expense"
+        )
+        locked = create_rule(budget, category)
+        free = create_rule(budget, category)
+        using = get_shard(user)
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic(using=using):
+                    RecurringRule.objects.using(using).select_for_update().get(
+                        id=locked.id
+                    )
+                    claimed.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            claimed.wait(10)
+            materialize_batch(batch_size=10, max_occurrences=10, using=using)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(Transaction.objects.for_user(user).count(), 1)
+        locked.refresh_from_db()
+        free.refresh_from_db()
+        self.assertEqual(locked.occurrences, 0)
+        self.assertEqual(free.occurrences, 1)
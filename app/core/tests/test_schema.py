@@ -0,0 +1,105 @@
+"""
+Tests for the precomputed OpenAPI schema.
+"""
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.schema import generate_schema, load_schema
+
+SCHEMA_URL = reverse("api-schema")
+
+
+class SchemaViewTests(TestCase):
+    """Test serving the schema files."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(SCHEMA_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(load_schema.cache_clear)
+
+    def _build(self):
+        call_command("build_schema", stdout=StringIO())
+
+    def test_build_writes_versioned_files(self):
+        self._build()
+
+        names = sorted(path.name for path in Path(self.directory).iterdir())
+        self.assertEqual(names, ["schema-1.0.0.json", "schema-1.0.0.yaml"])
+
+    def test_schema_served_without_generation(self):
+        self._build()
+
+        with patch(
+            "drf_spectacular.generators.SchemaGenerator.get_schema"
+        ) as get_schema:
+            res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        get_schema.assert_not_called()
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("/api/budget/budgets/", json.loads(res.content)["paths"])
+        self.assertTrue(res["ETag"].startswith('"'))
+        self.assertIn("max-age=86400", res["Cache-Control"])
+        self.assertIn("public", res["Cache-Control"])
+
+    def test_yaml_is_default_format(self):
+        self._build()
+
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi")
+        self.assertTrue(res.content.startswith(b"openapi:"))
+
+    def test_matching_etag_not_modified(self):
+        self._build()
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+
+    def test_formats_have_different_etags(self):
+        self._build()
+
+        yaml_etag = self.client.get(SCHEMA_URL)["ETag"]
+        json_etag = self.client.get(SCHEMA_URL, {"format": "json"})["ETag"]
+
+        self.assertNotEqual(yaml_etag, json_etag)
+
+    def test_missing_file_error(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(SCHEMA_URL)
+
+    @override_settings(DEBUG=True)
+    def test_debug_generates_live(self):
+        res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("ETag", res)
+
+
+class SchemaTests(TestCase):
+    """Test the generated schema."""
+
+    databases = "__all__"
+
+    def test_jwt_security_scheme(self):
+        schema = generate_schema()
+
+        self.assertIn("jwtAuth", schema["components"]["securitySchemes"])
+        security = schema["paths"]["/api/budget/budgets/"]["get"]["security"]
+        self.assertIn({"jwtAuth": []}, security)
@@ -0,0 +1,176 @@
+"""
+Tests for sharding user data across databases.
+
+The tests using several shards run with ``DB_SHARDS`` set, for example
+``DB_SHARDS=shard1 python manage.py test core.tests.test_sharding``.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from budget.feed import get_page
+from core import jobs
+from core.changes import START, parse_cursor
+from core.deletion import delete_user
+from core.management.commands.rebalance_shards import move_user
+from core.models import Budget, Category, Change, RecurringRule, Transaction
+from core.sharding import ID_SPAN, get_placement, get_shard
+
+BUDGETS_URL = reverse("budget:budget-list")
+
+
+class PlacementTests(SimpleTestCase):
+    """Test placing users on shards by a hash of their id."""
+
+    def test_placement_stable(self):
+        shards = ["default", "shard_1", "shard_2"]
+
+        placements = [get_placement(user_id, shards) for user_id in range(1000)]
+
+        self.assertEqual(
+            placements, [get_placement(user_id, shards) for user_id in range(1000)]
+        )
+        for shard in shards:
+            self.assertGreater(placements.count(shard), 250)
+
+    def test_added_shard_moves_only_its_users(self):
+        before = ["default", "shard_1"]
+        after = before + ["shard_2"]
+
+        for user_id in range(1000):
+            placement = get_placement(user_id, after)
+            if placement != "shard_2":
+                self.assertEqual(placement, get_placement(user_id, before))
+
+
+@skipUnless(len(settings.SHARDS) > 1, "Needs DB_SHARDS.")
+class ShardingTests(TransactionTestCase):
+    """Test storing and moving the rows of users on their shards."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.shard = settings.SHARDS[1]
+        with patch("core.sharding.get_placement", return_value=self.shard):
+            self.user = get_user_model().objects.create_user(
+                email="user@example.com", password="testpass123"
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_rows(self):
+        budget = Budget.objects.create(user=self.user, currency="USD")
+        food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+        item = Transaction.objects.create(
+            budget=budget, category=food, amount=Decimal("-10")
+        )
+        return budget, food, item
+
+    def test_new_user_placed_and_copied(self):
+        User = get_user_model()
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).shard, self.shard)
+        self.assertTrue(User.objects.using(self.shard).filter(pk=self.user.pk).exists())
+        self.assertEqual(get_shard(self.user.pk), self.shard)
+
+    def test_rows_stored_on_shard(self):
+        budget, food, item = self._create_rows()
+
+        for obj in [budget, food, item]:
+            self.assertEqual(obj._state.db, self.shard)
+            self.assertFalse(type(obj).objects.filter(pk=obj.pk).exists())
+        self.assertGreater(budget.pk, ID_SPAN)
+        self.assertEqual(
+            Change.objects.using(self.shard).filter(user=self.user).count(), 3
+        )
+
+    def test_api_reads_and_writes_shard(self):
+        res = self.client.post(BUDGETS_URL, {"currency": "USD"})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        budget_id = res.data["id"]
+
+        res = self.client.get(BUDGETS_URL)
+
+        self.assertEqual([b["id"] for b in res.data], [budget_id])
+        self.assertTrue(Budget.objects.using(self.shard).filter(pk=budget_id).exists())
+
+    def test_feed_reads_shard(self):
+        budget, _, _ = self._create_rows()
+
+        data = get_page(self.user, (START, self.shard), 10)
+
+        self.assertEqual([b.pk for b in data["budgets"]], [budget.pk])
+        self.assertTrue(data["cursor"].endswith("-" + self.shard))
+
+    def test_delete_user_deletes_shard_rows(self):
+        self._create_rows()
+
+        self.user.delete()
+
+        self.assertFalse(Budget.objects.using(self.shard).exists())
+        self.assertFalse(
+            get_user_model().objects.using(self.shard).filter(pk=self.user.pk).exists()
+        )
+
+    def test_purge_deleted_user_on_shard(self):
+        self._create_rows()
+        job = delete_user(self.user)
+
+        job = jobs.run(jobs.claim("test", kinds=[job.kind]))
+
+        self.assertEqual(job.result["transaction"], 1)
+        self.assertFalse(Budget._base_manager.using(self.shard).exists())
+        self.assertFalse(get_user_model()._base_manager.using(self.shard).exists())
+
+    def test_move_user(self):
+        budget, food, item = self._create_rows()
+        RecurringRule.objects.create(
+            budget=budget,
+            category=food,
+            amount=Decimal("-5"),
+            frequency=RecurringRule.MONTHLY,
+            start=timezone.now(),
+        )
+        cursor = parse_cursor(get_page(self.user, (START, self.shard), 10)["cursor"])
+
+        move_user(self.user, "default")
+
+        self.assertEqual(get_shard(self.user.pk), "default")
+        self.assertEqual(Transaction.objects.get().pk, item.pk)
+        self.assertEqual(RecurringRule.objects.count(), 1)
+        self.assertEqual(Change.objects.filter(user=self.user).count(), 3)
+        for model in [Budget, Category, Transaction, RecurringRule, Change]:
+            self.assertFalse(model.objects.using(self.shard).exists())
+        self.assertFalse(
+            get_user_model().objects.using(self.shard).filter(pk=self.user.pk).exists()
+        )
+        # The cursor of the client is of the old shard, it syncs again.
+        data = get_page(self.user.pk, cursor, 10)
+        self.assertEqual([b.pk for b in data["budgets"]], [budget.pk])
+
+    def test_rebalance_moves_misplaced_users(self):
+        self._create_rows()
+        out = StringIO()
+
+        with patch(
+            "core.management.commands.rebalance_shards.get_placement",
+            return_value="default",
+        ):
+            call_command("rebalance_shards", stdout=out)
+
+        self.assertIn("Moved 1 users.", out.getvalue())
+        self.assertEqual(Budget.objects.count(), 1)
@@ -0,0 +1,183 @@
+"""
+Tests for single-flight coalescing.
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Budget, CoalescedResult
+from core.singleflight import Group, coalesce_across_workers, get_lock_id
+
+
+class GroupTests(SimpleTestCase):
+    """Test in-process coalescing."""
+
+    def test_concurrent_calls_share_result(self):
+        group = Group()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 42
+
+        def call():
+            results.append(group.do("key", compute, timeout=5))
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [42] * 5)
+
+    def test_error_propagated_to_waiters(self):
+        group = Group()
+        started = threading.Event()
+        errors = []
+
+        def compute():
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                group.do("key", compute, timeout=5)
+            except ValueError as error:
+                errors.append(error)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+
+    def test_sequential_calls_not_cached(self):
+        group = Group()
+        values = iter([1, 2])
+
+        self.assertEqual(group.do("key", lambda: next(values)), 1)
+        self.assertEqual(group.do("key", lambda: next(values)), 2)
+
+
+class CoalesceAcrossWorkersTests(TransactionTestCase):
+    """Test coalescing through advisory locks."""
+
+    databases = "__all__"
+
+    def _wait_for_waiter(self, lock_id):
+        unsigned = lock_id & 0xFFFFFFFFFFFFFFFF
+        with connection.cursor() as cursor:
+            for _ in range(500):
+                cursor.execute(
+                    "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+                    "AND objid = %s AND NOT granted",
+                    [unsigned & 0xFFFFFFFF],
+                )
+                if cursor.fetchone()[0]:
+                    return
+                time.sleep(0.01)
+        self.fail("No worker waited for the lock.")
+
+    def test_waiting_worker_reuses_result(self):
+        started = threading.Event()
+        release = threading.Event()
+        results = {}
+
+        def lead():
+            def compute():
+                started.set()
+                release.wait(10)
+                return {"total": 1}
+
+            try:
+                results["leader"] = coalesce_across_workers("key", compute, 10)
+            finally:
+                connection.close()
+
+        def follow():
+            def compute():
+                raise AssertionError("Follower must not compute.")
+
+            try:
+                results["follower"] = coalesce_across_workers("key", compute, 10)
+            finally:
+                connection.close()
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait(10)
+        follower = threading.Thread(target=follow)
+        follower.start()
+        try:
+            self._wait_for_waiter(get_lock_id("key"))
+        finally:
+            release.set()
+            leader.join()
+            follower.join()
+
+        self.assertEqual(results["leader"], {"total": 1})
+        self.assertEqual(results["follower"], {"total": 1})
+
+    def test_result_not_stored_without_waiters(self):
+        value = coalesce_across_workers("key", lambda: [1, 2], 10)
+
+        self.assertEqual(value, [1, 2])
+        self.assertFalse(CoalescedResult.objects.exists())
+
+
+class CoalescedViewTests(TestCase):
+    """Test coalesced list endpoints."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_response_unchanged(self):
+        Budget.objects.create(user=self.user, currency="UAH")
+
+        res = self.client.get(reverse("budget:budget-list"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data), 1)
+
+    def test_keys_differ_per_user_and_params(self):
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        with patch("core.singleflight.coalesce", side_effect=lambda k, f: f()) as mock:
+            self.client.get(reverse("budget:budget-list"), {"currency": "UAH"})
+            self.client.get(reverse("budget:budget-list"), {"currency": "USD"})
+            self.client.force_authenticate(other)
+            self.client.get(reverse("budget:budget-list"), {"currency": "UAH"})
+
+        keys = {call.args[0] for call in mock.call_args_list}
+        self.assertEqual(len(keys), 3)
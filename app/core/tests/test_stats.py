@@ -0,0 +1,180 @@
+"""
+Tests for the streaming category stats.
+"""
+import random
+from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import stats
+from core.ledger import post_transactions
+from core.models import Budget, Category, CategoryStats, Transaction
+from core.sharding import get_shard
+
+
+class SketchTests(SimpleTestCase):
+    """Test the quantiles of sketches."""
+
+    def setUp(self):
+        self.random = random.Random(7)
+
+    def _sketch(self, amounts):
+        sketch = stats.Sketch()
+        for amount in amounts:
+            sketch.add(stats.get_bucket(amount))
+        return sketch
+
+    def test_quantiles_within_accuracy(self):
+        amounts = [self.random.lognormvariate(3, 1) for _ in range(5000)]
+        sketch = self._sketch(amounts)
+
+        for q in [0.1, 0.5, 0.9, 0.99]:
+            exact = np.quantile(amounts, q, method="lower")
+            self.assertAlmostEqual(
+                sketch.quantile(q) / exact, 1, delta=stats.RELATIVE_ACCURACY * 1.5
+            )
+
+    def test_round_trip_bytes(self):
+        sketch = self._sketch([1, 2.5, 2.5, 1000, 0])
+
+        data = sketch.to_bytes()
+
+        self.assertEqual(len(data), 6 * len(sketch.buckets))
+        self.assertEqual(stats.Sketch.from_bytes(data).buckets, sketch.buckets)
+
+    def test_merge_equals_combined(self):
+        first = [self.random.uniform(1, 100) for _ in range(100)]
+        second = [self.random.uniform(50, 500) for _ in range(100)]
+        sketch = self._sketch(first)
+
+        sketch.merge(self._sketch(second))
+
+        self.assertEqual(sketch.buckets, self._sketch(first + second).buckets)
+
+    def test_size_bounded(self):
+        sketch = self._sketch([1.1**i for i in range(1000)])
+
+        self.assertEqual(len(sketch.buckets), stats.MAX_BUCKETS)
+        self.assertEqual(sum(sketch.buckets.values()), 1000)
+        self.assertAlmostEqual(
+            sketch.quantile(1) / 1.1**999, 1, delta=stats.RELATIVE_ACCURACY
+        )
+
+
+class StatsTests(SimpleTestCase):
+    """Test updating stats one amount at a time."""
+
+    def test_add_and_remove(self):
+        amounts = [12.5, 40, 3.2, 18, 18, 99.99]
+        value = stats.Stats()
+        for amount in amounts + [500]:
+            value.add(amount)
+
+        value.remove(500)
+
+        self.assertEqual(value.count, len(amounts))
+        self.assertAlmostEqual(value.mean, np.mean(amounts))
+        self.assertAlmostEqual(value.variance, np.var(amounts, ddof=1))
+        self.assertEqual(sum(value.sketch.buckets.values()), len(amounts))
+
+    def test_score_multiples_of_median(self):
+        value = stats.Stats()
+        for amount in [40, 50, 50, 60, 70]:
+            value.add(-amount)
+
+        self.assertAlmostEqual(value.score(-150), 3, delta=0.05)
+
+    def test_few_amounts_not_scored(self):
+        value = stats.Stats()
+        for _ in range(stats.MIN_COUNT - 1):
+            value.add(10)
+
+        self.assertIsNone(value.score(1000))
+
+
+class RecordTests(TestCase):
+    """Test recording the amounts of written transactions."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.using = get_shard(self.user)
+        self.budget = Budget.objects.create(user=self.user, currency="USD")
+        self.food = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def _post(self, *amounts):
+        return post_transactions(
+            [
+                Transaction(budget=self.budget, category=self.food, amount=amount)
+                for amount in amounts
+            ]
+        )
+
+    def _stats(self):
+        obj = CategoryStats.objects.for_user(self.user).get(
+            budget=self.budget, category=self.food
+        )
+        return stats.Stats.from_model(obj)
+
+    def test_posted_transactions_recorded(self):
+        self._post(Decimal("10"), Decimal("20"), Decimal("30"))
+
+        value = self._stats()
+        self.assertEqual(value.count, 3)
+        self.assertAlmostEqual(value.mean, 20)
+        self.assertAlmostEqual(value.variance, 100)
+
+    def test_scored_against_stats_before(self):
+        self._post(*[Decimal("20")] * 5)
+
+        first, second = self._post(Decimal("60"), Decimal("61"))
+
+        self.assertAlmostEqual(first.anomaly_score, 3, delta=0.1)
+        self.assertAlmostEqual(second.anomaly_score, 3.05, delta=0.1)
+
+    def test_queries_independent_of_amounts(self):
+        self._post(Decimal("5"))
+        row = (self.budget.id, self.food.id, Decimal("1"), 1)
+        with CaptureQueriesContext(connections[self.using]) as single:
+            stats.record([row], self.using)
+
+        with self.assertNumQueries(len(single), using=self.using):
+            stats.record([row] * 100, self.using)
+
+    def test_rebuild_matches_streaming(self):
+        amounts = [Decimal(random.randint(100, 10000)) / 100 for _ in range(200)]
+        self._post(*amounts)
+        streamed = self._stats()
+        CategoryStats.objects.for_user(self.user).update(
+            count=0, mean=0, m2=0, sketch=b""
+        )
+        out = StringIO()
+
+        call_command("rebuild_category_stats", stdout=out)
+
+        rebuilt = self._stats()
+        self.assertEqual(rebuilt.count, streamed.count)
+        self.assertAlmostEqual(rebuilt.mean, streamed.mean)
+        self.assertAlmostEqual(rebuilt.variance, streamed.variance)
+        self.assertEqual(rebuilt.sketch.buckets, streamed.sketch.buckets)
+        self.assertIn("1 categories in 1 budgets", out.getvalue())
+
+    def test_rebuild_removes_stats_without_transactions(self):
+        self._post(Decimal("5"))
+        Transaction.objects.for_user(self.user).delete()
+
+        stats.rebuild([self.budget.id], self.using)
+
+        self.assertFalse(CategoryStats.objects.for_user(self.user).exists())
@@ -0,0 +1,149 @@
+"""
+Tests for the shared token bucket throttles.
+"""
+import multiprocessing
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.throttling import BucketStore, parse_rate
+
+RATES = {
+    "user": "1000/min",
+    "user.transactions": "2/min",
+    "ip": "1000/min",
+    "ip.token": "3/min",
+}
+
+
+def _consume_in_child(path, results):
+    store = BucketStore(path, sets=4)
+    results.put(store.consume("shared", 1, 5, now=100)[0])
+
+
+class BucketStoreTests(SimpleTestCase):
+    """Test the token buckets."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "throttle.db")
+        self.store = BucketStore(self.path, sets=4)
+        self.addCleanup(self.store.close)
+
+    def test_burst_then_refill(self):
+        allowed = [self.store.consume("key", 1, 3, now=100)[0] for _ in range(4)]
+
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertAlmostEqual(self.store.consume("key", 1, 3, now=100)[1], 1)
+        self.assertTrue(self.store.consume("key", 1, 3, now=101)[0])
+
+    def test_refill_capped_at_capacity(self):
+        self.store.consume("key", 1, 2, now=100)
+
+        allowed = [self.store.consume("key", 1, 2, now=1000)[0] for _ in range(3)]
+
+        self.assertEqual(allowed, [True, True, False])
+
+    def test_keys_independent(self):
+        self.store.consume("first", 1, 1, now=100)
+
+        self.assertFalse(self.store.consume("first", 1, 1, now=100)[0])
+        self.assertTrue(self.store.consume("second", 1, 1, now=100)[0])
+
+    def test_full_set_evicts_least_recent(self):
+        store = BucketStore(self.path + ".small", sets=1)
+        self.addCleanup(store.close)
+        for i in range(9):
+            store.consume("key-%d" % i, 0.001, 1, now=100 + i)
+
+        # The set has 8 slots, the least recent key was dropped as a full bucket.
+        self.assertTrue(store.consume("key-0", 0.001, 1, now=110)[0])
+        self.assertFalse(store.consume("key-8", 0.001, 1, now=110)[0])
+
+    def test_buckets_shared_between_processes(self):
+        results = multiprocessing.Queue()
+        for _ in range(6):
+            process = multiprocessing.Process(
+                target=_consume_in_child, args=(self.path, results)
+            )
+            process.start()
+            process.join()
+
+        allowed = [results.get() for _ in range(6)]
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("120/min"), (2, 120))
+        self.assertEqual(parse_rate("10/s"), (10, 10))
+        self.assertEqual(parse_rate("5/10"), (0.5, 5))
+
+
+class ThrottleAPITests(TestCase):
+    """Test throttling of API requests."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(
+            THROTTLE_FILE=os.path.join(directory.name, "throttle.db"),
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": RATES,
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+
+    def test_scoped_route_throttled_per_user(self):
+        url = reverse("budget:transaction-list")
+        self.client.force_authenticate(self.user)
+
+        statuses = [self.client.get(url).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        res = self.client.get(reverse("budget:budget-list"))
+        self.assertEqual(res.status_code, 200)
+
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_token_throttled_per_ip(self):
+        payload = {"email": "user@example.com", "password": "wrong"}
+
+        statuses = [
+            self.client.post(reverse("token"), payload).status_code for _ in range(4)
+        ]
+
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        res = self.client.post(reverse("token"), payload)
+        self.assertIn("Retry-After", res)
+        res = self.client.post(reverse("token"), payload, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(res.status_code, 401)
+
+    def test_forwarded_for_not_trusted(self):
+        payload = {"email": "user@example.com", "password": "wrong"}
+
+        statuses = [
+            self.client.post(
+                reverse("token"), payload, HTTP_X_FORWARDED_FOR="10.0.1.%d" % i
+            ).status_code
+            for i in range(4)
+        ]
+
+        self.assertEqual(statuses, [401, 401, 401, 429])
@@ -0,0 +1,98 @@
+"""
+Tests for transfers between budgets.
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+
+from core.models import Budget, Category, Transaction, Transfer
+from core.transfers import transfer
+
+
+class TransferTests(TestCase):
+    """Test posting transfers."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.usd = Budget.objects.create(
+            user=self.user, currency="USD", balance=Decimal("100")
+        )
+        self.eur = Budget.objects.create(user=self.user, currency="EUR")
+
+    def test_transfer_posts_linked_transactions(self):
+        result = transfer(self.usd, self.eur, Decimal("10"), rate=Decimal("0.925"))
+
+        self.usd.refresh_from_db()
+        self.eur.refresh_from_db()
+        self.assertEqual(self.usd.balance, Decimal("90"))
+        # 9.25 rounded half to even.
+        self.assertEqual(self.eur.balance, Decimal("9.25"))
+        self.assertEqual(result.debit.budget, self.usd)
+        self.assertEqual(result.credit.signed_amount, Decimal("9.25"))
+        categories = Category.objects.for_user(self.user)
+        self.assertEqual(
+            set(categories.values_list("name", "category_type")),
+            {("Transfer", "Expense"), ("Transfer", "Income")},
+        )
+
+    def test_categories_reused(self):
+        transfer(self.usd, self.eur, Decimal("1"), rate=Decimal("1"))
+        transfer(self.eur, self.usd, Decimal("1"), rate=Decimal("1"))
+
+        self.assertEqual(Category.objects.for_user(self.user).count(), 2)
+
+    def test_deleting_leg_deletes_transfer(self):
+        result = transfer(self.usd, self.eur, Decimal("10"), rate=Decimal("1"))
+
+        Transaction.objects.for_user(self.user).get(pk=result.credit_id).delete()
+
+        self.assertFalse(Transfer.objects.for_user(self.user).exists())
+
+
+class ConcurrentTransferTests(TransactionTestCase):
+    """Test concurrent transfers in all directions."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.budgets = [
+            Budget.objects.create(
+                user=self.user, currency="USD", balance=Decimal("1000")
+            )
+            for _ in range(3)
+        ]
+
+    def _transfer(self, seed):
+        try:
+            source, target = random.Random(seed).sample(self.budgets, 2)
+            transfer(source, target, Decimal("1.50"))
+        finally:
+            connections.close_all()
+
+    def test_balances_conserved(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            # Raises the first error, a deadlock among them.
+            list(executor.map(self._transfer, range(300)))
+
+        self.assertEqual(Transfer.objects.for_user(self.user).count(), 300)
+        budgets = Budget.objects.for_user(self.user)
+        balances = budgets.values_list("balance", flat=True)
+        self.assertEqual(sum(balances), Decimal("3000"))
+        for budget in self.budgets:
+            transactions = Transaction.objects.for_user(self.user)
+            signed = transactions.filter(budget=budget).values_list(
+                "signed_amount", flat=True
+            )
+            budget.refresh_from_db()
+            self.assertEqual(budget.balance, Decimal("1000") + sum(signed))
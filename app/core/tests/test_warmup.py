@@ -0,0 +1,29 @@
+"""
+Tests for the worker warmup.
+"""
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import clear_url_caches, get_resolver
+
+from core import warmup
+
+
+class WarmupTests(TestCase):
+    """Test priming a worker."""
+
+    databases = "__all__"
+
+    def test_prime_populates_resolvers(self):
+        clear_url_caches()
+
+        warmup.prime()
+
+        self.assertTrue(get_resolver()._populated)
+
+    @patch.object(connection, "ensure_connection")
+    def test_connect_opens_connections(self, patched_ensure_connection):
+        warmup.connect()
+
+        patched_ensure_connection.assert_called_once()
@@ -0,0 +1,189 @@
+"""
+Token bucket throttles shared by all workers of a host.
+
+Buckets live in a memory-mapped file in ``THROTTLE_FILE``, organized as a
+set-associative table: a key hashes to a set of ``WAYS`` slots, which is
+locked with ``fcntl`` while its bucket is refilled and charged. A check
+therefore costs one lock and a few struct reads, whatever the number of
+clients, and never touches the database.
+
+Rates are configured per throttle kind and view scope in
+``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]``, as ``"<kind>.<scope>"`` with
+``"<kind>"`` as the default, for example ``{"ip": "1200/min", "ip.token":
+"20/min"}``. Views select their scope with ``throttle_scope``.
+"""
+import fcntl
+import functools
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# Key hash, tokens left and time of the last update.
+_SLOT = struct.Struct("<Qdd")
+WAYS = 8
+DEFAULT_SETS = 8192
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class BucketStore:
+    """Token buckets in a file shared by the processes of a host."""
+
+    def __init__(self, path, sets=DEFAULT_SETS):
+        self.path = path
+        self.sets = sets
+        self.set_size = WAYS * _SLOT.size
+        # fcntl locks are held per process, threads need their own lock.
+        self.lock = threading.Lock()
+
+        size = sets * self.set_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mmap = mmap.mmap(self._fd, size)
+
+    def consume(self, key, rate, capacity, now=None):
+        """Take a token from the bucket of ``key``.
+
+        The bucket holds up to ``capacity`` tokens and refills with ``rate``
+        tokens per second. Return whether a token was available and the
+        seconds until the next one.
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # Zero marks an empty slot.
+        key_hash = int.from_bytes(digest, "little") | 1
+        offset = key_hash % self.sets * self.set_size
+        now = time.time() if now is None else now
+
+        with self.lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.set_size, offset)
+            try:
+                position, tokens, updated = self._find(key_hash, offset)
+                if position is None:
+                    position, tokens, updated = self._evict(offset), capacity, now
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                _SLOT.pack_into(self._mmap, position, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.set_size, offset)
+
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def _find(self, key_hash, offset):
+        for position in range(offset, offset + self.set_size, _SLOT.size):
+            slot_hash, tokens, updated = _SLOT.unpack_from(self._mmap, position)
+            if slot_hash == key_hash:
+                return position, tokens, updated
+        return None, 0, 0
+
+    def _evict(self, offset):
+        # The least recently used bucket is the one most likely to be full
+        # again, dropping it loses the least state.
+        return min(
+            range(offset, offset + self.set_size, _SLOT.size),
+            key=lambda position: _SLOT.unpack_from(self._mmap, position)[2],
+        )
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+_store = None
+
+
+def get_store():
+    """Return the bucket store of this process, opened on first use."""
+    global _store
+    if _store is None or _store.path != settings.THROTTLE_FILE:
+        _store = BucketStore(settings.THROTTLE_FILE)
+    return _store
+
+
+def _reset_store():
+    global _store
+    _store = None
+
+
+# A forked worker must not reuse the parent's thread lock.
+os.register_at_fork(after_in_child=_reset_store)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Return ``(tokens per second, capacity)`` of a ``"<count>/<period>"`` rate.
+
+    The period is a number of seconds or a unit, ``s``, ``min``, ``h`` or ``d``.
+    """
+    count, period = rate.split("/")
+    count = int(count)
+    if period.isdigit():
+        seconds = int(period)
+    else:
+        seconds = PERIODS[period[0]]
+    return count / seconds, count
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base throttle charging a shared token bucket per client and scope."""
+
+    kind = None
+
+    def get_client(self, request):
+        """Return the client identifier, or ``None`` to skip throttling."""
+        raise NotImplementedError
+
+    def get_rate(self, scope):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        if scope is not None and "%s.%s" % (self.kind, scope) in rates:
+            return rates["%s.%s" % (self.kind, scope)]
+        return rates.get(self.kind)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        rate = self.get_rate(scope)
+        client = self.get_client(request)
+        if rate is None or client is None:
+            return True
+
+        key = "%s:%s:%s" % (self.kind, scope or "", client)
+        allowed, self._wait = get_store().consume(key, *parse_rate(rate))
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Limit the requests of each authenticated user."""
+
+    kind = "user"
+
+    def get_client(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Limit the requests of each client address, authenticated or not.
+
+    The address is the peer of the connection, which the proxy passes as
+    ``REMOTE_ADDR``. ``X-Forwarded-For`` is ignored, clients could send a
+    new one with every request to get a fresh bucket.
+    """
+
+    kind = "ip"
+
+    def get_client(self, request):
+        return request.META.get("REMOTE_ADDR")
@@ -0,0 +1,67 @@
+"""
+Transfers of money between budgets of a user.
+
+A transfer posts a debit of the source budget and a credit of the target
+budget, in "Transfer" categories of the user, and links them in a
+``Transfer``, all in one database transaction. Both budgets are locked in
+id order before either transaction is written, as every balance write
+does, so transfers in opposite directions never deadlock. Budgets in
+different currencies are credited the amount converted at the given rate.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from django.db import transaction
+
+from .ledger import post_transactions
+from .models import Category, Transaction, Transfer
+
+CATEGORY_NAME = "Transfer"
+CENT = Decimal("0.01")
+
+
+def convert(amount, rate):
+    """Return ``amount`` converted at ``rate``, rounded to cents."""
+    return (amount * rate).quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def get_transfer_category(user_id, category_type, using):
+    """Return the category of the transfers of a user of a type."""
+    categories = Category.objects.using(using).filter(
+        user_id=user_id, name=CATEGORY_NAME, category_type=category_type
+    )
+    # Concurrent first transfers may create it twice, either will do.
+    category = categories.order_by("pk").first()
+    if category is None:
+        category = categories.create(
+            user_id=user_id, name=CATEGORY_NAME, category_type=category_type
+        )
+    return category
+
+
+def transfer(source, target, amount, rate=Decimal("1"), notes=""):
+    """Move ``amount`` from budget ``source`` to ``target``, return the transfer.
+
+    ``rate`` converts the amount to the currency of ``target``.
+    """
+    using = source._state.db
+    with transaction.atomic(using=using):
+        debit, credit = post_transactions(
+            [
+                Transaction(
+                    budget=source,
+                    category=get_transfer_category(source.user_id, "Expense", using),
+                    amount=amount,
+                    notes=notes,
+                ),
+                Transaction(
+                    budget=target,
+                    category=get_transfer_category(source.user_id, "Income", using),
+                    amount=convert(amount, rate),
+                    notes=notes,
+                ),
+            ],
+            using=using,
+        )
+        return Transfer.objects.using(using).create(
+            debit=debit, credit=credit, rate=rate
+        )
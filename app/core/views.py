@@ -0,0 +1,64 @@
+"""
+Views for the core app.
+"""
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.views.decorators.http import require_GET
+
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from .metrics import REGISTRY
+from .schema import get_schema_path, load_schema
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics_view(request):
+    """Expose metrics of all workers in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if token:
+        expected = "Bearer %s" % token
+        provided = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(provided.encode(), expected.encode()):
+            return HttpResponseForbidden()
+
+    return HttpResponse(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class SchemaView(SpectacularAPIView):
+    """Serve the schema precomputed by ``manage.py build_schema``.
+
+    The schema is generated on each request only in DEBUG.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if settings.DEBUG:
+            return super().get(request, *args, **kwargs)
+
+        renderer, media_type = self.perform_content_negotiation(request)
+        path = get_schema_path(renderer.format)
+        try:
+            content, etag = load_schema(path)
+        except FileNotFoundError:
+            raise ImproperlyConfigured(
+                "Schema file %s is missing, run manage.py build_schema." % path
+            )
+
+        response = HttpResponse(content, content_type=media_type)
+        response["ETag"] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.SCHEMA_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ["Accept"])
+        return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,37 @@
+"""
+Worker warmup run before a server process accepts traffic.
+
+:func:`prime` does the import-time work in the server's master process,
+so forked workers share it. :func:`connect` runs in each worker after the
+fork, as connections can't be shared between processes.
+"""
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+from django.utils.module_loading import autodiscover_modules
+
+from rest_framework.settings import api_settings
+
+from .schema import RENDERERS, get_schema_path, load_schema
+
+
+def prime():
+    """Import API modules, build URL resolvers and load the schema."""
+    autodiscover_modules("serializers", "views")
+    # Accessing the reverse dict populates the resolvers recursively.
+    get_resolver().reverse_dict
+    for name in ("DEFAULT_AUTHENTICATION_CLASSES", "DEFAULT_PERMISSION_CLASSES"):
+        getattr(api_settings, name)
+
+    if not settings.DEBUG:
+        for renderer_class in RENDERERS:
+            try:
+                load_schema(get_schema_path(renderer_class.format))
+            except FileNotFoundError:
+                pass
+
+
+def connect():
+    """Open the database connections of the current worker."""
+    for connection in connections.all():
+        connection.ensure_connection()
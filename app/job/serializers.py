@@ -0,0 +1,67 @@
+"""
+Serializers for the job APIs.
+"""
+from rest_framework import serializers
+
+from core import jobs
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for jobs."""
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "payload",
+            "status",
+            "attempts",
+            "progress_current",
+            "progress_total",
+            "created",
+            "started",
+            "finished",
+        ]
+        read_only_fields = [
+            "id",
+            "status",
+            "attempts",
+            "progress_current",
+            "progress_total",
+            "created",
+            "started",
+            "finished",
+        ]
+
+    def validate(self, attrs):
+        job_type = jobs.registry.get(attrs["kind"])
+        if job_type is None or not job_type.public:
+            raise serializers.ValidationError({"kind": "Unknown job kind."})
+
+        payload = attrs.get("payload") or {}
+        if job_type.serializer is not None:
+            payload_serializer = job_type.serializer(data=payload, context=self.context)
+            if not payload_serializer.is_valid():
+                raise serializers.ValidationError(
+                    {"payload": payload_serializer.errors}
+                )
+            payload = payload_serializer.data
+        attrs["payload"] = payload
+        return attrs
+
+    def create(self, validated_data):
+        return jobs.enqueue(
+            validated_data["kind"],
+            validated_data["payload"],
+            user=self.context["request"].user,
+        )
+
+
+class JobDetailSerializer(JobSerializer):
+    """Serializer for job detail view."""
+
+    class Meta(JobSerializer.Meta):
+        fields = JobSerializer.Meta.fields + ["result"]
+        read_only_fields = JobSerializer.Meta.read_only_fields + ["result"]
@@ -0,0 +1,209 @@
+"""
+Tests for the job APIs.
+"""
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import (
+    Budget,
+    Category,
+    Job,
+    Transaction,
+)
+
+JOBS_URL = reverse("job:job-list")
+
+
+def get_detail_url(job_id):
+    return reverse("job:job-detail", args=[job_id])
+
+
+def get_download_url(job_id):
+    return reverse("job:job-download", args=[job_id])
+
+
+def create_user(email, password="testpass123"):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def run_jobs():
+    while True:
+        job = jobs.claim("test")
+        if job is None:
+            break
+        jobs.run(job)
+
+
+class PublicJobAPITest(TestCase):
+    """Test unauthorized API requests."""
+
+    databases = "__all__"
+
+    def test_auth_required(self):
+        res = APIClient().get(JOBS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateJobAPITest(TestCase):
+    """Test authorized API requests."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.user = create_user("user@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.budget = Budget.objects.create(
+            user=self.user, currency="UAH", balance=Decimal("100")
+        )
+        self.category = Category.objects.create(
+            user=self.user, name="Food", category_type="Expense"
+        )
+
+    def test_export_job_enqueued_and_polled(self):
+        Transaction.objects.create(
+            budget=self.budget,
+            category=self.category,
+            amount=Decimal("-12.50"),
+            notes="Lunch",
+        )
+
+        res = self.client.post(
+            JOBS_URL,
+            {"kind": "export_transactions", "payload": {"budget": self.budget.id}},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["status"], Job.QUEUED)
+
+        run_jobs()
+        res = self.client.get(get_detail_url(res.data["id"]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], Job.SUCCEEDED)
+        self.assertEqual(res.data["progress_current"], 1)
+        self.assertEqual(res.data["result"]["count"], 1)
+        self.assertNotIn("content", res.data["result"])
+
+        res = self.client.get(get_download_url(res.data["id"]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        content = b"".join(res.streaming_content).decode()
+        header = content.splitlines()[0]
+        self.assertEqual(header, "id,budget,category,amount,notes,created")
+        self.assertIn("Lunch", content)
+
+    def test_export_retried_replaces_file(self):
+        job = jobs.enqueue("export_transactions", user=self.user)
+        run_jobs()
+        job.refresh_from_db()
+        Job.objects.filter(pk=job.pk).update(status=Job.QUEUED)
+
+        run_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.result["file"], "exports/transactions-%d.csv" % job.pk)
+        self.assertEqual(job.result["size"], default_storage.size(job.result["file"]))
+
+    def test_deleted_job_file_deleted(self):
+        job = jobs.enqueue("export_transactions", user=self.user)
+        run_jobs()
+        job.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+
+        self.assertFalse(default_storage.exists(job.result["file"]))
+
+    def test_download_without_file_error(self):
+        job = jobs.enqueue("export_transactions", user=self.user)
+
+        res = self.client.get(get_download_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_import_job_posts_transactions(self):
+        payload = {
+            "budget": self.budget.id,
+            "transactions": [
+                {"category": self.category.id, "amount": "10.00"},
+                {
+                    "category": self.category.id,
+                    "amount": "5.00",
+                    "notes": "Coffee",
+                    "created": "2023-05-01T08:00:00Z",
+                },
+            ],
+        }
+
+        res = self.client.post(
+            JOBS_URL,
+            {"kind": "import_transactions", "payload": payload},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        run_jobs()
+
+        transactions = Transaction.objects.for_user(self.user)
+        self.assertEqual(transactions.filter(budget=self.budget).count(), 2)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, Decimal("85"))
+        self.assertTrue(
+            transactions.filter(notes="Coffee", created__year=2023).exists()
+        )
+
+    def test_import_foreign_category_error(self):
+        other = create_user("other@example.com")
+        category = Category.objects.create(
+            user=other, name="Food", category_type="Expense"
+        )
+        payload = {
+            "budget": self.budget.id,
+            "transactions": [{"category": category.id, "amount": "10.00"}],
+        }
+
+        res = self.client.post(
+            JOBS_URL,
+            {"kind": "import_transactions", "payload": payload},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_or_internal_kind_error(self):
+        for kind in ["unknown", "test_internal"]:
+            res = self.client.post(JOBS_URL, {"kind": kind}, format="json")
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_jobs_limited_to_user(self):
+        other = create_user("other@example.com")
+        job = jobs.enqueue("export_transactions", user=other)
+
+        res = self.client.get(JOBS_URL)
+        self.assertEqual(res.data, [])
+
+        res = self.client.get(get_detail_url(job.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(get_download_url(job.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,61 @@
+"""
+Views for the job APIs.
+"""
+import os
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from drf_spectacular.utils import OpenApiTypes, extend_schema
+
+from rest_framework import (
+    mixins,
+    viewsets,
+)
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+
+from core.authentication import CachedJWTAuthentication
+from core.jobs import get_file
+from core.models import Job
+
+from . import serializers
+
+
+class JobViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Enqueue background jobs and poll their progress."""
+
+    serializer_class = serializers.JobDetailSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "jobs"
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user).order_by("-id")
+
+    def get_serializer_class(self):
+        if self.action in ("list", "create"):
+            return serializers.JobSerializer
+
+        return self.serializer_class
+
+    @extend_schema(responses={(200, "application/octet-stream"): OpenApiTypes.BINARY})
+    @action(detail=True, methods=["get"])
+    def download(self, request, *args, **kwargs):
+        """The file written by the job, such as an export."""
+        result = self.get_object().result
+        name = get_file(result)
+        if name is None or not default_storage.exists(name):
+            raise NotFound("The job has no file.")
+        return FileResponse(
+            default_storage.open(name),
+            as_attachment=True,
+            filename=os.path.basename(name),
+            content_type=result.get("content_type"),
+        )
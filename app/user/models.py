@@ -10,7 +10,10 @@ from django.db import models
 
 
 class UserManager(BaseManager):
-    """Manager for users."""
+    """Manager for users, without deleted ones."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted=None)
 
     def _create_user(self, email, password, **extra_fields):
         """Create and save a user with the given username, email, and password."""
@@ -57,6 +60,11 @@ class User(AbstractBaseUser, PermissionsMixin):
             "Unselect this instead of deleting accounts."
         ),
     )
+    # Database alias with the rows of the user, empty for the default one,
+    # see core.sharding.
+    shard = models.CharField(max_length=100, blank=True, default="")
+    # Set when the user is deleted, until core.deletion purges it.
+    deleted = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = UserManager()
 
@@ -12,6 +12,8 @@ from django.urls import reverse
 class AdminSiteTests(TestCase):
     """Tests for Django admin site."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         """Create user and client."""
         self.client = Client()
@@ -24,6 +24,8 @@ def create_user(email="user@example.com", password="testpass123"):
 class PublicUserApiTests(TestCase):
     """Test public features for the user API."""
 
+    databases = "__all__"
+
     def setUp(self) -> None:
         self.client = APIClient()
 
@@ -81,3 +83,25 @@ class PublicUserApiTests(TestCase):
 
         self.assertIn("access", res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class PrivateUserApiTests(TestCase):
+    """Test API requests of an authenticated user."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        create_user()
+        self.client = APIClient()
+        res = self.client.post(
+            TOKEN_URL, {"email": "user@example.com", "password": "testpass123"}
+        )
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer %s" % res.data["access"])
+
+    def test_delete_user(self):
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(get_user_model().objects.exists())
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
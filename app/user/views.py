@@ -1,10 +1,13 @@
 """
 Views for the user API.
 """
-from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from rest_framework import generics, permissions
 
+from core.authentication import CachedJWTAuthentication
+from core.deletion import delete_user
+
 from .serializers import (
     UserSerializer,
 )
@@ -16,12 +19,29 @@ class CreateUserView(generics.CreateAPIView):
     permission_classes = [permissions.BasePermission]
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
-    """Manage the authenticated user."""
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
+    """Manage the authenticated user.
+
+    Deleting the user refuses its tokens right away, and deletes its data
+    in the background.
+    """
     serializer_class = UserSerializer
-    authentication_classes = [authentication.JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the user."""
         return self.request.user
+
+    def perform_destroy(self, instance):
+        delete_user(instance)
+
+
+class TokenView(TokenObtainPairView):
+    """Obtain a token pair, throttled per client address."""
+    throttle_scope = "token"
+
+
+class RefreshTokenView(TokenRefreshView):
+    """Refresh an access token, throttled per client address."""
+    throttle_scope = "token"
@@ -1,6 +1,14 @@
 server {
     listen ${LISTEN_PORT};
 
+    location /api/budget/stream/ {
+        proxy_pass           http://${EVENTS_HOST}:${EVENTS_PORT};
+        proxy_http_version   1.1;
+        proxy_set_header     Connection "";
+        proxy_buffering      off;
+        proxy_read_timeout   1h;
+    }
+
     location / {
         uwsgi_pass           ${APP_HOST}:${APP_PORT};
         include              /etc/nginx/uwsgi_params;
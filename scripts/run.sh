@@ -2,7 +2,9 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py migrate
+python manage.py migrate_if_needed --wait
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module config.wsgi
\ No newline at end of file
+# Metrics files of the previous run belong to workers that no longer exist.
+rm -rf "${METRICS_DIR:-/tmp/finance_app_metrics}"
+
+uwsgi --socket :9000 --workers 4 --master --enable-threads --module config.wsgi